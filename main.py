@@ -1,6 +1,5 @@
 import argparse
 import asyncio
-import json
 import os
 import sys
 import time
@@ -15,7 +14,195 @@ from src import config
 from src.scraper import Scraper
 from src.logger import setup_logger
 from src import file_manager
+from src.output_writer import OutputWriter, FSYNC_POLICIES
+from src.pdf_renderer import PdfRenderPool
+from src import section_pdf
+from src.asset_store import AssetStore
 from src.ui import print_header, print_fatal_error
+from src.utils import parse_duration, canonicalize_url
+
+def format_age(seconds):
+    """Formats an index age in seconds for console output."""
+    hours, remainder = divmod(int(seconds), 3600)
+    if hours >= 24:
+        return f"{hours // 24}d {hours % 24}h"
+    return f"{hours}h {remainder // 60}m"
+
+async def start_pdf_pool(args, log_func, writer):
+    """Starts the dedicated PDF render pool if PDFs are requested with --pdf-workers."""
+    if 'pdf' not in args.format or args.pdf_workers < 1:
+        return None
+    pdf_pool = PdfRenderPool(log_func, workers=args.pdf_workers, writer=writer)
+    await pdf_pool.start()
+    return pdf_pool
+
+async def render_offline_pdfs(args, log_func):
+    """
+    Renders article PDFs from the print cache (--render-pdf-offline), without logging in or contacting the site.
+
+    Returns:
+        tuple: (rendered, failed, not_cached) article counts.
+    """
+    articles = file_manager.load_index_data(limit=args.limit)
+    cache = file_manager.get_print_cache()
+    cached_articles = [article for article in articles if cache.has_page(article['url'])]
+    os.makedirs(config.get_pdf_dir(), exist_ok=True)
+
+    renderer = Scraper(log_func)
+    await renderer.connect(local=True)
+    semaphore = asyncio.Semaphore(max(args.pdf_workers, 1))
+    rendered = 0
+
+    async def render(article, pbar):
+        nonlocal rendered
+        async with semaphore:
+            pdf_path = os.path.join(config.get_pdf_dir(), f"{article['filename_base']}.pdf")
+            if await renderer.render_cached_pdf(article['url'], pdf_path):
+                rendered += 1
+            pbar.update(1)
+
+    try:
+        with tqdm(total=len(cached_articles), desc="Rendering PDFs", unit="pdf") as pbar:
+            await asyncio.gather(*(render(article, pbar) for article in cached_articles))
+    finally:
+        await renderer.shutdown()
+    return rendered, len(cached_articles) - rendered, len(articles) - len(cached_articles)
+
+async def render_section_pdfs(args, log_func):
+    """
+    Renders one combined PDF with bookmarks per top-level TOC section (--section-pdfs).
+
+    Sections are assembled from stored article HTML, so the site is not contacted.
+
+    Returns:
+        list: (path, articles included) per rendered section.
+    """
+    toc_tree = file_manager.load_toc_tree()
+    articles_by_url = {canonicalize_url(article['url']): article for article in file_manager.iter_index_articles()}
+    cache = file_manager.get_print_cache()
+    os.makedirs(config.get_section_pdf_dir(), exist_ok=True)
+
+    renderer = Scraper(log_func)
+    await renderer.connect(local=True)
+    rendered = []
+    try:
+        for number, section in enumerate(tqdm(toc_tree, desc="Rendering sections", unit="section"), start=1):
+            document, included = section_pdf.build_section_html(
+                section, articles_by_url, lambda article: section_pdf.load_stored_article(article, cache))
+            if not included:
+                log_func.debug("Section has no stored articles, skipping", title=section.get('title'))
+                continue
+            path = os.path.join(config.get_section_pdf_dir(), section_pdf.section_filename(number, section.get('title', '')))
+            try:
+                await renderer.render_html_pdf(document, path, outline=True)
+                rendered.append((path, included))
+                log_func.debug("Saved section PDF", path=path, articles=included)
+            except Exception as e:
+                log_func.error("Could not render section PDF", title=section.get('title'), error=str(e))
+    finally:
+        await renderer.shutdown()
+    return rendered
+
+async def download_markdown_assets(args, log_func, articles):
+    """
+    Stores the images and attachments of the run's markdown files locally and rewrites their links (--download-assets).
+
+    Returns:
+        dict: Asset store statistics plus the number of rewritten markdown files.
+    """
+    # The asset requests reuse the cookies of a logged-in browser session
+    session = Scraper(log_func)
+    try:
+        await session.connect()
+        await session.login()
+        cookies = await session.context.cookies()
+    finally:
+        await session.shutdown()
+
+    store = AssetStore(config.get_asset_dir(), log_func, connections=args.asset_connections, cookies=cookies)
+    documents = [(os.path.join(config.get_markdown_dir(), f"{article['filename_base']}.md"), article['url'])
+                 for article in articles]
+    rewritten = await store.localize_markdown(documents)
+    return dict(store.get_statistics(), markdown_rewritten=rewritten)
+
+def collect_run_statistics(scrapers, pdf_pool=None):
+    """Adds up the statistics of all scraping workers of a run and of the PDF render pool."""
+    stats = {}
+    for scraper in scrapers:
+        for key, value in scraper.get_statistics().items():
+            if key == "scraped_unique_articles":
+                # Workers share one content hash set, so each reports its full size
+                stats[key] = max(stats.get(key, 0), value)
+            else:
+                stats[key] = stats.get(key, 0) + value
+    if pdf_pool:
+        stats.update(pdf_pool.get_statistics())
+    return stats
+
+async def stream_discovery_and_scrape(scraper_instance, toc_tree, args, log_func, writer, pdf_pool=None, scrapers=None):
+    """
+    Runs nested discovery and scraping concurrently (--stream).
+
+    Discovery pushes each article into the scrape queue as soon as it reaches it, so
+    the scraping workers start with the first article instead of after the full index.
+    Once discovery finishes, the index is saved and outputs are renamed to the final numbering.
+    The worker scrapers are appended to scrapers, if given, for the run statistics.
+
+    Returns:
+        tuple: (toc_tree, scraped_articles) with final numbering.
+    """
+    queue = asyncio.Queue()
+    shared_hashes = set()
+    streamed_articles = []
+    pbar = tqdm(total=0, desc="Scraping Articles", unit="article")
+
+    async def on_article(node, breadcrumb):
+        if args.limit and len(streamed_articles) >= args.limit:
+            return
+        article_info = file_manager.make_streamed_article(node, breadcrumb, len(streamed_articles) + 1)
+        streamed_articles.append(article_info)
+        pbar.total = len(streamed_articles)
+        pbar.refresh()
+        await queue.put((article_info, len(streamed_articles) - 1))
+
+    async def worker(name):
+        scraper = Scraper(log_func, shared_hashes=shared_hashes, writer=writer, capture=args.capture_discovery, pdf_pool=pdf_pool)
+        if scrapers is not None:
+            scrapers.append(scraper)
+        try:
+            await scraper.connect()
+            await scraper.login()
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                article_info, index = item
+                try:
+                    await scraper.scrape_single_article(article_info, args.format, index, pbar, update_mode=args.update, rag_mode=args.rag)
+                except Exception as e:
+                    log_func.error(f"Worker {name} error: {e}", worker=name)
+        finally:
+            await scraper.close()
+
+    workers = [asyncio.create_task(worker(f'worker-{i}')) for i in range(args.parallel)]
+    try:
+        toc_tree = await scraper_instance.discover_nested_articles(toc_tree, max_depth=3, on_article=on_article)
+    finally:
+        # One sentinel per worker: each stops after the queue is drained
+        for _ in workers:
+            await queue.put(None)
+        results = await asyncio.gather(*workers, return_exceptions=True)
+        pbar.close()
+    for result in results:
+        if isinstance(result, Exception):
+            log_func.error(f"Streaming worker failed: {result}")
+
+    # Every file, including queued PDFs, must be on disk before it is renamed
+    if pdf_pool:
+        await pdf_pool.join()
+    await writer.flush()
+    file_manager.save_hierarchical_index(toc_tree)
+    return toc_tree, file_manager.finalize_streamed_articles(streamed_articles, args.format)
 
 async def main():
     """Main function to orchestrate the scraping process."""
@@ -34,9 +221,14 @@ async def main():
     parser.add_argument("-f", "--format", nargs='+', choices=['json', 'pdf', 'txt', 'markdown'], default=['json'], help="Output format(s).")
     parser.add_argument("--no-scrape", action="store_true", help="Only create the index without scraping full articles.")
     parser.add_argument("--force-reindex", action="store_true", help="Force re-indexing of all articles.")
-    parser.add_argument("--update", action="store_true", help="Only update articles that have changed since last run.")
+    parser.add_argument("--incremental-reindex", action="store_true", help="Refresh the stored index now, rediscovering only subtrees whose TOC links changed.")
+    parser.add_argument("--reindex-if-older-than", type=parse_duration, default=None, metavar="AGE", help="Incrementally refresh the persistent index if it is older than AGE, e.g. 3600, 12h, 7d (default: 7d)")
+    parser.add_argument("--stream", action="store_true", help="Scrape articles while nested discovery is still running instead of after it (applies when the index is built from scratch).")
+    parser.add_argument("--capture-discovery", action="store_true", help="Keep pages parsed during nested discovery and write their outputs without visiting them again (pages needing PDF are still visited).")
+    parser.add_argument("--update", action="store_true", help="Only update articles that have changed since last run. Output directories are kept, so unchanged PDFs are skipped by their fingerprint only with --update.")
     parser.add_argument("-p", "--parallel", type=int, default=1, help="Number of parallel download streams.")
     parser.add_argument("--rag", action="store_true", help="Add breadcrumbs to markdown files for RAG systems.")
+    parser.add_argument("--naming", choices=config.NAMING_SCHEMES, default="ordered", help="Output file names: 'ordered' (0001_Title, follows TOC order) or 'url' (stable names derived from the article URL)")
     parser.add_argument("--limit", type=int, default=None, help="Limit the number of articles to scrape (for testing).")
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose (DEBUG) logging.")
     
@@ -47,16 +239,37 @@ async def main():
     parser.add_argument("--retry-delay", type=float, default=2.0, help="Initial delay between retries in seconds (default: 2.0)")
     parser.add_argument("--delay", type=float, default=0.5, help="Delay between requests in seconds (default: 0.5)")
     
+    parser.add_argument("--meta-compact-every", type=int, default=200, help="Compact the _meta.jsonl log into _meta.json every N articles, 0 to disable (default: 200)")
+    
+    # Output writer configuration
+    parser.add_argument("--writer-threads", type=int, default=4, help="Number of threads writing output files (default: 4)")
+    parser.add_argument("--pdf-workers", type=int, default=0, help="Render PDFs in a separate pool of N browser contexts; 0 renders them inline in the scraping workers (default: 0)")
+    parser.add_argument("--pdf-timeout", type=int, default=None, help="Print page load timeout for PDF rendering in seconds (default: same as --timeout)")
+    parser.add_argument("--pdf-format", choices=config.PDF_PAGE_FORMATS, default="A4", help="Paper format of rendered PDFs (default: A4)")
+    parser.add_argument("--cache-print", action="store_true", help="Keep print pages and their assets in a local cache (_print_cache/) for offline PDF rendering.")
+    parser.add_argument("--render-pdf-offline", action="store_true", help="Only render PDFs of indexed articles from the print cache, in a local Chromium if available, without contacting the site.")
+    parser.add_argument("--section-pdfs", action="store_true", help="Only render one combined PDF with bookmarks per top-level TOC section from stored article HTML (pdf_sections/), without contacting the site.")
+    parser.add_argument("--download-assets", action="store_true", help="Download images and attachments referenced by markdown output into the shared asset store (out/_assets) and link them locally.")
+    parser.add_argument("--asset-connections", type=int, default=8, help="Maximum concurrent connections for --download-assets (default: 8)")
+    parser.add_argument("--fsync", choices=FSYNC_POLICIES, default="none", help="fsync policy for output files: none, file (after each file) or flush (before TOC creation)")
+    
     # Команды объединения файлов
     parser.add_argument("--merge", action="store_true", help="Merge files instead of scraping")
     parser.add_argument("--merge-dir", help="Directory with files to merge")
     parser.add_argument("--merge-output", help="Output directory for merged files")
-    parser.add_argument("--merge-format", choices=['json', 'markdown', 'txt'], default='json', help="Output format for merged files")
+    parser.add_argument("--merge-format", choices=['json', 'jsonl', 'markdown', 'txt'], default='json', help="Output format for merged files (jsonl: one article record per line with _meta.json metadata)")
     parser.add_argument("--max-files", type=int, default=100, help="Maximum files per merged group")
     parser.add_argument("--max-size", type=float, default=50.0, help="Maximum size per merged group in MB")
     parser.add_argument("--merge-filter", help="Filter pattern for files to merge (e.g., '*.json')")
     parser.add_argument("--sort-by", choices=['name', 'size', 'date'], default='name', help="Sort files by")
-    parser.add_argument("--compress", action="store_true", help="Compress merged files")
+    parser.add_argument("--compress", action="store_true", help="Compress merged files with gzip (same as --compression gzip)")
+    parser.add_argument("--compression", choices=['gzip', 'zstd'], help="Compress merged files of any format while writing them (zstd needs the zstandard package)")
+    parser.add_argument("--compression-level", type=int, help="Compression level: gzip 0-9 (default 9), zstd 1-22 (default 3)")
+    parser.add_argument("--merge-workers", type=int, default=1, help="Number of processes merging groups in parallel, 0 for one per CPU core (default: 1)")
+    parser.add_argument("--incremental-merge", action="store_true", help="Rebuild only merged groups whose files changed since the last merge, keeping group boundaries (uses _merge_manifest.json)")
+    parser.add_argument("--max-tokens", type=int, help="Maximum estimated tokens per merged group, e.g. an LLM context window")
+    parser.add_argument("--tokenizer", default="heuristic", help="Token counter for --max-tokens: heuristic (built-in estimate) or tiktoken:<encoding>, e.g. tiktoken:cl100k_base (default: heuristic)")
+    parser.add_argument("--group-strategy", choices=['sequential', 'ffd', 'bfd', 'subtree'], default='sequential', help="How files are packed into merged groups: sequential fill, first-fit or best-fit decreasing bin packing, or whole TOC subtrees in order (default: sequential)")
     parser.add_argument("--merge-stats", action="store_true", help="Show merge statistics without merging")
     
     args = parser.parse_args()
@@ -80,7 +293,14 @@ async def main():
             filter_pattern=args.merge_filter,
             sort_by=args.sort_by,
             compress_output=args.compress,
-            include_headers=True
+            compression=args.compression,
+            compression_level=args.compression_level,
+            include_headers=True,
+            workers=args.merge_workers,
+            incremental=args.incremental_merge,
+            max_tokens=args.max_tokens,
+            tokenizer=args.tokenizer,
+            group_strategy=args.group_strategy
         )
         
         merger = FileMerger(merge_config)
@@ -93,8 +313,19 @@ async def main():
                 print(f"Всего файлов: {stats['total_files']}")
                 print(f"Общий размер: {stats['total_size_mb']} MB")
                 print(f"Средний размер файла: {stats['avg_file_size_mb']} MB")
+                if 'total_tokens' in stats:
+                    print(f"Всего токенов ({stats['tokenizer']}): {stats['total_tokens']}")
                 print(f"Ожидаемое количество групп: {stats['estimated_groups']}")
                 print(f"Файлы по расширениям: {stats['files_by_extension']}")
+                if stats['total_files']:
+                    print(f"\n📦 План группировки ({stats['group_strategy']}):")
+                    plan = stats['group_plan'] if args.verbose else stats['group_plan'][:20]
+                    for entry in plan:
+                        tokens = f", {entry['tokens']} токенов" if 'tokens' in entry else ""
+                        print(f"   Группа {entry['group']}: {entry['files']} файлов, {entry['size_mb']} MB{tokens}, "
+                              f"заполнена на {entry['fill_percent']}%")
+                    if len(plan) < len(stats['group_plan']):
+                        print(f"   ... еще {len(stats['group_plan']) - len(plan)} групп (полный план: --verbose)")
                 
                 if stats['total_files'] == 0:
                     print("⚠️  Файлы для объединения не найдены")
@@ -117,6 +348,10 @@ async def main():
                 
                 print(f"\n✅ Объединение завершено!")
                 print(f"Создано групп: {len(merged_files)}")
+                if args.incremental_merge:
+                    summary = merger.last_merge_summary
+                    print(f"Пересобрано групп: {summary['groups_rebuilt']}, без изменений: {summary['groups_reused']}, "
+                          f"удалено: {summary['groups_removed']}")
                 if merged_files:
                     output_location = Path(merged_files[0]).parent
                     print(f"Файлы сохранены в: {output_location}")
@@ -160,6 +395,14 @@ async def main():
             retry_delay=args.retry_delay,
             request_delay=args.delay
         )
+        config.set_meta_compact_interval(args.meta_compact_every)
+        config.set_naming_scheme(args.naming)
+        config.set_pdf_timeout(args.pdf_timeout)
+        config.set_pdf_page_format(args.pdf_format)
+        config.set_print_cache(args.cache_print)
+        config.set_download_assets(args.download_assets)
+        if args.reindex_if_older_than is not None:
+            config.set_index_ttl(args.reindex_if_older_than)
         if args.verbose:
             print(f"Timeouts configured: page={args.timeout}s, network={args.network_timeout}s, retry={args.retry_count}, delay={args.delay}s")
     except ValueError as e:
@@ -171,7 +414,46 @@ async def main():
     console_output = args.verbose
     log_func = setup_logger(config.get_output_dir(), verbose=args.verbose, console_output=console_output)
 
-    scraper_instance = Scraper(log_func)
+    # --- Offline PDF Rendering Mode ---
+    if args.render_pdf_offline:
+        print("Rendering PDFs from the print cache...")
+        log_func.info("Rendering PDFs from the print cache", cache_dir=config.get_print_cache_dir())
+        try:
+            rendered, failed, not_cached = await render_offline_pdfs(args, log_func)
+            print(f"PDFs: {rendered} rendered, {failed} failed, {not_cached} article(s) not in the print cache.")
+            log_func.info("Offline PDF rendering complete", rendered=rendered, failed=failed, not_cached=not_cached)
+        except Exception as e:
+            print_fatal_error(str(e), log_func)
+        finally:
+            file_manager.close_index_stores()
+            log_func.close()
+        return
+
+    # --- Section PDF Mode ---
+    if args.section_pdfs:
+        print("Rendering combined section PDFs...")
+        log_func.info("Rendering combined section PDFs", output_dir=config.get_section_pdf_dir())
+        try:
+            rendered = await render_section_pdfs(args, log_func)
+            print(f"Section PDFs: {len(rendered)} rendered, {sum(count for _, count in rendered)} article(s) included.")
+            log_func.info("Section PDF rendering complete", sections=len(rendered))
+        except Exception as e:
+            print_fatal_error(str(e), log_func)
+        finally:
+            file_manager.close_index_stores()
+            log_func.close()
+        return
+
+    scraper_instance = Scraper(log_func, capture=args.capture_discovery)
+    writer = None
+    pdf_pool = None
+    run_id = None
+    run_status = "failed"
+    run_stats = None
+    articles_to_scrape = []
+    streamed_articles = None
+    # Scraping workers of the run, for the statistics of Step 5.5
+    scrapers = []
 
     try:
         # --- Step 1: Check Dependencies ---
@@ -186,40 +468,71 @@ async def main():
         print("\nStep 2: Setting up output directories...")
         log_func.info("Step 2: Setting up output directories...")
         file_manager.setup_output_directories(args.format, update_mode=args.update)
+        run_id = file_manager.get_index_store().start_run(args.url, args.format)
+        # Captures left by an interrupted run may be stale
+        file_manager.clear_discovery_captures()
         print("Directories ready.")
         log_func.info("Directory setup complete.")
 
         # --- Step 3: Login & Create Index ---
         print("\nStep 3: Logging in and creating article index...")
         log_func.info("Step 3: Logging in and creating article index...")
-        await scraper_instance.connect()
-        await scraper_instance.login()
+        index_age = file_manager.get_index_age()
+        index_expired = index_age is not None and index_age >= config.get_index_ttl()
         
-        # Load existing metadata before index operations for update mode
-        existing_meta_data = file_manager.load_existing_meta_data()
-        
-        if args.force_reindex or not os.path.exists(os.path.join(file_manager.get_index_path(), "_toc_tree.json")):
+        if args.force_reindex or index_age is None:
+            await scraper_instance.connect()
+            await scraper_instance.login()
             toc_tree = await scraper_instance.get_initial_toc(args.url)
             
-            # Always attempt recursive discovery - the system will auto-detect the parser type
-            print("Discovering nested articles recursively...")
-            log_func.info("Discovering nested articles recursively with auto-detection...")
-            toc_tree = await scraper_instance.discover_nested_articles(toc_tree, max_depth=3)
-            print(f"Recursive discovery complete.")
-            log_func.info("Recursive discovery complete.")
+            if args.stream and not args.no_scrape:
+                # Steps 3 and 4 overlap: articles are scraped as soon as discovery finds them
+                print(f"Discovering nested articles and scraping them using {args.parallel} parallel stream(s)...")
+                log_func.info("Streaming mode: scraping articles during recursive discovery...")
+                writer = OutputWriter(log_func, max_workers=args.writer_threads, fsync_policy=args.fsync)
+                pdf_pool = await start_pdf_pool(args, log_func, writer)
+                toc_tree, streamed_articles = await stream_discovery_and_scrape(scraper_instance, toc_tree, args, log_func, writer, pdf_pool, scrapers)
+                print(f"Recursive discovery complete, {len(streamed_articles)} article(s) scraped.")
+                log_func.info("Recursive discovery and streaming scrape complete.", articles=len(streamed_articles))
+            else:
+                # Always attempt recursive discovery - the system will auto-detect the parser type
+                print("Discovering nested articles recursively...")
+                log_func.info("Discovering nested articles recursively with auto-detection...")
+                toc_tree = await scraper_instance.discover_nested_articles(toc_tree, max_depth=3)
+                print(f"Recursive discovery complete.")
+                log_func.info("Recursive discovery complete.")
+                
+                file_manager.save_hierarchical_index(toc_tree)
+        elif index_expired or args.incremental_reindex:
+            if index_expired:
+                print(f"Index is {format_age(index_age)} old, refreshing changed subtrees...")
+                log_func.info(f"Index expired, refreshing incrementally", age_seconds=int(index_age))
+            else:
+                print("Refreshing changed subtrees of the index...")
+                log_func.info("Refreshing index incrementally")
+            await scraper_instance.connect()
+            await scraper_instance.login()
+            toc_tree, toc_diff = await scraper_instance.refresh_index(args.url, file_manager.load_toc_tree(), max_depth=3)
+            print(f"Index refreshed: {toc_diff.summary()}.")
+            log_func.info(f"Index refreshed: {toc_diff.summary()}",
+                          added=len(toc_diff.added), removed=len(toc_diff.removed), moved=len(toc_diff.moved))
+            for url in toc_diff.added:
+                log_func.debug("Index node added", url=url)
+            for url in toc_diff.removed:
+                log_func.debug("Index node removed", url=url)
+            for url in toc_diff.moved:
+                log_func.debug("Index node moved", url=url)
             
             file_manager.save_hierarchical_index(toc_tree)
         else:
-            print("Index found, skipping index creation. Use --force-reindex to override.")
-            log_func.info("Index found, skipping index creation.")
+            print(f"Index found ({format_age(index_age)} old), skipping index creation. Use --force-reindex to override.")
+            log_func.info("Index found, skipping index creation.", age_seconds=int(index_age))
             
             # Load the existing TOC tree to check for structural changes
-            index_file = os.path.join(file_manager.get_index_path(), "_toc_tree.json")
-            with open(index_file, "r", encoding="utf-8") as f:
-                toc_tree = json.load(f)
+            toc_tree = file_manager.load_toc_tree()
                 
             # Check if structure has changed significantly when using --update flag
-            if args.update and file_manager.should_force_reindex(toc_tree, existing_meta_data):
+            if args.update and file_manager.should_force_reindex(toc_tree):
                 print("TOC structure changed significantly, forcing reindex for all articles.")
                 log_func.warning("TOC structure changed significantly, forcing reindex.")
                 args.force_reindex = True  # Set flag to force reindexing of all articles
@@ -228,73 +541,102 @@ async def main():
 
         # --- Step 4: Final Scraping ---
         if not args.no_scrape:
-            print(f"\nStep 4: Starting final scrape using {args.parallel} parallel stream(s)...")
-            log_func.info(f"Step 4: Starting final scrape using {args.parallel} parallel stream(s)...")
-            
-            articles_to_scrape = file_manager.load_index_data(limit=args.limit)
-            if not articles_to_scrape:
-                print_fatal_error("Index is empty. Nothing to scrape.", log_func)
+            if streamed_articles is not None:
+                # Already scraped during discovery in Step 3
+                articles_to_scrape = streamed_articles
+            else:
+                print(f"\nStep 4: Starting final scrape using {args.parallel} parallel stream(s)...")
+                log_func.info(f"Step 4: Starting final scrape using {args.parallel} parallel stream(s)...")
             
-            # Log limit information if set
-            if args.limit:
-                total_articles = len(file_manager.load_index_data())
-                print(f"Limit mode: scraping {len(articles_to_scrape)} out of {total_articles} articles.")
-                log_func.info(f"Limit mode: scraping {len(articles_to_scrape)} out of {total_articles} articles.")
-                
-            # If in update mode, determine which articles need updating
-            if args.update and not args.force_reindex:
-                articles_to_scrape = file_manager.get_articles_to_scrape(articles_to_scrape, existing_meta_data, update_mode=True)
+                articles_to_scrape = file_manager.load_index_data(limit=args.limit)
                 if not articles_to_scrape:
-                    print("No articles need updating. Exiting.")
-                    log_func.info("No articles need updating.")
-                    return
-                print(f"Update mode: {len(articles_to_scrape)} articles need updating out of {len(file_manager.load_index_data())} total.")
-                log_func.info(f"Update mode: {len(articles_to_scrape)} articles need updating.")
-
-            shared_hashes = set()
-
-            if args.parallel > 1:
-                # --- Worker Pool Setup ---
-                queue = asyncio.Queue()
-                for i, article_info in enumerate(articles_to_scrape):
-                    await queue.put((article_info, i))
-
-                pbar = tqdm(total=len(articles_to_scrape), desc="Scraping Articles", unit="article")
-
-                async def worker(name, queue, pbar):
-                    scraper = Scraper(log_func, shared_hashes=shared_hashes)
-                    await scraper.connect()
-                    await scraper.login()
-                    while not queue.empty():
-                        try:
-                            article_info, index = await queue.get()
-                            await scraper.scrape_single_article(article_info, args.format, index, pbar, update_mode=args.update, rag_mode=args.rag)
-                            queue.task_done()
-                        except asyncio.CancelledError:
-                            break
-                        except Exception as e:
-                            log_func.error(f"Worker {name} error: {e}", worker=name)
-                    await scraper.close()
-
-                workers = [asyncio.create_task(worker(f'worker-{i}', queue, pbar)) for i in range(args.parallel)]
-
-                await queue.join()
-
-                for w in workers:
-                    w.cancel()
+                    print_fatal_error("Index is empty. Nothing to scrape.", log_func)
+            
+                # Log limit information if set
+                if args.limit:
+                    total_articles = file_manager.count_index_articles()
+                    print(f"Limit mode: scraping {len(articles_to_scrape)} out of {total_articles} articles.")
+                    log_func.info(f"Limit mode: scraping {len(articles_to_scrape)} out of {total_articles} articles.")
                 
-                await asyncio.gather(*workers, return_exceptions=True)
+                # If in update mode, determine which articles need updating
+                if args.update and not args.force_reindex:
+                    articles_to_scrape = file_manager.get_articles_to_scrape(articles_to_scrape, update_mode=True)
+                    if not articles_to_scrape:
+                        print("No articles need updating. Exiting.")
+                        log_func.info("No articles need updating.")
+                        run_status = "completed"
+                        return
+                    print(f"Update mode: {len(articles_to_scrape)} articles need updating out of {file_manager.count_index_articles()} total.")
+                    log_func.info(f"Update mode: {len(articles_to_scrape)} articles need updating.")
 
-                pbar.close()
-            else:
-                # Run sequentially if parallel is 1
-                with tqdm(total=len(articles_to_scrape), desc="Scraping Articles", unit="article") as pbar:
-                    scraper = Scraper(log_func, shared_hashes=shared_hashes)
-                    await scraper.connect()
-                    await scraper.login()
+                shared_hashes = set()
+                writer = OutputWriter(log_func, max_workers=args.writer_threads, fsync_policy=args.fsync)
+                pdf_pool = await start_pdf_pool(args, log_func, writer)
+
+                if args.parallel > 1:
+                    # --- Worker Pool Setup ---
+                    queue = asyncio.Queue()
                     for i, article_info in enumerate(articles_to_scrape):
-                        await scraper.scrape_single_article(article_info, args.format, i, pbar, update_mode=args.update, rag_mode=args.rag)
-                    await scraper.shutdown()
+                        await queue.put((article_info, i))
+
+                    pbar = tqdm(total=len(articles_to_scrape), desc="Scraping Articles", unit="article")
+
+                    async def worker(name, queue, pbar):
+                        scraper = Scraper(log_func, shared_hashes=shared_hashes, writer=writer, capture=args.capture_discovery, pdf_pool=pdf_pool)
+                        scrapers.append(scraper)
+                        await scraper.connect()
+                        await scraper.login()
+                        while not queue.empty():
+                            try:
+                                article_info, index = await queue.get()
+                                await scraper.scrape_single_article(article_info, args.format, index, pbar, update_mode=args.update, rag_mode=args.rag)
+                                queue.task_done()
+                            except asyncio.CancelledError:
+                                break
+                            except Exception as e:
+                                log_func.error(f"Worker {name} error: {e}", worker=name)
+                        await scraper.close()
+
+                    workers = [asyncio.create_task(worker(f'worker-{i}', queue, pbar)) for i in range(args.parallel)]
+
+                    await queue.join()
+
+                    for w in workers:
+                        w.cancel()
+                
+                    await asyncio.gather(*workers, return_exceptions=True)
+
+                    pbar.close()
+                else:
+                    # Run sequentially if parallel is 1
+                    with tqdm(total=len(articles_to_scrape), desc="Scraping Articles", unit="article") as pbar:
+                        scraper = Scraper(log_func, shared_hashes=shared_hashes, writer=writer, capture=args.capture_discovery, pdf_pool=pdf_pool)
+                        scrapers.append(scraper)
+                        await scraper.connect()
+                        await scraper.login()
+                        for i, article_info in enumerate(articles_to_scrape):
+                            await scraper.scrape_single_article(article_info, args.format, i, pbar, update_mode=args.update, rag_mode=args.rag)
+                        await scraper.shutdown()
+
+            # PDFs queued to the render pool are finished before the flush barrier
+            if pdf_pool:
+                await pdf_pool.join()
+                log_func.debug(f"PDF render pool statistics: {pdf_pool.get_statistics()}")
+
+            # Flush barrier: every article file must be on disk before the TOC references it
+            await writer.close()
+            writer_stats = writer.get_statistics()
+            print(f"Output files: {writer_stats['files_written']} written, {writer_stats['files_skipped']} unchanged.")
+            log_func.debug(f"Output writer statistics: {writer_stats}")
+
+            # Asset stage: the markdown files are on disk after the flush barrier
+            if args.download_assets and 'markdown' in args.format and articles_to_scrape:
+                print("\nDownloading images and attachments of markdown files...")
+                log_func.info("Downloading markdown assets", asset_dir=config.get_asset_dir())
+                asset_stats = await download_markdown_assets(args, log_func, articles_to_scrape)
+                print(f"Assets: {asset_stats['assets_downloaded']} downloaded, {asset_stats['assets_reused']} already stored, "
+                      f"{asset_stats['assets_failed']} failed; {asset_stats['markdown_rewritten']} markdown file(s) updated.")
+                log_func.debug(f"Asset store statistics: {asset_stats}")
 
             # --- Step 5: Create TOC and Meta files ---
             print("\nStep 5: Creating Table of Contents and metadata file...")
@@ -303,29 +645,39 @@ async def main():
             print("TOC and metadata files created.")
             log_func.info("TOC and metadata files created.")
             
-            # --- Step 5.5: Log statistics (only in sequential mode) ---
-            if args.parallel == 1 and 'scraper' in locals():
-                if hasattr(scraper, 'get_statistics'):
-                    stats = scraper.get_statistics()
-                    if args.verbose:
-                        log_func.log_statistics(stats)
-                    # Always log to file
-                    log_func.debug(f"Scraping statistics: {stats}")
+            # --- Step 5.5: Log statistics of all workers and the PDF render pool ---
+            if scrapers:
+                stats = collect_run_statistics(scrapers, pdf_pool)
+                if args.verbose:
+                    log_func.log_statistics(stats)
+                # Always log to file
+                log_func.debug(f"Scraping statistics: {stats}")
+                run_stats = stats
 
         else:
             print("\n--no-scrape flag is set. Exiting without scraping full articles.")
             log_func.info("Exiting due to --no-scrape flag.")
 
+        run_status = "completed"
+
     except SystemExit as e:
         # This is raised when dependency checks fail, so we don't need to log it as a fatal error
         pass
     except Exception as e:
         print_fatal_error(str(e), log_func)
     finally:
+        if pdf_pool:
+            await pdf_pool.close()
+        if writer:
+            writer.shutdown()
+
         # --- Step 6: Cleanup ---
         print("\nStep 6: Cleaning up temporary files...")
         log_func.info("Step 6: Cleaning up...")
         file_manager.cleanup_temp_files()
+        if run_id is not None:
+            file_manager.get_index_store().finish_run(run_id, run_status, len(articles_to_scrape), run_stats)
+        file_manager.close_index_stores()
         print("Cleanup complete.")
         log_func.info("Cleanup complete.")
         
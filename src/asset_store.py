@@ -0,0 +1,254 @@
+"""
+Content-addressed store of images and attachments referenced by markdown output.
+
+Markdown converted from article HTML keeps remote image and attachment URLs, which
+stop working offline or once the site session expires. The asset stage collects
+those links from the markdown files of a run, downloads them concurrently over a
+shared aiohttp connection pool with the cookies of the logged-in browser session,
+and rewrites the links to local copies.
+
+Files are stored once by SHA-256 of their content in out/_assets/<hh>/<hash><ext>,
+shared by all sections; _manifest.json maps each downloaded URL to its file, so a
+URL is fetched only once across runs.
+"""
+
+import asyncio
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from http.cookies import SimpleCookie
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import unquote, urljoin, urlparse
+
+import aiohttp
+from yarl import URL
+
+# File extensions of links treated as attachments (images are recognized by the ![...] syntax)
+ATTACHMENT_EXTENSIONS = (
+    ".pdf", ".zip", ".rar", ".7z", ".gz", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx",
+    ".rtf", ".odt", ".ods", ".xml", ".epf", ".erf", ".cf", ".cfe", ".cfu", ".dt", ".mxl",
+    ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".bmp",
+)
+
+# Markdown image or link: ![alt](url "title") / [text](url)
+_LINK_PATTERN = re.compile(r'(!?)\[((?:[^\]\\]|\\.)*)\]\(\s*<?([^)\s>]+)>?(\s+"[^"]*")?\s*\)')
+
+
+def _is_asset_link(is_image: bool, url: str) -> bool:
+    if url.startswith(("#", "mailto:", "data:", "javascript:")):
+        return False
+    if is_image:
+        return True
+    return os.path.splitext(urlparse(url).path)[1].lower() in ATTACHMENT_EXTENSIONS
+
+
+def find_asset_links(markdown: str, base_url: str, local_dir: Optional[str] = None) -> List[str]:
+    """
+    Returns the absolute URLs of images and attachments referenced by a markdown document.
+
+    Relative links to files that exist under local_dir (links already rewritten) are skipped.
+    """
+    urls = []
+    for match in _LINK_PATTERN.finditer(markdown):
+        url = match.group(3)
+        if local_dir and not urlparse(url).scheme and os.path.exists(os.path.join(local_dir, unquote(url))):
+            continue
+        if _is_asset_link(bool(match.group(1)), url):
+            absolute_url = urljoin(base_url, url)
+            if absolute_url.startswith(("http://", "https://")):
+                urls.append(absolute_url)
+    return urls
+
+
+def rewrite_asset_links(markdown: str, base_url: str, local_paths: Dict[str, str]) -> str:
+    """Replaces links whose absolute URL is in local_paths with the local path."""
+    def replace(match):
+        is_image, text, url, title = match.group(1), match.group(2), match.group(3), match.group(4) or ""
+        if not _is_asset_link(bool(is_image), url):
+            return match.group(0)
+        local_path = local_paths.get(urljoin(base_url, url))
+        if local_path is None:
+            return match.group(0)
+        return f"{is_image}[{text}]({local_path}{title})"
+    return _LINK_PATTERN.sub(replace, markdown)
+
+
+def local_asset_paths(markdown: str, base_url: str, markdown_dir: str, root: str,
+                      manifest: Dict[str, dict]) -> Dict[str, str]:
+    """
+    Returns URL -> path relative to markdown_dir of the document's assets already stored in root.
+
+    Only manifest entries whose file exists are returned, so the result can be passed
+    to rewrite_asset_links without downloading anything.
+    """
+    relative_paths = {}
+    for url in find_asset_links(markdown, base_url):
+        entry = manifest.get(url)
+        if entry is None:
+            continue
+        path = os.path.join(root, entry["path"])
+        if os.path.exists(path):
+            relative_paths[url] = os.path.relpath(path, markdown_dir).replace(os.sep, "/")
+    return relative_paths
+
+
+def cookie_jar_from_browser(cookies: Iterable[dict]) -> aiohttp.CookieJar:
+    """Builds an aiohttp cookie jar from Playwright context cookies, keeping their domains."""
+    jar = aiohttp.CookieJar()
+    for cookie in cookies:
+        domain = cookie["domain"].lstrip(".")
+        morsel = SimpleCookie()
+        morsel[cookie["name"]] = cookie["value"]
+        morsel[cookie["name"]]["domain"] = cookie["domain"]
+        morsel[cookie["name"]]["path"] = cookie.get("path", "/")
+        jar.update_cookies(morsel, response_url=URL(f"https://{domain}/"))
+    return jar
+
+
+class AssetStore:
+    """Downloads and stores assets by content hash and tracks them in a manifest."""
+
+    MANIFEST_NAME = "_manifest.json"
+
+    def __init__(self, root: str, log_func, connections: int = 8, cookies: Optional[Iterable[dict]] = None):
+        """
+        Initialize the store.
+
+        Args:
+            root (str): Directory of the asset files and manifest
+            log_func: The logging object (ScraperLogger instance)
+            connections (int): Maximum number of concurrent connections
+            cookies: Playwright context cookies of the authenticated session
+        """
+        if connections < 1:
+            raise ValueError("Asset store needs at least one connection")
+        self.root = root
+        self.log = log_func
+        self.connections = connections
+        self.cookies = list(cookies or [])
+        self.manifest: Dict[str, dict] = {}
+        manifest_path = os.path.join(root, self.MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        self.downloaded = 0
+        self.reused = 0
+        self.failed = 0
+        self.bytes_downloaded = 0
+
+    def local_path(self, url: str) -> Optional[str]:
+        """Returns the absolute path of the stored copy of a URL, or None."""
+        entry = self.manifest.get(url)
+        if entry is None:
+            return None
+        path = os.path.join(self.root, entry["path"])
+        return path if os.path.exists(path) else None
+
+    async def fetch_all(self, urls: Iterable[str]) -> Dict[str, str]:
+        """
+        Makes sure every URL is stored, downloading the missing ones concurrently.
+
+        Returns:
+            dict: URL -> absolute path of its local copy, for the URLs that are stored.
+        """
+        result = {}
+        missing = []
+        for url in dict.fromkeys(urls):
+            path = self.local_path(url)
+            if path is not None:
+                self.reused += 1
+                result[url] = path
+            else:
+                missing.append(url)
+        if missing:
+            connector = aiohttp.TCPConnector(limit=self.connections)
+            timeout = aiohttp.ClientTimeout(total=120)
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                             cookie_jar=cookie_jar_from_browser(self.cookies)) as session:
+                paths = await asyncio.gather(*(self._download(session, url) for url in missing))
+            result.update((url, path) for url, path in zip(missing, paths) if path is not None)
+            self.save_manifest()
+        return result
+
+    async def localize_markdown(self, documents: Iterable[tuple]) -> int:
+        """
+        Downloads the assets of markdown files and rewrites their links to the local copies.
+
+        Args:
+            documents: (markdown_path, article_url) pairs
+
+        Returns:
+            int: Number of rewritten markdown files
+        """
+        documents = [(path, url) for path, url in documents if os.path.exists(path)]
+        links = {}
+        for path, base_url in documents:
+            with open(path, "r", encoding="utf-8") as f:
+                links[path] = find_asset_links(f.read(), base_url, local_dir=os.path.dirname(path))
+        local_paths = await self.fetch_all(url for urls in links.values() for url in urls)
+
+        rewritten = 0
+        for path, base_url in documents:
+            if not any(url in local_paths for url in links[path]):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                markdown = f.read()
+            relative_paths = local_asset_paths(markdown, base_url, os.path.dirname(path), self.root, self.manifest)
+            updated = rewrite_asset_links(markdown, base_url, relative_paths)
+            if updated != markdown:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(updated)
+                rewritten += 1
+        return rewritten
+
+    def save_manifest(self):
+        """Writes the URL -> file manifest."""
+        os.makedirs(self.root, exist_ok=True)
+        manifest_path = os.path.join(self.root, self.MANIFEST_NAME)
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+
+    def get_statistics(self):
+        """Returns statistics about the assets of the run."""
+        return {
+            "assets_downloaded": self.downloaded,
+            "assets_reused": self.reused,
+            "assets_failed": self.failed,
+            "bytes_downloaded": self.bytes_downloaded,
+        }
+
+    async def _download(self, session: aiohttp.ClientSession, url: str) -> Optional[str]:
+        try:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                body = await response.read()
+                content_type = response.headers.get("Content-Type")
+        except Exception as e:
+            self.failed += 1
+            self.log.debug("Could not download asset", url=url, error=str(e))
+            return None
+        path = self._store(url, body, content_type)
+        self.downloaded += 1
+        self.bytes_downloaded += len(body)
+        return path
+
+    def _store(self, url: str, body: bytes, content_type: Optional[str]) -> str:
+        digest = hashlib.sha256(body).hexdigest()
+        extension = os.path.splitext(urlparse(url).path)[1].lower()[:10]
+        if not extension and content_type:
+            extension = mimetypes.guess_extension(content_type.split(";")[0].strip()) or ""
+        relative_path = os.path.join(digest[:2], f"{digest}{extension}")
+        path = os.path.join(self.root, relative_path)
+        if not os.path.exists(path):
+            # The same content under another URL is already stored otherwise
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        self.manifest[url] = {"path": relative_path.replace(os.sep, "/"), "content_type": content_type, "size": len(body)}
+        return path
@@ -36,6 +36,31 @@ _RETRY_COUNT = 3
 _RETRY_DELAY = 2.0  # seconds
 _REQUEST_DELAY = 0.5  # seconds
 
+# Maximum age of the persistent TOC index before it is rediscovered
+_INDEX_TTL = 7 * 24 * 3600  # seconds (default 7 days)
+
+# Number of appended metadata records between compactions of _meta.jsonl into _meta.json
+_META_COMPACT_INTERVAL = 200
+
+# Page settings passed to page.pdf(); part of the PDF fingerprint, so changing them re-renders PDFs
+_PDF_OPTIONS = {"format": "A4", "print_background": True}
+
+# Paper formats accepted by page.pdf() for --pdf-format
+PDF_PAGE_FORMATS = ("A4", "A3", "A5", "Letter", "Legal")
+
+# Keep print-view pages and their assets in the local print cache (_print_cache/)
+_PRINT_CACHE = False
+
+# Link markdown images and attachments to the shared asset store (--download-assets)
+_DOWNLOAD_ASSETS = False
+
+# Print page load timeout for PDF rendering (milliseconds); None falls back to the page timeout
+_PDF_TIMEOUT = None
+
+# Output file naming: 'ordered' (0001_Title, follows TOC order) or 'url' (stable, derived from the canonical URL)
+NAMING_SCHEMES = ("ordered", "url")
+_NAMING_SCHEME = "ordered"
+
 def set_output_dir(name):
     """Sets the dynamic output directory."""
     global dynamic_output_dir
@@ -105,10 +130,122 @@ def get_request_delay():
     """Get delay between requests in seconds."""
     return _REQUEST_DELAY
 
+def set_meta_compact_interval(interval):
+    """
+    Set how many articles are appended to the metadata log between compactions.
+
+    Args:
+        interval (int): Number of records, 0 disables periodic compaction
+    """
+    global _META_COMPACT_INTERVAL
+    if interval < 0:
+        raise ValueError("Meta compaction interval must not be negative")
+    _META_COMPACT_INTERVAL = interval
+
+def get_meta_compact_interval():
+    """Get number of metadata records appended between compactions."""
+    return _META_COMPACT_INTERVAL
+
+def set_index_ttl(ttl):
+    """
+    Set the maximum age of the persistent TOC index.
+
+    Args:
+        ttl (float): Age in seconds after which the index is rediscovered, 0 to always rediscover
+    """
+    global _INDEX_TTL
+    if ttl < 0:
+        raise ValueError("Index TTL must not be negative")
+    _INDEX_TTL = ttl
+
+def get_index_ttl():
+    """Get maximum age of the persistent TOC index in seconds."""
+    return _INDEX_TTL
+
+def set_naming_scheme(scheme):
+    """
+    Set the output file naming scheme.
+
+    Args:
+        scheme (str): 'ordered' or 'url'
+    """
+    global _NAMING_SCHEME
+    if scheme not in NAMING_SCHEMES:
+        raise ValueError(f"Naming scheme must be one of {', '.join(NAMING_SCHEMES)}")
+    _NAMING_SCHEME = scheme
+
+def get_naming_scheme():
+    """Get the output file naming scheme."""
+    return _NAMING_SCHEME
+
+def set_pdf_timeout(timeout):
+    """
+    Set the timeout for loading print pages when rendering PDFs.
+
+    Args:
+        timeout (int): Timeout in seconds, or None to use the page load timeout
+    """
+    global _PDF_TIMEOUT
+    if timeout is None:
+        _PDF_TIMEOUT = None
+        return
+    if timeout < 10 or timeout > 600:
+        raise ValueError("PDF timeout must be between 10 and 600 seconds")
+    _PDF_TIMEOUT = timeout * 1000  # Convert to milliseconds
+
+def get_pdf_timeout():
+    """Get print page load timeout for PDF rendering in milliseconds."""
+    return _PDF_TIMEOUT if _PDF_TIMEOUT is not None else get_page_timeout()
+
+def get_pdf_options():
+    """Get the page.pdf() render options (a copy)."""
+    return dict(_PDF_OPTIONS)
+
+def set_pdf_page_format(page_format):
+    """
+    Set the paper format of rendered PDFs.
+
+    Args:
+        page_format (str): One of PDF_PAGE_FORMATS
+    """
+    if page_format not in PDF_PAGE_FORMATS:
+        raise ValueError(f"PDF page format must be one of {', '.join(PDF_PAGE_FORMATS)}")
+    _PDF_OPTIONS["format"] = page_format
+
+def set_print_cache(enabled):
+    """Enable or disable storing print-view pages and their assets in the print cache."""
+    global _PRINT_CACHE
+    _PRINT_CACHE = bool(enabled)
+
+def is_print_cache_enabled():
+    """Check whether print-view pages are stored in the print cache."""
+    return _PRINT_CACHE
+
+def set_download_assets(enabled):
+    """Enable or disable linking markdown assets to their copies in the asset store."""
+    global _DOWNLOAD_ASSETS
+    _DOWNLOAD_ASSETS = bool(enabled)
+
+def is_download_assets_enabled():
+    """Check whether markdown assets are linked to the asset store."""
+    return _DOWNLOAD_ASSETS
+
 def get_tmp_index_dir():
     """Gets the temporary index directory."""
     return os.path.join(get_output_dir(), "tmp_index")
 
+def get_toc_tree_path():
+    """Gets the path to the persistent _toc_tree.json export of the index."""
+    return os.path.join(get_output_dir(), "_toc_tree.json")
+
+def get_index_db_path():
+    """Gets the path to the SQLite index and metadata store."""
+    return os.path.join(get_output_dir(), "_index.sqlite")
+
+def get_print_cache_dir():
+    """Gets the directory of cached print-view pages and assets."""
+    return os.path.join(get_output_dir(), "_print_cache")
+
 def get_json_dir():
     """Gets the JSON output directory."""
     return os.path.join(get_output_dir(), "json")
@@ -117,6 +254,14 @@ def get_pdf_dir():
     """Gets the PDF output directory."""
     return os.path.join(get_output_dir(), "pdf")
 
+def get_asset_dir():
+    """Gets the content-addressed asset store shared by all output directories (out/_assets)."""
+    return os.path.join(os.path.dirname(get_output_dir()), "_assets")
+
+def get_section_pdf_dir():
+    """Gets the output directory of combined section PDFs."""
+    return os.path.join(get_output_dir(), "pdf_sections")
+
 def get_txt_dir():
     """Gets the TXT output directory."""
     return os.path.join(get_output_dir(), "txt")
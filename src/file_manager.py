@@ -1,14 +1,68 @@
 import os
+import filecmp
 import shutil
+import hashlib
 import json
 import re
+import time
 from urllib.parse import urlparse
 import markdownify
 
 try:
     from . import config
+    from .index_store import IndexStore
+    from .utils import canonicalize_url
+    from .index_records import ArticleRecord, BreadcrumbNode
+    from .output_writer import file_has_content
+    from .print_cache import PrintCache
+    from .asset_store import AssetStore, local_asset_paths, rewrite_asset_links
 except ImportError:
     import config
+    from index_store import IndexStore
+    from utils import canonicalize_url
+    from index_records import ArticleRecord, BreadcrumbNode
+    from output_writer import file_has_content
+    from print_cache import PrintCache
+    from asset_store import AssetStore, local_asset_paths, rewrite_asset_links
+
+# Open IndexStore instances keyed by database path
+_index_stores = {}
+
+# Loaded asset store manifest: (manifest path, mtime_ns, URL -> entry)
+_asset_manifest = (None, None, {})
+
+# Article metadata rows waiting to be upserted into the index store, keyed by database path
+_pending_index_rows = {}
+
+# Number of buffered article rows that triggers a batched upsert
+INDEX_UPSERT_BATCH = 50
+
+def get_index_store(db_path=None):
+    """
+    Returns the IndexStore of the current output directory, opening it on first use.
+
+    A store created next to an existing _meta.json is seeded from it, so
+    metadata lookups work for output directories created before the store existed.
+    """
+    db_path = db_path or config.get_index_db_path()
+    store = _index_stores.get(db_path)
+    if store is None:
+        store = IndexStore(db_path)
+        _index_stores[db_path] = store
+        if not store.has_articles():
+            store.upsert_articles(iter_meta_records())
+    return store
+
+def close_index_stores():
+    """Upserts buffered article rows and closes all open IndexStore connections."""
+    flush_index_rows()
+    for store in _index_stores.values():
+        store.close()
+    _index_stores.clear()
+
+def get_print_cache():
+    """Returns the print cache (cached print-view pages and assets) of the current output directory."""
+    return PrintCache(get_index_store(), config.get_print_cache_dir())
 
 def setup_output_directories(formats, update_mode=False):
     """Cleans and creates the necessary output directories based on specified formats."""
@@ -71,15 +125,34 @@ def _save_article_json_and_txt_legacy(content, article_info):
         f.write(f"Title: {article_info['title']}\n")
         f.write(f"URL: {article_info['url']}\n\n")
         f.write(content)
-def save_article_content(filename_base, formats, soup, article_info, rag_mode=False):
+def _link_stored_assets(markdown, base_url, markdown_dir):
     """
-    Сохраняет статью в указанных форматах (txt, json, markdown, pdf) по имени файла.
-    - filename_base: базовое имя файла (без расширения)
-    - formats: список форматов (например, ['txt', 'json', 'markdown'])
-    - soup: BeautifulSoup-объект с содержимым статьи
-    - article_info: словарь с метаданными статьи
-    - rag_mode: если True, добавляет breadcrumbs в markdown файлы
+    Links the assets already in the asset store to their local copies, like the asset stage does.
+
+    An unchanged article then renders to the same text as its localized file on disk,
+    so the writer can skip it on --update runs.
+    """
+    global _asset_manifest
+    root = config.get_asset_dir()
+    manifest_path = os.path.join(root, AssetStore.MANIFEST_NAME)
+    try:
+        mtime = os.stat(manifest_path).st_mtime_ns
+    except OSError:
+        return markdown
+    if _asset_manifest[:2] != (manifest_path, mtime):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            _asset_manifest = (manifest_path, mtime, json.load(f))
+    relative_paths = local_asset_paths(markdown, base_url, markdown_dir, root, _asset_manifest[2])
+    return rewrite_asset_links(markdown, base_url, relative_paths) if relative_paths else markdown
+
+def render_article_content(filename_base, formats, soup, article_info, rag_mode=False):
     """
+    Renders the text-based output formats of an article without touching the disk.
+
+    Returns:
+        list: (path, content) tuples, one per requested text format.
+    """
+    outputs = []
     text_content = soup.get_text(separator='\n', strip=True)
     article_data = {
         'url': article_info['url'],
@@ -90,21 +163,24 @@ def save_article_content(filename_base, formats, soup, article_info, rag_mode=Fa
     # JSON
     if 'json' in formats:
         json_file = os.path.join(config.get_json_dir(), f"{filename_base}.json")
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(article_data, f, ensure_ascii=False, indent=2)
+        outputs.append((json_file, json.dumps(article_data, ensure_ascii=False, indent=2)))
 
     # TXT
     if 'txt' in formats:
         txt_file = os.path.join(config.get_txt_dir(), f"{filename_base}.txt")
-        with open(txt_file, 'w', encoding='utf-8') as f:
-            f.write(f"Title: {article_info['title']}\n")
-            f.write(f"URL: {article_info['url']}\n\n")
-            f.write(text_content)
+        txt_content = (
+            f"Title: {article_info['title']}\n"
+            f"URL: {article_info['url']}\n\n"
+            f"{text_content}"
+        )
+        outputs.append((txt_file, txt_content))
 
     # Markdown
     if 'markdown' in formats:
         md_file = os.path.join(config.get_markdown_dir(), f"{filename_base}.md")
         md_content = markdownify.markdownify(str(soup), heading_style="ATX")
+        if config.is_download_assets_enabled():
+            md_content = _link_stored_assets(md_content, article_info['url'], os.path.dirname(md_file))
         
         # Add YAML frontmatter if RAG mode is enabled
         if rag_mode:
@@ -128,25 +204,65 @@ def save_article_content(filename_base, formats, soup, article_info, rag_mode=Fa
             frontmatter = "\n".join(frontmatter_lines)
             md_content = f"{frontmatter}\n\n{md_content}"
         
-        with open(md_file, 'w', encoding='utf-8') as f:
-            f.write(md_content)
+        outputs.append((md_file, md_content))
 
     # PDF сохраняется отдельно через scraper._save_as_pdf
+    return outputs
+
+def save_article_content(filename_base, formats, soup, article_info, rag_mode=False):
+    """
+    Сохраняет статью в указанных форматах (txt, json, markdown, pdf) по имени файла.
+    - filename_base: базовое имя файла (без расширения)
+    - formats: список форматов (например, ['txt', 'json', 'markdown'])
+    - soup: BeautifulSoup-объект с содержимым статьи
+    - article_info: словарь с метаданными статьи
+    - rag_mode: если True, добавляет breadcrumbs в markdown файлы
+
+    Запись синхронная; в основном цикле скрапинга используется OutputWriter.
+    Файлы, содержимое которых не изменилось, не перезаписываются.
+    """
+    for path, content in render_article_content(filename_base, formats, soup, article_info, rag_mode=rag_mode):
+        if file_has_content(path, content):
+            continue
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+def pdf_fingerprint(soup):
+    """
+    Returns a stable fingerprint of what a PDF of the article is rendered from:
+    the article text plus the PDF render options.
+    """
+    text = soup.get_text(separator='\n', strip=True)
+    options = json.dumps(config.get_pdf_options(), sort_keys=True)
+    return hashlib.sha256(f"{options}\n{text}".encode("utf-8")).hexdigest()
+
+def is_pdf_current(url, pdf_path, fingerprint):
+    """Returns True if pdf_path exists and was rendered from a source with the same fingerprint."""
+    # Without --update the pdf/ directory was just recreated, so the index is not even consulted
+    if not os.path.exists(pdf_path):
+        return False
+    render = get_index_store().get_pdf_render(canonicalize_url(url))
+    return (render is not None and render["fingerprint"] == fingerprint
+            and render["path"] == os.path.relpath(pdf_path, config.get_output_dir()))
+
+def record_pdf_render(url, pdf_path, fingerprint):
+    """Remembers the fingerprint a PDF was rendered from, for is_pdf_current()."""
+    # Stored relative to the output directory, so moving the output tree keeps the records valid
+    relative_path = os.path.relpath(pdf_path, config.get_output_dir())
+    get_index_store().record_pdf_render(canonicalize_url(url), relative_path, fingerprint)
 
 def save_hierarchical_index(toc_tree):
-    """Saves the hierarchical TOC tree to a JSON file."""
-    index_file = os.path.join(config.get_tmp_index_dir(), "_toc_tree.json")
-    with open(index_file, 'w', encoding='utf-8') as f:
+    """Saves the hierarchical TOC tree to the index store and exports it to a JSON file."""
+    get_index_store().replace_toc(toc_tree)
+    with open(config.get_toc_tree_path(), 'w', encoding='utf-8') as f:
         json.dump(toc_tree, f, ensure_ascii=False, indent=2)
 
 def create_toc_and_meta(articles, formats):
     """Creates the _toc.md and _meta.json files."""
     # We need the original toc_tree to generate the markdown toc
-    index_file = os.path.join(config.get_tmp_index_dir(), "_toc_tree.json")
-    if not os.path.exists(index_file):
+    toc_tree = load_toc_tree()
+    if not toc_tree:
         return
-    with open(index_file, "r", encoding="utf-8") as f:
-        toc_tree = json.load(f)
 
     create_markdown_toc(toc_tree, articles, formats)
     
@@ -160,17 +276,24 @@ def create_toc_and_meta(articles, formats):
 
 def create_markdown_toc(toc_tree, articles, formats):
     """Generates the _toc.md file."""
-    url_to_filename = {article["url"]: article["filename_base"] for article in articles if "filename_base" in article}
+    # Keyed by canonical URL, so every TOC location of a deduplicated article links to its files
+    url_to_article = {canonicalize_url(article["url"]): article for article in articles if "filename_base" in article}
+    # URL-derived filenames carry no order, so the TOC shows the ordered number as a readable alias
+    show_ordered_alias = config.get_naming_scheme() == "url"
 
     with open(os.path.join(config.get_output_dir(), "_toc.md"), "w", encoding="utf-8") as f:
         f.write("# Оглавление\n\n")
         
         def write_nodes(nodes, indent_level=0):
             for node in nodes:
-                filename_base = url_to_filename.get(node["url"])
+                article = url_to_article.get(canonicalize_url(node["url"]))
                 
-                if filename_base:
-                    f.write("    " * indent_level + f"*   **{node['title']}**\n")
+                if article:
+                    filename_base = article["filename_base"]
+                    if show_ordered_alias and article.get("index") is not None:
+                        f.write("    " * indent_level + f"*   **{str(article['index']).zfill(4)} {node['title']}**\n")
+                    else:
+                        f.write("    " * indent_level + f"*   **{node['title']}**\n")
                     for format in formats:
                         # Correct relative path for the new structure
                         # Special case: markdown files are saved with .md extension
@@ -191,9 +314,241 @@ def create_markdown_toc(toc_tree, articles, formats):
         write_nodes(toc_tree)
 
 def create_meta_json(articles, formats):
-    """Generates the _meta.json file."""
-    with open(os.path.join(config.get_output_dir(), "_meta.json"), "w", encoding="utf-8") as f:
-        json.dump(articles, f, ensure_ascii=False, indent=4)
+    """Generates the _meta.json file and retires the incremental metadata log."""
+    get_index_store().upsert_articles(articles)
+    _write_meta_json(articles)
+    meta_log = get_meta_log_path()
+    if os.path.exists(meta_log):
+        os.remove(meta_log)
+
+def get_meta_json_path():
+    """Returns the path to the _meta.json file."""
+    return os.path.join(config.get_output_dir(), "_meta.json")
+
+def get_meta_log_path():
+    """Returns the path to the append-only _meta.jsonl log."""
+    return os.path.join(config.get_output_dir(), "_meta.jsonl")
+
+def _write_meta_json(records):
+    """
+    Atomically writes _meta.json with one record per line.
+
+    The result is a regular JSON array, but the line layout lets
+    iter_meta_records() stream it without parsing the whole document.
+    """
+    meta_file = get_meta_json_path()
+    tmp_file = f"{meta_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i, record in enumerate(records):
+            if i:
+                f.write(",\n")
+            f.write(json.dumps(dict(record), ensure_ascii=False))
+        f.write("\n]\n")
+    os.replace(tmp_file, meta_file)
+
+def _iter_meta_json(meta_file):
+    """Streams records from _meta.json, falling back to a full parse for the legacy indented layout."""
+    with open(meta_file, "r", encoding="utf-8") as f:
+        first_line = f.readline().strip()
+        second_line = f.readline().strip()
+        one_record_per_line = second_line.startswith("{") and second_line.rstrip(",").endswith("}")
+        if first_line == "[" and (second_line == "]" or one_record_per_line):
+            line = second_line
+            while line and line != "]":
+                yield json.loads(line.rstrip(","))
+                line = f.readline().strip()
+            return
+    with open(meta_file, "r", encoding="utf-8") as f:
+        yield from json.load(f)
+
+def _iter_meta_log(meta_log):
+    """Streams records from the _meta.jsonl log, skipping a torn last line after a crash."""
+    with open(meta_log, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+def iter_meta_records():
+    """
+    Streams the current article metadata: _meta.json overlaid with the _meta.jsonl log.
+
+    Records from the log replace records with the same URL from _meta.json.
+    """
+    meta_file = get_meta_json_path()
+    meta_log = get_meta_log_path()
+    logged = {}
+    if os.path.exists(meta_log):
+        for record in _iter_meta_log(meta_log):
+            logged[record.get("url")] = record
+    if os.path.exists(meta_file):
+        for record in _iter_meta_json(meta_file):
+            url = record.get("url")
+            if url in logged:
+                yield logged.pop(url)
+            else:
+                yield record
+    yield from logged.values()
+
+def serialize_meta_record(article_info):
+    """Serializes one article's metadata as a JSONL line."""
+    return json.dumps(dict(article_info), ensure_ascii=False) + "\n"
+
+def append_meta_record(article_info):
+    """Synchronously appends one article's metadata to the _meta.jsonl log."""
+    with open(get_meta_log_path(), "a", encoding="utf-8") as f:
+        f.write(serialize_meta_record(article_info))
+
+def compact_meta_log():
+    """
+    Folds the _meta.jsonl log into _meta.json and truncates the log.
+
+    Returns:
+        int: Number of records in the compacted _meta.json.
+    """
+    meta_log = get_meta_log_path()
+    if not os.path.exists(meta_log):
+        return 0
+    records = list(iter_meta_records())
+    _write_meta_json(records)
+    os.remove(meta_log)
+    return len(records)
+
+def flush_index_rows():
+    """Upserts the buffered article rows into their index stores, one transaction per store."""
+    while _pending_index_rows:
+        db_path, rows = _pending_index_rows.popitem()
+        get_index_store(db_path).upsert_articles(rows)
+
+async def _flush_index_rows(writer=None):
+    """Upserts the buffered article rows, in the writer's pool when there is one."""
+    if writer:
+        await writer.run_in_pool(flush_index_rows)
+    else:
+        flush_index_rows()
+
+_meta_records_since_compaction = 0
+
+async def record_article_meta(article_info, writer=None):
+    """
+    Appends a finished article's metadata to the log and compacts it periodically.
+
+    The index store row is buffered and upserted in batches of INDEX_UPSERT_BATCH
+    (and at every compaction), so finishing an article costs no SQLite commit.
+
+    Args:
+        article_info (dict): Article metadata (url, title, filename_base, content_hash, ...)
+        writer (OutputWriter, optional): Shared writer; the append and the batched
+            upserts run synchronously without it.
+    """
+    global _meta_records_since_compaction
+    rows = _pending_index_rows.setdefault(config.get_index_db_path(), [])
+    rows.append(dict(article_info))
+    if len(rows) >= INDEX_UPSERT_BATCH:
+        await _flush_index_rows(writer)
+    if writer:
+        await writer.append(get_meta_log_path(), serialize_meta_record(article_info))
+    else:
+        append_meta_record(article_info)
+
+    _meta_records_since_compaction += 1
+    interval = config.get_meta_compact_interval()
+    if interval and _meta_records_since_compaction >= interval:
+        _meta_records_since_compaction = 0
+        await _flush_index_rows(writer)
+        if writer:
+            await writer.flush()
+            await writer.run_exclusive(compact_meta_log)
+        else:
+            compact_meta_log()
+
+def _sanitize_title(title):
+    """Sanitizes a title for use in filenames."""
+    # Remove invalid characters for filenames
+    sanitized = re.sub(r'[<>:"/\\|?*]', '', title)
+    # Replace long sequences of whitespace with a single underscore
+    sanitized = re.sub(r'\s+', '_', sanitized)
+    # Truncate to a reasonable length
+    return sanitized[:100]
+
+def _url_slug(url):
+    """Builds a readable filename fragment from the path and query of a URL."""
+    parts = urlparse(url)
+    slug = parts.path + (f"_{parts.query}" if parts.query else "")
+    slug = re.sub(r'[^\w\-]+', '_', slug).strip('_')
+    # Keep the most specific (trailing) part of long paths
+    return slug[-80:].lstrip('_') or "article"
+
+def article_filename_base(index, title, url):
+    """
+    Returns the filename base of an article under the configured naming scheme.
+
+    'ordered' gives 0001_Title, which follows the TOC order and shifts when articles are
+    inserted; 'url' gives <path slug>_<hash>, derived only from the canonical URL, so a
+    file keeps its name as long as the document keeps its URL.
+    """
+    if config.get_naming_scheme() == "url" and url:
+        canonical_url = canonicalize_url(url)
+        digest = hashlib.sha1(canonical_url.encode("utf-8")).hexdigest()[:10]
+        return f"{_url_slug(canonical_url)}_{digest}"
+    # Format index with zero padding
+    index_str = str(index).zfill(4) # e.g., 0001, 0002
+    return f"{index_str}_{_sanitize_title(title)}"
+
+def _get_toc_store():
+    """Returns the index store holding the current TOC, importing _toc_tree.json if needed."""
+    store = get_index_store()
+    if store.has_toc():
+        return store
+    index_file = config.get_toc_tree_path()
+    if not os.path.exists(index_file):
+        return None
+    with open(index_file, "r", encoding="utf-8") as f:
+        store.replace_toc(json.load(f))
+    return store
+
+def iter_index_articles(limit=None):
+    """
+    Lazily yields the articles of the persistent index in numbering order.
+
+    Records are ArticleRecord objects whose breadcrumbs point into a shared
+    prefix tree, so only the current root-to-node path is held while streaming.
+
+    Args:
+        limit (int, optional): Maximum number of articles to yield. If None, yields all articles.
+    """
+    store = _get_toc_store()
+    if store is None:
+        return
+
+    # The same document under another TOC branch is fetched once; its other locations are aliases
+    aliases_by_node_id = store.alias_breadcrumbs()
+    # Nodes come in pre-order: the breadcrumb of the node at depth d extends path[d - 1]
+    path = []
+    count = 0
+    for row in store.iter_toc_nodes():
+        depth = row["depth"]
+        del path[depth:]
+        crumb = BreadcrumbNode(row["title"], path[-1] if path else None)
+        path.append(crumb)
+
+        # Only nodes that have a URL (i.e., are articles) are numbered
+        counter = row["article_index"]
+        if counter is None:
+            continue
+        filename_base = article_filename_base(counter, row["title"], row["url"])
+        article = ArticleRecord(counter, filename_base, row["title"], row["url"], crumb)
+        for breadcrumb in aliases_by_node_id.get(row["id"], ()):
+            article.add_alias(breadcrumb)
+        yield article
+        count += 1
+        if limit is not None and count >= limit:
+            return
 
 def load_index_data(limit=None):
     """
@@ -203,93 +558,169 @@ def load_index_data(limit=None):
         limit (int, optional): Maximum number of articles to return. If None, returns all articles.
     
     Returns:
-        list: List of article dictionaries to scrape.
+        list: List of article records (mapping-compatible with article dicts) to scrape.
     """
-    index_file = os.path.join(config.get_tmp_index_dir(), "_toc_tree.json")
-    if not os.path.exists(index_file):
-        return []
-        
-    with open(index_file, "r", encoding="utf-8") as f:
-        toc_tree = json.load(f)
-
-    flat_list = []
-    # Helper to sanitize titles for use in filenames
-    def sanitize_title(title):
-        # Remove invalid characters for filenames
-        sanitized = re.sub(r'[<>:"/\\|?*]', '', title)
-        # Replace long sequences of whitespace with a single underscore
-        sanitized = re.sub(r'\s+', '_', sanitized)
-        # Truncate to a reasonable length
-        return sanitized[:100]
-
-    def traverse(nodes, breadcrumbs, counter):
-        for node in nodes:
-            # Stop if we've reached the limit
-            if limit is not None and len(flat_list) >= limit:
-                return counter
-                
-            # Only process nodes that have a URL (i.e., are articles)
-            if "url" in node and node["url"]:
-                # Format index with zero padding
-                index_str = str(counter).zfill(4) # e.g., 0001, 0002
-                sanitized_title = sanitize_title(node["title"])
-                filename_base = f"{index_str}_{sanitized_title}"
-
-                article_data = {
-                    "index": counter,
-                    "filename_base": filename_base,
-                    "title": node["title"],
-                    "url": node["url"],
-                    "breadcrumb": breadcrumbs + [node["title"]],
-                }
-                flat_list.append(article_data)
-                counter += 1
-                
-                # Stop if we've reached the limit after adding this article
-                if limit is not None and len(flat_list) >= limit:
-                    return counter
-            
-            # Recursively process children, carrying the counter forward
-            if "children" in node and node["children"]:
-                counter = traverse(node["children"], breadcrumbs + [node["title"]], counter)
-                # Stop if we've reached the limit
-                if limit is not None and len(flat_list) >= limit:
-                    return counter
-        return counter
+    return list(iter_index_articles(limit=limit))
+
+def count_index_articles():
+    """Returns the number of articles in the index without flattening it (cached by the store)."""
+    store = _get_toc_store()
+    return store.count_toc_articles() if store else 0
+
+def make_streamed_article(node, breadcrumb, seq):
+    """
+    Builds article info for an article scraped while discovery is still running.
 
-    traverse(toc_tree, [], 1) # Start indexing from 1
-    return flat_list
+    Final numbering is only known once the whole tree is discovered, so the article
+    gets a provisional filename_base that finalize_streamed_articles renames later.
+    URL-derived names do not depend on numbering and are final right away.
+    """
+    if config.get_naming_scheme() == "url":
+        filename_base = article_filename_base(seq, node.get("title") or "", node.get("url"))
+    else:
+        filename_base = f"_stream_{seq:05d}_{_sanitize_title(node.get('title') or '')}"
+    return {
+        "index": seq,
+        "filename_base": filename_base,
+        "title": node.get("title"),
+        "url": node.get("url"),
+        "breadcrumb": breadcrumb,
+    }
+
+def _output_path(fmt, filename_base):
+    """Returns the output file path of an article in the given format."""
+    dirs = {
+        'json': (config.get_json_dir(), 'json'),
+        'txt': (config.get_txt_dir(), 'txt'),
+        'markdown': (config.get_markdown_dir(), 'md'),
+        'pdf': (config.get_pdf_dir(), 'pdf'),
+    }
+    dir_path, ext = dirs[fmt]
+    return os.path.join(dir_path, f"{filename_base}.{ext}")
+
+def rename_article_outputs(old_base, new_base, formats):
+    """
+    Renames the output files of an article in every format; missing files are skipped.
+
+    A target that already holds identical bytes (an unchanged article on an --update
+    run) is kept with its mtime, and the provisional file is removed instead.
+    """
+    for fmt in formats:
+        old_path = _output_path(fmt, old_base)
+        if old_base == new_base or not os.path.exists(old_path):
+            continue
+        new_path = _output_path(fmt, new_base)
+        if os.path.exists(new_path) and filecmp.cmp(old_path, new_path, shallow=False):
+            os.remove(old_path)
+        else:
+            os.replace(old_path, new_path)
+
+def finalize_streamed_articles(streamed_articles, formats):
+    """
+    Renames outputs of streamed articles to the final numbering of the saved index.
+
+    Args:
+        streamed_articles: Article infos built by make_streamed_article, after scraping
+        formats: Output formats that were written
+
+    Returns:
+        list: Articles from load_index_data that were streamed, in index order,
+        carrying the content hash and scrape time of the scrape.
+    """
+    by_url = {canonicalize_url(article["url"]): article for article in streamed_articles}
+    final_articles = []
+    for article in load_index_data():
+        streamed = by_url.pop(canonicalize_url(article["url"]), None)
+        if streamed is None:
+            continue
+        for key in ("content_hash", "scrape_time"):
+            if key in streamed:
+                article[key] = streamed[key]
+        rename_article_outputs(streamed["filename_base"], article["filename_base"], formats)
+        if "pdf" in formats:
+            # The render was recorded under the provisional name; keep it valid for --update
+            output_dir = config.get_output_dir()
+            get_index_store().move_pdf_render(
+                canonicalize_url(article["url"]),
+                os.path.relpath(_output_path("pdf", streamed["filename_base"]), output_dir),
+                os.path.relpath(_output_path("pdf", article["filename_base"]), output_dir))
+        final_articles.append(article)
+    return final_articles
+
+def load_toc_tree():
+    """Returns the hierarchical TOC tree of the persistent index, or an empty list."""
+    store = _get_toc_store()
+    return store.load_toc_tree() if store else []
+
+def get_index_age():
+    """
+    Returns the age of the persistent TOC index in seconds.
+
+    Returns:
+        float or None: Seconds since the index was built, None if there is no index.
+    """
+    store = _get_toc_store()
+    if store is None:
+        return None
+    indexed_at = store.get_meta("toc_indexed_at")
+    if indexed_at is None:
+        return None
+    return max(0.0, time.time() - float(indexed_at))
+
+def is_index_fresh(ttl=None):
+    """Returns True if a persistent index exists and is younger than ttl (config TTL by default)."""
+    if ttl is None:
+        ttl = config.get_index_ttl()
+    age = get_index_age()
+    return age is not None and age < ttl
 
 def get_index_path():
     """Returns the path to the temporary index directory."""
     return config.get_tmp_index_dir()
 
+def clear_discovery_captures():
+    """Removes article content captured during discovery, if an index store exists."""
+    if os.path.exists(config.get_index_db_path()):
+        get_index_store().clear_captures()
+
+
 def cleanup_temp_files():
-    """Removes temporary directories."""
+    """Removes temporary directories and discovery captures. The TOC index itself is persistent."""
     tmp_index_dir = config.get_tmp_index_dir()
     if os.path.exists(tmp_index_dir):
         shutil.rmtree(tmp_index_dir)
+    clear_discovery_captures()
 
 
 def load_existing_meta_data():
-    """Loads existing meta data from _meta.json if it exists."""
-    meta_file = os.path.join(config.get_output_dir(), "_meta.json")
-    if os.path.exists(meta_file):
-        with open(meta_file, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
+    """Loads existing meta data from _meta.json and any records left in the _meta.jsonl log."""
+    return list(iter_meta_records())
 
 
-def get_articles_to_scrape(articles, existing_meta_data, update_mode=False):
-    """Determines which articles need to be scraped based on content hashes and update mode."""
-    if not update_mode or not existing_meta_data:
-        return articles  # If not in update mode or no existing data, scrape all
-        
-    # Create a lookup dictionary from existing metadata
-    existing_lookup = {}
-    for article in existing_meta_data:
-        if 'url' in article:
-            existing_lookup[article['url']] = article
+def get_articles_to_scrape(articles, existing_meta_data=None, update_mode=False):
+    """
+    Determines which articles need to be scraped based on content hashes and update mode.
+
+    Existing metadata is looked up by URL in the index store unless an explicit
+    existing_meta_data list is passed.
+    """
+    if not update_mode:
+        return articles  # If not in update mode, scrape all
+
+    if existing_meta_data is None:
+        store = get_index_store()
+        if not store.has_articles():
+            return articles  # No existing data, scrape all
+        lookup_existing = store.get_article
+    else:
+        if not existing_meta_data:
+            return articles
+        # Create a lookup dictionary from existing metadata
+        existing_lookup = {}
+        for article in existing_meta_data:
+            if 'url' in article:
+                existing_lookup[article['url']] = article
+        lookup_existing = existing_lookup.get
     
     articles_to_scrape = []
     for article in articles:
@@ -298,7 +729,7 @@ def get_articles_to_scrape(articles, existing_meta_data, update_mode=False):
             articles_to_scrape.append(article)  # Include articles without URL
             continue
             
-        existing_article = existing_lookup.get(url)
+        existing_article = lookup_existing(url)
         if not existing_article:
             # New article that wasn't in previous scrape
             articles_to_scrape.append(article)
@@ -310,20 +741,27 @@ def get_articles_to_scrape(articles, existing_meta_data, update_mode=False):
     return articles_to_scrape
 
 
-def should_force_reindex(toc_tree, existing_meta_data):
-    """Checks if the TOC structure has changed significantly to warrant a force reindex."""
-    if not existing_meta_data:
+def should_force_reindex(toc_tree, existing_meta_data=None):
+    """
+    Checks if the TOC structure has changed significantly to warrant a force reindex.
+
+    Existing URLs come from the index store unless existing_meta_data is passed.
+    """
+    if existing_meta_data is None:
+        existing_urls = {canonicalize_url(url) for url in get_index_store().article_urls()}
+    else:
+        # Create mapping of URLs to articles from existing metadata
+        existing_urls = set(canonicalize_url(article['url']) for article in existing_meta_data if 'url' in article)
+    if not existing_urls:
         return False  # First time, don't force reindex since we want to process normally
-        
-    # Create mapping of URLs to articles from existing metadata
-    existing_urls = set(article['url'] for article in existing_meta_data if 'url' in article)
+
     new_urls = set()
     
     # Helper to collect all URLs from the TOC tree
     def collect_urls(nodes):
         for node in nodes:
             if 'url' in node and node['url']:
-                new_urls.add(node['url'])
+                new_urls.add(canonicalize_url(node['url']))
             if 'children' in node and node['children']:
                 collect_urls(node['children'])
     
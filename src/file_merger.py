@@ -3,29 +3,88 @@
 """
 
 import os
+import io
 import json
 import gzip
+import mmap
 import shutil
+from bisect import bisect_right, insort
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Generator
+from typing import List, Dict, Any, Optional, Generator, Iterable, NamedTuple, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 import logging
 
+from tqdm import tqdm
+
+try:
+    from .merge_manifest import MergeManifest, file_digest
+    from .token_counter import TokenCounter
+except ImportError:
+    from merge_manifest import MergeManifest, file_digest
+    from token_counter import TokenCounter
+
+
+# Расширения файлов, объединяемых без фильтра
+SUPPORTED_EXTENSIONS = (".json", ".txt", ".md", ".csv")
+
+# Стратегии группировки: последовательное заполнение, упаковка first-fit decreasing
+# и best-fit decreasing, последовательная упаковка целых поддеревьев оглавления
+GROUP_STRATEGIES = ("sequential", "ffd", "bfd", "subtree")
+
+# Поля записей _meta.json, переносимые в записи JSONL
+JSONL_META_FIELDS = ("url", "title", "breadcrumb", "content_hash")
+
+# Сжатие выходных файлов: расширение и допустимые уровни (zstd требует пакет zstandard)
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+COMPRESSION_LEVELS = {"gzip": range(0, 10), "zstd": range(1, 23)}
+
+# Размер блока копирования, когда копирование средствами ядра недоступно (сжатый вывод)
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class FileStat(NamedTuple):
+    """Размер и время изменения файла, полученные один раз при обходе директории."""
+    size: int
+    mtime: float
+
 
 @dataclass
 class MergeConfig:
     """Конфигурация для объединения файлов."""
     max_files: int = 100
     max_size_mb: float = 50.0
-    output_format: str = "json"
+    output_format: str = "json"  # json, jsonl, markdown, txt
     separator: str = "\n---\n"
     include_headers: bool = True
     sort_by: str = "name"  # name, size, date
     filter_pattern: Optional[str] = None
     preserve_structure: bool = False
-    compress_output: bool = False
+    compress_output: bool = False  # совместимость: то же, что compression="gzip"
+    compression: Optional[str] = None  # gzip, zstd или None
+    compression_level: Optional[int] = None  # None - уровень библиотеки по умолчанию (gzip 9, zstd 3)
     output_dir: Optional[str] = None
+    workers: int = 1  # число процессов объединения групп; 0 - по числу ядер
+    incremental: bool = False  # пересобирать только измененные группы по манифесту
+    max_tokens: Optional[int] = None  # бюджет токенов на группу (None - без ограничения)
+    tokenizer: str = "heuristic"  # heuristic или tiktoken:<кодировка>
+    group_strategy: str = "sequential"  # sequential, ffd, bfd, subtree
+
+
+# Параметры MergeConfig, от которых зависит содержимое групп; при их изменении
+# инкрементальное объединение пересобирает все группы
+_MANIFEST_SETTINGS = ("max_files", "max_size_mb", "output_format", "separator", "include_headers",
+                      "sort_by", "filter_pattern", "compress_output", "compression", "compression_level", "max_tokens", "tokenizer",
+                      "group_strategy")
+
+
+@dataclass
+class PlannedGroup:
+    """Группа плана объединения: номер, файлы и существующий результат, если пересборка не нужна."""
+    number: int
+    files: List[Path]
+    reused_output: Optional[Path] = None
 
 
 class FileMerger:
@@ -34,6 +93,17 @@ class FileMerger:
     def __init__(self, config: MergeConfig = None):
         self.config = config or MergeConfig()
         self.logger = logging.getLogger(__name__)
+        # Таблица размеров и дат файлов, заполняемая при обходе и используемая
+        # сортировкой, группировкой, статистикой и заголовками
+        self._stats: Dict[Path, FileStat] = {}
+        # SHA-256 файлов, посчитанные в текущем запуске
+        self._digests: Dict[Path, str] = {}
+        # Итоги последнего merge_files: пересобранные, неизмененные и удаленные группы
+        self.last_merge_summary: Dict[str, int] = {}
+        # Счетчик токенов с кэшем по файлам; создается при заданном max_tokens
+        self._token_counter: Optional[TokenCounter] = None
+        # Записи _meta.json по имени файла без расширения (для стратегии subtree и формата jsonl)
+        self._article_meta: Dict[str, Dict[str, Any]] = {}
         
     def merge_files(self, input_dir: str, output_dir: str = None, 
                    config: MergeConfig = None) -> List[str]:
@@ -54,6 +124,10 @@ class FileMerger:
         input_path = Path(input_dir)
         if not input_path.exists():
             raise FileNotFoundError(f"Директория {input_dir} не найдена")
+        # Ошибки параметров сжатия выявляются до объединения групп
+        self._compression()
+        # Хэши прошлого вызова могли устареть: файлы между объединениями меняются
+        self._digests.clear()
             
         # Получаем список файлов для обработки
         files = self._get_files_to_process(input_path)
@@ -61,19 +135,42 @@ class FileMerger:
             self.logger.warning(f"Файлы для объединения не найдены в {input_dir}")
             return []
             
-        # Группируем файлы по ограничениям
-        groups = self._group_files(files)
-        
         # Определяем выходную директорию с сохранением структуры
         output_path = self._get_output_path(input_path, output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
-        
-        # Объединяем группы
-        merged_files = []
-        for i, group in enumerate(groups):
-            merged_file = self._merge_group(group, output_path, i + 1)
-            if merged_file:
-                merged_files.append(str(merged_file))
+        token_counter = self._get_token_counter()
+        if token_counter:
+            token_counter.load(output_path)
+
+        # Группируем файлы по ограничениям; с манифестом сохраняем прежние границы групп
+        previous = MergeManifest.load(output_path)
+        settings = self._manifest_settings()
+        if self.config.incremental and previous is not None and previous.settings == settings:
+            plan = self._plan_incremental(files, input_path, output_path, previous)
+        else:
+            plan = [PlannedGroup(i + 1, group) for i, group in enumerate(self._group_files(files))]
+        groups = [planned.files for planned in plan]
+        if token_counter:
+            token_counter.save(output_path)
+
+        # Объединяем только группы без готового результата
+        rebuild = [planned for planned in plan if planned.reused_output is None]
+        built = self._merge_groups([(planned.number, planned.files) for planned in rebuild], output_path)
+        outputs = {planned.number: planned.reused_output for planned in plan}
+        outputs.update((planned.number, output) for planned, output in zip(rebuild, built))
+        merged_files = [str(outputs[planned.number]) for planned in plan if outputs[planned.number]]
+
+        if self.config.incremental:
+            removed = self._save_manifest(plan, outputs, input_path, output_path, previous, settings)
+        else:
+            # Полная пересборка меняет границы групп, и прежний манифест больше им не соответствует
+            removed = 0
+            MergeManifest.remove(output_path)
+        self.last_merge_summary = {
+            "groups_rebuilt": len(rebuild),
+            "groups_reused": len(plan) - len(rebuild),
+            "groups_removed": removed,
+        }
         
         # Копируем метаданные файлы (_toc.md, _meta.json) в родительскую директорию
         parent_output_path = output_path.parent
@@ -86,54 +183,452 @@ class FileMerger:
         return merged_files
         
     def _get_files_to_process(self, input_path: Path) -> List[Path]:
-        """Получает список файлов для обработки."""
-        files = []
-        
+        """Получает список файлов для обработки за один обход директории."""
         if self.config.filter_pattern:
-            pattern = self.config.filter_pattern.replace("*", "")
-            files = list(input_path.rglob(f"*{pattern}"))
+            suffixes = (self.config.filter_pattern.replace("*", ""),)
         else:
-            # Поддерживаемые расширения
-            extensions = [".json", ".txt", ".md", ".csv"]
-            for ext in extensions:
-                files.extend(input_path.rglob(f"*{ext}"))
-                
-        # Сортируем файлы
+            suffixes = SUPPORTED_EXTENSIONS
+
+        # Таблица относится только к текущему обходу
+        self._stats.clear()
+        files = []
+        for file_path, file_stat in self._scan_files(input_path, suffixes):
+            self._stats[file_path] = file_stat
+            files.append(file_path)
+
+        # Сортируем файлы; при равных ключах порядок задает полный путь
         if self.config.sort_by == "size":
-            files.sort(key=lambda f: f.stat().st_size)
+            files.sort(key=lambda f: (self._stats[f].size, str(f)))
         elif self.config.sort_by == "date":
-            files.sort(key=lambda f: f.stat().st_mtime)
+            files.sort(key=lambda f: (self._stats[f].mtime, str(f)))
         else:  # name
-            files.sort(key=lambda f: f.name)
+            files.sort(key=lambda f: (f.name, str(f)))
+
+        if self.config.group_strategy == "subtree" or self.config.output_format == "jsonl":
+            self._article_meta = self._load_article_meta(input_path)
             
         return files
+
+    @staticmethod
+    def _find_metadata_file(input_path: Path, name: str) -> Optional[Path]:
+        """Ищет файл метаданных во входной директории или ее родителе (out/section/ для out/section/json/)."""
+        for search_path in (input_path, input_path.parent):
+            if (search_path / name).exists():
+                return search_path / name
+        return None
+
+    def _load_article_meta(self, input_path: Path) -> Dict[str, Dict[str, Any]]:
+        """Загружает записи статей из _meta.json по filename_base; пустой словарь, если файла нет."""
+        meta_file = self._find_metadata_file(input_path, "_meta.json")
+        if meta_file is None:
+            return {}
+        try:
+            with open(meta_file, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Не удалось прочитать {meta_file}: {e}")
+            return {}
+        return {record["filename_base"]: record for record in records if record.get("filename_base")}
+
+    def _scan_files(self, root: Path, suffixes: Tuple[str, ...]) -> Generator[Tuple[Path, FileStat], None, None]:
+        """Обходит дерево директорий через os.scandir и возвращает файлы с нужными окончаниями имени."""
+        stack = [str(root)]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.endswith(suffixes) and entry.is_file():
+                            entry_stat = entry.stat()
+                            yield Path(entry.path), FileStat(entry_stat.st_size, entry_stat.st_mtime)
+            except OSError as e:
+                self.logger.error(f"Ошибка чтения директории {directory}: {e}")
+
+    def _file_stat(self, file_path: Path) -> FileStat:
+        """Возвращает размер и дату файла из таблицы обхода (или stat() для файла вне ее)."""
+        file_stat = self._stats.get(file_path)
+        if file_stat is None:
+            st = file_path.stat()
+            file_stat = self._stats[file_path] = FileStat(st.st_size, st.st_mtime)
+        return file_stat
+
+    def _total_size(self, files: Iterable[Path]) -> int:
+        """Возвращает суммарный размер файлов в байтах."""
+        return sum(self._file_stat(f).size for f in files)
         
+    def _get_token_counter(self) -> Optional[TokenCounter]:
+        """Возвращает счетчик токенов, если задан бюджет токенов (None - без ограничения)."""
+        if self.config.max_tokens is None:
+            return None
+        if self.config.max_tokens <= 0:
+            raise ValueError("Бюджет токенов на группу должен быть положительным")
+        if self._token_counter is None or self._token_counter.name != (self.config.tokenizer or "heuristic"):
+            self._token_counter = TokenCounter(self.config.tokenizer)
+        return self._token_counter
+
+    def _file_tokens(self, file_path: Path) -> int:
+        """
+        Возвращает число токенов файла в объединенном выводе: содержимое (из кэша
+        счетчика), разделитель и заголовок с именем файла.
+        """
+        counter = self._get_token_counter()
+        if counter is None:
+            return 0
+        file_stat = self._file_stat(file_path)
+        tokens = counter.count_file(file_path, file_stat.size, file_stat.mtime)
+        tokens += counter.count_text(self.config.separator)
+        if self.config.include_headers:
+            tokens += counter.count_text(f"# {file_path.stem}") + 1
+        return tokens
+
+    def _exceeds_limits(self, count: int, size: int, tokens: int, file_size: int, file_tokens: int,
+                        file_count: int = 1) -> bool:
+        """
+        Проверяет, выйдет ли группа (count файлов, size байт, tokens токенов) за ограничения,
+        если добавить file_count файлов суммарным размером file_size и file_tokens токенов.
+        """
+        if count + file_count > self.config.max_files:
+            return True
+        if size + file_size > self.config.max_size_mb * 1024 * 1024:
+            return True
+        return self.config.max_tokens is not None and tokens + file_tokens > self.config.max_tokens
+
+    def _fill_ratio(self, count: int, size: int, tokens: int) -> float:
+        """Возвращает заполненность группы: долю самого исчерпанного из ограничений."""
+        ratio = max(count / self.config.max_files, size / (self.config.max_size_mb * 1024 * 1024))
+        if self.config.max_tokens is not None:
+            ratio = max(ratio, tokens / self.config.max_tokens)
+        return ratio
+
+    def _file_weight(self, file_path: Path) -> Tuple[int, int]:
+        """Возвращает размер и число токенов файла; предупреждает о файле больше бюджета токенов."""
+        file_tokens = self._file_tokens(file_path)
+        if self.config.max_tokens is not None and file_tokens > self.config.max_tokens:
+            self.logger.warning(f"Файл {file_path} (~{file_tokens} токенов) больше бюджета группы "
+                                f"{self.config.max_tokens} токенов")
+        return self._file_stat(file_path).size, file_tokens
+
     def _group_files(self, files: List[Path]) -> List[List[Path]]:
-        """Группирует файлы по ограничениям."""
+        """
+        Группирует файлы по ограничениям выбранной стратегией (MergeConfig.group_strategy).
+
+        Файл, который сам по себе выходит за ограничения, образует отдельную группу.
+        """
+        strategy = self.config.group_strategy
+        if strategy not in GROUP_STRATEGIES:
+            raise ValueError(f"Неизвестная стратегия группировки: {strategy} (доступны: {', '.join(GROUP_STRATEGIES)})")
+        if strategy in ("ffd", "bfd"):
+            return self._pack_groups(files, best_fit=strategy == "bfd")
+        if strategy == "subtree":
+            return self._group_by_subtree(files)
+        return self._group_sequential(files)
+
+    def _group_sequential(self, files: List[Path]) -> List[List[Path]]:
+        """
+        Заполняет группы по порядку файлов: группа закрывается, как только следующий
+        файл выходит за ограничения (количество, размер, бюджет токенов).
+        """
         groups = []
         current_group = []
         current_size = 0
+        current_tokens = 0
         
         for file_path in files:
-            file_size = file_path.stat().st_size
+            file_size, file_tokens = self._file_weight(file_path)
             
             # Проверяем ограничения
-            size_exceeded = (current_size + file_size) > (self.config.max_size_mb * 1024 * 1024)
-            count_exceeded = len(current_group) >= self.config.max_files
-            
-            if (size_exceeded or count_exceeded) and current_group:
+            if current_group and self._exceeds_limits(len(current_group), current_size, current_tokens,
+                                                      file_size, file_tokens):
                 groups.append(current_group)
                 current_group = []
                 current_size = 0
+                current_tokens = 0
                 
             current_group.append(file_path)
             current_size += file_size
+            current_tokens += file_tokens
             
         if current_group:
             groups.append(current_group)
             
         return groups
+
+    def _pack_groups(self, files: List[Path], best_fit: bool = False) -> List[List[Path]]:
+        """
+        Упаковывает файлы в группы first-fit decreasing (или best-fit decreasing).
+
+        Файлы рассматриваются от самых "тяжелых" (по доле самого исчерпанного ограничения)
+        и кладутся в первую группу, где помещаются (best-fit: в группу, которая станет самой
+        заполненной). Заполненные до предела группы больше не просматриваются. Внутри группы
+        и между группами сохраняется исходный порядок файлов (по первому файлу группы).
+
+        Если входные файлы могут исчерпать только одно ограничение, best-fit находит группу
+        делением пополам по заполненности этого ограничения; если несколько, то просматривает
+        все открытые группы: группа, почти заполненная по одному ограничению, может вместить
+        файл, тяжелый по другому.
+        """
+        weights = [self._file_weight(file_path) for file_path in files]
+        order = sorted(range(len(files)), key=lambda i: (-self._fill_ratio(1, *weights[i]), i))
+        bins: List[List[Any]] = []  # [индексы файлов, размер, токены]
+        # Открытые группы: ffd - номера в порядке создания, bfd - (заполненность, -номер) по возрастанию
+        open_bins: List[Any] = []
+
+        caps = (self.config.max_files, self.config.max_size_mb * 1024 * 1024, self.config.max_tokens)
+        totals = (len(files), sum(w[0] for w in weights), sum(w[1] for w in weights))
+        reachable = [d for d in range(len(caps)) if caps[d] is not None and totals[d] > caps[d]]
+        # Ограничение, по которому упорядочены открытые группы bfd (None - просмотр всех групп)
+        limit_dim = reachable[0] if len(reachable) == 1 else None
+
+        def bin_fill(count, size, tokens):
+            if limit_dim is None:
+                return self._fill_ratio(count, size, tokens)
+            return (count, size, tokens)[limit_dim] / caps[limit_dim]
+
+        for i in order:
+            file_size, file_tokens = weights[i]
+
+            def fits(b):
+                return not self._exceeds_limits(len(bins[b][0]), bins[b][1], bins[b][2], file_size, file_tokens)
+
+            if best_fit and limit_dim is not None:
+                # Остальные ограничения не исчерпать даже всеми файлами, поэтому файл помещается
+                # во все группы с заполненностью не больше 1 - доля файла; берем самую заполненную
+                limit = 1 - bin_fill(1, file_size, file_tokens) + 1e-9
+                pos = bisect_right(open_bins, (limit, 0))
+                found = next((j for j in range(pos - 1, -1, -1) if fits(-open_bins[j][1])), None)
+                target = -open_bins.pop(found)[1] if found is not None else None
+            elif best_fit:
+                def fill_with_file(j):
+                    entry = bins[-open_bins[j][1]]
+                    return self._fill_ratio(len(entry[0]) + 1, entry[1] + file_size, entry[2] + file_tokens)
+
+                candidates = (j for j in range(len(open_bins)) if fits(-open_bins[j][1]))
+                # При равной заполненности - группа, созданная раньше
+                found = max(candidates, key=lambda j: (fill_with_file(j), open_bins[j][1]), default=None)
+                target = -open_bins.pop(found)[1] if found is not None else None
+            else:
+                target = next((b for b in open_bins if fits(b)), None)
+            if target is None:
+                target = len(bins)
+                bins.append([[], 0, 0])
+                if not best_fit:
+                    open_bins.append(target)
+
+            entry = bins[target]
+            entry[0].append(i)
+            entry[1] += file_size
+            entry[2] += file_tokens
+            fill = self._fill_ratio(len(entry[0]), entry[1], entry[2])
+            if best_fit and fill < 1:
+                insort(open_bins, (bin_fill(len(entry[0]), entry[1], entry[2]), -target))
+            elif not best_fit and fill >= 1:
+                open_bins.remove(target)
+
+        groups = [sorted(b[0]) for b in bins]
+        groups.sort(key=lambda indices: indices[0])
+        return [[files[i] for i in indices] for indices in groups]
+
+    def _subtree_key(self, file_path: Path) -> str:
+        """Возвращает раздел оглавления файла: первый элемент breadcrumb из _meta.json или его директорию."""
+        record = self._article_meta.get(file_path.stem)
+        if record and record.get("breadcrumb"):
+            return record["breadcrumb"][0]
+        return str(file_path.parent)
+
+    def _group_by_subtree(self, files: List[Path]) -> List[List[Path]]:
+        """
+        Последовательно упаковывает поддеревья оглавления.
+
+        Поддерево (все файлы одного раздела, в порядке списка; разделы - в порядке
+        первого файла, даже если сортировка разнесла их файлы) добавляется в текущую группу,
+        только если помещается в нее целиком; иначе оно начинает новую группу, а
+        поддерево больше группы заполняет группы последовательно.
+        """
+        groups = []
+        current_group = []
+        current_size = 0
+        current_tokens = 0
+
+        subtrees: Dict[str, List[Path]] = {}
+        for file_path in files:
+            subtrees.setdefault(self._subtree_key(file_path), []).append(file_path)
+
+        for subtree in subtrees.values():
+            weights = [self._file_weight(file_path) for file_path in subtree]
+            subtree_size = sum(w[0] for w in weights)
+            subtree_tokens = sum(w[1] for w in weights)
+            if current_group and self._exceeds_limits(len(current_group), current_size, current_tokens,
+                                                      subtree_size, subtree_tokens, len(subtree)):
+                groups.append(current_group)
+                current_group = []
+                current_size = 0
+                current_tokens = 0
+
+            for file_path, (file_size, file_tokens) in zip(subtree, weights):
+                if current_group and self._exceeds_limits(len(current_group), current_size, current_tokens,
+                                                          file_size, file_tokens):
+                    groups.append(current_group)
+                    current_group = []
+                    current_size = 0
+                    current_tokens = 0
+                current_group.append(file_path)
+                current_size += file_size
+                current_tokens += file_tokens
+
+        if current_group:
+            groups.append(current_group)
+
+        return groups
         
+    def _worker_count(self) -> int:
+        """Возвращает число процессов объединения (0 в конфигурации - по числу ядер)."""
+        if self.config.workers < 0:
+            raise ValueError("Число процессов объединения не может быть отрицательным")
+        return self.config.workers or os.cpu_count() or 1
+
+    def _merge_groups(self, groups: List[Tuple[int, List[Path]]], output_path: Path) -> List[Optional[Path]]:
+        """
+        Объединяет группы (номер, файлы) последовательно или в пуле процессов.
+
+        Номер группы (и имя выходного файла) задан заранее, а результаты возвращаются
+        в порядке списка, поэтому результат не зависит от числа процессов и порядка
+        их завершения.
+        """
+        workers = min(self._worker_count(), len(groups))
+        with tqdm(total=len(groups), desc="Объединение групп", unit="группа", disable=None) as pbar:
+            if workers <= 1:
+                results = []
+                for group_num, group in groups:
+                    results.append(self._merge_group(group, output_path, group_num))
+                    pbar.update(1)
+                return results
+
+            results = [None] * len(groups)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # Процессу передаются размеры и метаданные файлов группы, чтобы не повторять stat() и чтение _meta.json
+                futures = {
+                    executor.submit(_merge_group_in_worker, self.config, group, output_path, group_num,
+                                    {f: self._stats[f] for f in group if f in self._stats},
+                                    {f.stem: self._article_meta[f.stem] for f in group if f.stem in self._article_meta}): i
+                    for i, (group_num, group) in enumerate(groups)
+                }
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+                    pbar.update(1)
+            return results
+
+    def _manifest_settings(self) -> Dict[str, Any]:
+        """Возвращает параметры конфигурации, которые записываются в манифест."""
+        return {name: getattr(self.config, name) for name in _MANIFEST_SETTINGS}
+
+    @staticmethod
+    def _relative_name(file_path: Path, input_path: Path) -> str:
+        return file_path.relative_to(input_path).as_posix()
+
+    def _manifest_entry(self, file_path: Path, input_path: Path,
+                        previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Возвращает запись файла для манифеста.
+
+        Если размер и время изменения совпадают с прежней записью, хэш берется из нее;
+        иначе содержимое хэшируется заново.
+        """
+        file_stat = self._file_stat(file_path)
+        if previous and previous["size"] == file_stat.size and previous["mtime"] == file_stat.mtime:
+            digest = previous["digest"]
+        else:
+            digest = self._digests.get(file_path)
+            if digest is None:
+                digest = self._digests[file_path] = file_digest(file_path)
+        return {"path": self._relative_name(file_path, input_path), "size": file_stat.size,
+                "mtime": file_stat.mtime, "digest": digest}
+
+    def _plan_incremental(self, files: List[Path], input_path: Path, output_path: Path,
+                          previous: MergeManifest) -> List[PlannedGroup]:
+        """
+        Планирует инкрементальное объединение по манифесту прошлого запуска.
+
+        Группы сохраняют номера и состав; группа пересобирается, если из нее удален файл,
+        изменилось содержимое какого-либо файла, она вышла за ограничения или пропал ее
+        выходной файл. Новые файлы и файлы, не поместившиеся в прежнюю группу, образуют
+        новые группы с номерами после существующих.
+        """
+        current = {self._relative_name(f, input_path): f for f in files}
+        assigned = set()
+        plan = []
+        for group in previous.groups:
+            members = []
+            changed = False
+            for old_entry in group["files"]:
+                file_path = current.get(old_entry["path"])
+                if file_path is None:
+                    changed = True
+                    continue
+                if self._manifest_entry(file_path, input_path, old_entry)["digest"] != old_entry["digest"]:
+                    changed = True
+                members.append(file_path)
+
+            # Группа, выросшая за ограничения, сохраняет начало; остаток уходит в новые группы
+            kept = []
+            kept_size = 0
+            kept_tokens = 0
+            for file_path in members:
+                file_size = self._file_stat(file_path).size
+                file_tokens = self._file_tokens(file_path)
+                if kept and self._exceeds_limits(len(kept), kept_size, kept_tokens, file_size, file_tokens):
+                    changed = True
+                    break
+                kept.append(file_path)
+                kept_size += file_size
+                kept_tokens += file_tokens
+            if not kept:
+                continue
+
+            output_file = output_path / group["output"]
+            if not output_file.exists():
+                changed = True
+            assigned.update(kept)
+            plan.append(PlannedGroup(group["number"], kept, None if changed else output_file))
+
+        new_files = [f for f in files if f not in assigned]
+        next_number = previous.next_number()
+        for i, group in enumerate(self._group_files(new_files)):
+            plan.append(PlannedGroup(next_number + i, group))
+        return plan
+
+    def _save_manifest(self, plan: List[PlannedGroup], outputs: Dict[int, Optional[Path]], input_path: Path,
+                       output_path: Path, previous: Optional[MergeManifest], settings: Dict[str, Any]) -> int:
+        """
+        Записывает манифест объединения и удаляет выходные файлы групп, которых больше нет.
+
+        Returns:
+            Количество удаленных выходных файлов
+        """
+        previous_entries = previous.file_entries() if previous else {}
+        groups = []
+        for planned in plan:
+            output_file = outputs[planned.number]
+            if output_file is None:
+                continue
+            files = [
+                self._manifest_entry(f, input_path, previous_entries.get(self._relative_name(f, input_path)))
+                for f in planned.files
+            ]
+            groups.append({"number": planned.number, "output": Path(output_file).name, "files": files})
+
+        removed = 0
+        current_outputs = {group["output"] for group in groups}
+        for group in (previous.groups if previous else []):
+            stale_file = output_path / group["output"]
+            if group["output"] not in current_outputs and stale_file.exists():
+                stale_file.unlink()
+                removed += 1
+
+        MergeManifest(settings, groups).save(output_path)
+        return removed
+
     def _copy_metadata_files(self, input_path: Path, output_path: Path) -> List[str]:
         """
         Копирует метаданные файлы (_toc.md, _meta.json) в выходную директорию.
@@ -214,8 +709,14 @@ class FileMerger:
         # Если не нашли "out/", используем имя входной директории
         return base_path / input_path.name
         
-    def _merge_group(self, files: List[Path], output_path: Path, group_num: int) -> Optional[Path]:
-        """Объединяет группу файлов в один файл."""
+    def _merge_group(self, files: List[Path], output_path: Path, group_num: int,
+                     multithreaded: bool = True) -> Optional[Path]:
+        """
+        Объединяет группу файлов в один файл.
+
+        multithreaded - можно ли сжатию zstd занимать потоки процессора (группы не
+        объединяются одновременно в пуле процессов).
+        """
         if not files:
             return None
             
@@ -223,13 +724,15 @@ class FileMerger:
         output_format = self._determine_output_format(files)
             
         if output_format == "json":
-            return self._merge_json_group(files, output_path, group_num)
+            return self._merge_json_group(files, output_path, group_num, multithreaded)
+        elif output_format == "jsonl":
+            return self._merge_jsonl_group(files, output_path, group_num, multithreaded)
         elif output_format == "markdown":
-            return self._merge_markdown_group(files, output_path, group_num)
+            return self._merge_markdown_group(files, output_path, group_num, multithreaded)
         elif output_format == "txt":
-            return self._merge_txt_group(files, output_path, group_num)
+            return self._merge_txt_group(files, output_path, group_num, multithreaded)
         else:
-            return self._merge_generic_group(files, output_path, group_num)
+            return self._merge_generic_group(files, output_path, group_num, multithreaded)
             
     def _determine_output_format(self, files: List[Path]) -> str:
         """Определяет формат выходного файла на основе входных файлов."""
@@ -250,121 +753,241 @@ class FileMerger:
             # Смешанные форматы - используем JSON как универсальный
             return "json"
             
-    def _merge_json_group(self, files: List[Path], output_path: Path, group_num: int) -> Path:
-        """Объединяет группу файлов в JSON формат."""
-        merged_data = {
-            "metadata": {
-                "total_files": len(files),
-                "total_size_mb": sum(f.stat().st_size for f in files) / (1024 * 1024),
-                "created_at": datetime.now().isoformat(),
-                "group_number": group_num,
-                "source_files": [f.name for f in files]
-            },
-            "files": []
+    def _compression(self) -> Optional[str]:
+        """Возвращает метод сжатия (compress_output без compression означает gzip)."""
+        compression = self.config.compression or ("gzip" if self.config.compress_output else None)
+        if compression is None:
+            return None
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Неизвестный метод сжатия: {compression} (доступны: {', '.join(COMPRESSION_SUFFIXES)})")
+        level = self.config.compression_level
+        if level is not None and level not in COMPRESSION_LEVELS[compression]:
+            levels = COMPRESSION_LEVELS[compression]
+            raise ValueError(f"Уровень сжатия {compression} должен быть от {levels[0]} до {levels[-1]}")
+        if compression == "zstd":
+            _load_zstandard()
+        return compression
+
+    def _open_output(self, output_path: Path, filename: str,
+                     multithreaded: bool = True) -> Tuple[Path, io.BufferedIOBase]:
+        """
+        Открывает выходной файл группы как двоичный поток.
+
+        При сжатии данные сжимаются по мере записи, без промежуточного несжатого файла;
+        zstd использует потоки процессора, если multithreaded (группы не объединяются
+        одновременно в пуле процессов).
+        """
+        compression = self._compression()
+        if compression is None:
+            output_file = output_path / filename
+            return output_file, open(output_file, 'wb')
+
+        output_file = output_path / (filename + COMPRESSION_SUFFIXES[compression])
+        level = self.config.compression_level
+        if compression == "gzip":
+            return output_file, gzip.open(output_file, 'wb', compresslevel=9 if level is None else level)
+
+        threads = -1 if multithreaded else 0
+        compressor = _load_zstandard().ZstdCompressor(level=3 if level is None else level, threads=threads)
+        return output_file, compressor.stream_writer(open(output_file, 'wb'))
+
+    def _open_text_output(self, output_path: Path, filename: str,
+                          multithreaded: bool = True) -> Tuple[Path, io.TextIOWrapper]:
+        """Открывает выходной файл группы (со сжатием, если оно задано) для записи текста в UTF-8."""
+        output_file, stream = self._open_output(output_path, filename, multithreaded)
+        return output_file, io.TextIOWrapper(stream, encoding='utf-8')
+
+    def _merge_json_group(self, files: List[Path], output_path: Path, group_num: int,
+                          multithreaded: bool = True) -> Path:
+        """
+        Объединяет группу файлов в JSON формат.
+
+        Файл пишется потоково: сначала метаданные, затем записи файлов по одной,
+        поэтому в памяти одновременно находится только один исходный файл.
+        """
+        metadata = {
+            "total_files": len(files),
+            "total_size_mb": self._total_size(files) / (1024 * 1024),
+            "created_at": datetime.now().isoformat(),
+            "group_number": group_num,
+            "source_files": [f.name for f in files]
         }
-        
-        for file_path in files:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    if file_path.suffix == '.json':
-                        data = json.load(f)
-                        merged_data["files"].append({
-                            "original_name": file_path.name,
-                            "data": data
-                        })
-                    else:
-                        merged_data["files"].append({
-                            "original_name": file_path.name,
-                            "content": f.read()
-                        })
-            except Exception as e:
-                self.logger.error(f"Ошибка чтения файла {file_path}: {e}")
-                
-        # Сохраняем объединенный файл
-        output_file = output_path / f"merged_group_{group_num:03d}.json"
-        if self.config.compress_output:
-            output_file = output_path / f"merged_group_{group_num:03d}.json.gz"
-            with gzip.open(output_file, 'wt', encoding='utf-8') as f:
-                json.dump(merged_data, f, ensure_ascii=False, indent=2)
-        else:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(merged_data, f, ensure_ascii=False, indent=2)
-                
+
+        output_file, out_f = self._open_text_output(output_path, f"merged_group_{group_num:03d}.json", multithreaded)
+        with out_f:
+            out_f.write('{\n  "metadata": ')
+            self._write_json_value(out_f, metadata, level=1)
+            out_f.write(',\n  "files": [')
+            written = 0
+            for file_path in files:
+                record = self._read_json_record(file_path)
+                if record is None:
+                    continue
+                out_f.write(",\n    " if written else "\n    ")
+                self._write_json_value(out_f, record, level=2)
+                written += 1
+            out_f.write("\n  ]\n}" if written else "]\n}")
+
         return output_file
+
+    def _merge_jsonl_group(self, files: List[Path], output_path: Path, group_num: int,
+                           multithreaded: bool = True) -> Path:
+        """
+        Объединяет группу файлов в JSON Lines: одна запись статьи на строку.
+
+        Запись содержит номер группы, имя исходного файла, поля статьи из _meta.json
+        (URL, заголовок, breadcrumb, хэш содержимого) и содержимое файла, поэтому
+        строки можно читать, делить и обрабатывать параллельно без разбора всей группы.
+        """
+        output_file, out_f = self._open_text_output(output_path, f"merged_group_{group_num:03d}.jsonl", multithreaded)
+        with out_f:
+            for file_path in files:
+                record = self._read_json_record(file_path)
+                if record is None:
+                    continue
+                meta = self._article_meta.get(file_path.stem, {})
+                line = {"group": group_num, "original_name": record.pop("original_name")}
+                line.update((field, meta[field]) for field in JSONL_META_FIELDS if field in meta)
+                line.update(record)
+                out_f.write(json.dumps(line, ensure_ascii=False))
+                out_f.write("\n")
+        return output_file
+
+    def _read_json_record(self, file_path: Path) -> Optional[Dict[str, Any]]:
+        """Читает один файл в запись объединенного JSON; при ошибке возвращает None."""
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                if file_path.suffix == '.json':
+                    return {"original_name": file_path.name, "data": json.load(f)}
+                return {"original_name": file_path.name, "content": f.read()}
+        except Exception as e:
+            self.logger.error(f"Ошибка чтения файла {file_path}: {e}")
+            return None
+
+    @staticmethod
+    def _write_json_value(out_f, value: Any, level: int):
+        """Пишет значение частями с отступом indent=2, вложенное на level уровней."""
+        # Переводы строк внутри строк JSON экранированы, поэтому сдвигается только разметка
+        indent = "\n" + "  " * level
+        encoder = json.JSONEncoder(ensure_ascii=False, indent=2)
+        for chunk in encoder.iterencode(value):
+            out_f.write(chunk.replace("\n", indent))
+
+    def _merge_markdown_group(self, files: List[Path], output_path: Path, group_num: int,
+                              multithreaded: bool = True) -> Path:
+        """Объединяет группу файлов в Markdown формат (содержимое копируется байтами, см. _append_file)."""
+        output_file, out_f = self._open_output(output_path, f"merged_group_{group_num:03d}.md", multithreaded)
+
+        def write(text: str):
+            out_f.write(text.encode('utf-8'))
         
-    def _merge_markdown_group(self, files: List[Path], output_path: Path, group_num: int) -> Path:
-        """Объединяет группу файлов в Markdown формат."""
-        output_file = output_path / f"merged_group_{group_num:03d}.md"
-        
-        with open(output_file, 'w', encoding='utf-8') as out_f:
+        with out_f:
             # Заголовок документа
-            out_f.write(f"# Объединенная документация - Группа {group_num}\n\n")
+            write(f"# Объединенная документация - Группа {group_num}\n\n")
             
             # Метаданные
-            total_size = sum(f.stat().st_size for f in files) / (1024 * 1024)
-            out_f.write(f"## Метаданные\n\n")
-            out_f.write(f"- Всего файлов: {len(files)}\n")
-            out_f.write(f"- Размер: {total_size:.2f} MB\n")
-            out_f.write(f"- Создано: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+            total_size = self._total_size(files) / (1024 * 1024)
+            write(f"## Метаданные\n\n")
+            write(f"- Всего файлов: {len(files)}\n")
+            write(f"- Размер: {total_size:.2f} MB\n")
+            write(f"- Создано: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
             
             # Содержимое файлов
             for i, file_path in enumerate(files):
                 try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        
                     # Добавляем разделитель
                     if i > 0:
-                        out_f.write(self.config.separator)
+                        write(self.config.separator)
                         
                     # Добавляем заголовок файла
                     if self.config.include_headers:
-                        out_f.write(f"\n# {file_path.stem}\n\n")
+                        write(f"\n# {file_path.stem}\n\n")
                         
-                    out_f.write(content)
+                    self._append_file(out_f, file_path)
                     
                 except Exception as e:
                     self.logger.error(f"Ошибка чтения файла {file_path}: {e}")
-                    out_f.write(f"\n<!-- Ошибка чтения файла {file_path.name}: {e} -->\n")
+                    write(f"\n<!-- Ошибка чтения файла {file_path.name}: {e} -->\n")
                     
         return output_file
         
-    def _merge_txt_group(self, files: List[Path], output_path: Path, group_num: int) -> Path:
-        """Объединяет группу файлов в текстовый формат."""
-        output_file = output_path / f"merged_group_{group_num:03d}.txt"
+    def _merge_txt_group(self, files: List[Path], output_path: Path, group_num: int,
+                         multithreaded: bool = True) -> Path:
+        """Объединяет группу файлов в текстовый формат (содержимое копируется байтами, см. _append_file)."""
+        output_file, out_f = self._open_output(output_path, f"merged_group_{group_num:03d}.txt", multithreaded)
+
+        def write(text: str):
+            out_f.write(text.encode('utf-8'))
         
-        with open(output_file, 'w', encoding='utf-8') as out_f:
+        with out_f:
             # Заголовок
-            out_f.write(f"Объединенная документация - Группа {group_num}\n")
-            out_f.write("=" * 50 + "\n\n")
+            write(f"Объединенная документация - Группа {group_num}\n")
+            write("=" * 50 + "\n\n")
             
             for i, file_path in enumerate(files):
                 try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        
                     # Добавляем разделитель
                     if i > 0:
-                        out_f.write(self.config.separator)
+                        write(self.config.separator)
                         
                     # Добавляем заголовок файла
                     if self.config.include_headers:
-                        out_f.write(f"\nФайл: {file_path.name}\n")
-                        out_f.write("-" * 30 + "\n")
+                        write(f"\nФайл: {file_path.name}\n")
+                        write("-" * 30 + "\n")
                         
-                    out_f.write(content)
+                    self._append_file(out_f, file_path)
                     
                 except Exception as e:
                     self.logger.error(f"Ошибка чтения файла {file_path}: {e}")
-                    out_f.write(f"\n[Ошибка чтения файла {file_path.name}: {e}]\n")
+                    write(f"\n[Ошибка чтения файла {file_path.name}: {e}]\n")
                     
         return output_file
-        
-    def _merge_generic_group(self, files: List[Path], output_path: Path, group_num: int) -> Path:
+
+    def _append_file(self, out_f: io.BufferedIOBase, file_path: Path):
+        """
+        Дописывает содержимое файла в выходной двоичный поток без декодирования.
+
+        В несжатый файл байты копируются ядром (copy_file_range, затем sendfile), в сжатый
+        поток - блоками по COPY_CHUNK_SIZE. Через декодирование проходят только файлы с
+        символом CR: текстовый режим чтения заменяет переводы строк CRLF и CR на LF, и
+        результат объединения таких файлов должен остаться прежним.
+
+        Кодировка остальных файлов не проверяется (это потребовало бы декодировать каждый
+        файл): байты файла не в UTF-8 попадают в группу как есть, без сообщения об ошибке чтения.
+        """
+        if self._needs_decode(file_path):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                out_f.write(f.read().encode('utf-8'))
+            return
+
+        with open(file_path, 'rb') as src:
+            copied = 0
+            if isinstance(out_f, io.BufferedWriter):
+                # Буфер сбрасывается, чтобы заголовки оказались в файле раньше копируемых байтов
+                out_f.flush()
+                copied = _kernel_copy(src.fileno(), out_f.fileno(), self._file_stat(file_path).size)
+            # Остаток (или весь файл, если ядро не скопировало) - блоками; так же дописывается
+            # файл, выросший после обхода директории
+            src.seek(copied)
+            shutil.copyfileobj(src, out_f, COPY_CHUNK_SIZE)
+
+    @staticmethod
+    def _needs_decode(file_path: Path) -> bool:
+        """Проверяет, есть ли в файле символ CR (поиск по отображению файла в память, без копирования в Python)."""
+        with open(file_path, 'rb') as f:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return mapped.find(b"\r") != -1
+            except ValueError:
+                # Пустой файл нельзя отобразить в память
+                return False
+
+    def _merge_generic_group(self, files: List[Path], output_path: Path, group_num: int,
+                             multithreaded: bool = True) -> Path:
         """Универсальное объединение файлов."""
-        output_file = output_path / f"merged_group_{group_num:03d}.txt"
+        output_file, out_f = self._open_text_output(output_path, f"merged_group_{group_num:03d}.txt", multithreaded)
         
-        with open(output_file, 'w', encoding='utf-8') as out_f:
+        with out_f:
             for i, file_path in enumerate(files):
                 try:
                     with open(file_path, 'r', encoding='utf-8') as f:
@@ -391,21 +1014,38 @@ class FileMerger:
         if not files:
             return {"total_files": 0, "total_size_mb": 0, "estimated_groups": 0}
             
-        total_size = sum(f.stat().st_size for f in files)
+        total_size = self._total_size(files)
         total_size_mb = total_size / (1024 * 1024)
         
-        # Оцениваем количество групп
-        groups_by_count = len(files) // self.config.max_files + (1 if len(files) % self.config.max_files else 0)
-        groups_by_size = int(total_size_mb // self.config.max_size_mb) + (1 if total_size_mb % self.config.max_size_mb else 0)
-        estimated_groups = max(groups_by_count, groups_by_size)
+        # Строим план группировки выбранной стратегией (без записи файлов)
+        groups = self._group_files(files)
+        group_plan = []
+        for number, group in enumerate(groups, 1):
+            group_size = self._total_size(group)
+            group_tokens = sum(self._file_tokens(f) for f in group)
+            entry = {
+                "group": number,
+                "files": len(group),
+                "size_mb": round(group_size / (1024 * 1024), 2),
+                "fill_percent": round(self._fill_ratio(len(group), group_size, group_tokens) * 100, 1),
+            }
+            if self.config.max_tokens is not None:
+                entry["tokens"] = group_tokens
+            group_plan.append(entry)
         
-        return {
+        statistics = {
             "total_files": len(files),
             "total_size_mb": round(total_size_mb, 2),
-            "estimated_groups": estimated_groups,
+            "estimated_groups": len(groups),
             "avg_file_size_mb": round(total_size_mb / len(files), 2),
-            "files_by_extension": self._count_files_by_extension(files)
+            "files_by_extension": self._count_files_by_extension(files),
+            "group_strategy": self.config.group_strategy,
+            "group_plan": group_plan,
         }
+        if self.config.max_tokens is not None:
+            statistics["total_tokens"] = sum(entry["tokens"] for entry in group_plan)
+            statistics["tokenizer"] = self._get_token_counter().name
+        return statistics
         
     def _count_files_by_extension(self, files: List[Path]) -> Dict[str, int]:
         """Подсчитывает файлы по расширениям."""
@@ -416,6 +1056,52 @@ class FileMerger:
         return extensions
 
 
+def _kernel_copy(src_fd: int, dst_fd: int, size: int) -> int:
+    """
+    Копирует до size байт из начала src_fd в текущую позицию dst_fd средствами ядра.
+
+    Пробует os.copy_file_range, затем os.sendfile; если вызов недоступен или завершился
+    ошибкой (например, для другой файловой системы), продолжает следующим способом с того
+    же места. Возвращает число скопированных байтов; остаток копирует вызывающий.
+    """
+    copied = 0
+    methods = []
+    if hasattr(os, "copy_file_range"):
+        methods.append(lambda count: os.copy_file_range(src_fd, dst_fd, count, copied))
+    if hasattr(os, "sendfile"):
+        methods.append(lambda count: os.sendfile(dst_fd, src_fd, copied, count))
+    for method in methods:
+        try:
+            while copied < size:
+                sent = method(size - copied)
+                if sent == 0:
+                    break
+                copied += sent
+            return copied
+        except OSError:
+            continue
+    return copied
+
+
+def _load_zstandard():
+    """Импортирует необязательный пакет zstandard для сжатия zstd."""
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("Для сжатия zstd установите пакет: pip install zstandard") from e
+    return zstandard
+
+
+def _merge_group_in_worker(config: MergeConfig, files: List[Path], output_path: Path, group_num: int,
+                           stats: Dict[Path, FileStat], article_meta: Dict[str, Dict[str, Any]]) -> Optional[Path]:
+    """Объединяет одну группу в процессе пула (функция уровня модуля, чтобы ее можно было передать в процесс)."""
+    merger = FileMerger(config)
+    merger._stats.update(stats)
+    merger._article_meta.update(article_meta)
+    # Группы сжимаются одновременно в нескольких процессах, поэтому zstd работает в одном потоке
+    return merger._merge_group(files, output_path, group_num, multithreaded=False)
+
+
 def merge_files_cli(input_dir: str, output_dir: str = None, **kwargs) -> List[str]:
     """
     Удобная функция для объединения файлов из командной строки.
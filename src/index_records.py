@@ -0,0 +1,115 @@
+"""
+Compact in-memory records for the flattened article index.
+
+A flattened index of a large section holds one record per article, and each
+article carries its breadcrumb trail. Instead of a dict per article with its own
+copy of the breadcrumb list, records use __slots__ and point at a shared prefix
+tree of BreadcrumbNode objects, so every breadcrumb prefix is stored once.
+Records still behave like the article dicts used throughout the scraper.
+"""
+
+import sys
+from collections.abc import MutableMapping
+from typing import Any, Iterator, List, Optional
+
+
+class BreadcrumbNode:
+    """One level of a breadcrumb trail, linked to its parent level."""
+
+    __slots__ = ("title", "parent")
+
+    def __init__(self, title: str, parent: Optional["BreadcrumbNode"] = None):
+        self.title = sys.intern(title) if isinstance(title, str) else title
+        self.parent = parent
+
+    @classmethod
+    def from_list(cls, titles) -> Optional["BreadcrumbNode"]:
+        """Builds a chain from a list of titles, root first."""
+        node = None
+        for title in titles or ():
+            node = cls(title, node)
+        return node
+
+    def path(self) -> List[str]:
+        """Returns the breadcrumb as a list of titles, root first."""
+        titles = []
+        node = self
+        while node is not None:
+            titles.append(node.title)
+            node = node.parent
+        titles.reverse()
+        return titles
+
+
+class ArticleRecord(MutableMapping):
+    """
+    Article of the flattened index.
+
+    Supports the mapping interface of the article dicts ('index', 'filename_base',
+    'title', 'url', 'breadcrumb', 'aliases' plus any keys set later, such as
+    'content_hash'), so it can be passed wherever an article dict is expected.
+    """
+
+    __slots__ = ("index", "filename_base", "title", "url", "crumb", "aliases", "extra")
+
+    _FIELDS = ("index", "filename_base", "title", "url", "breadcrumb", "aliases")
+
+    def __init__(self, index: int, filename_base: str, title: str, url: str,
+                 crumb: Optional[BreadcrumbNode] = None):
+        self.index = index
+        self.filename_base = filename_base
+        self.title = sys.intern(title) if isinstance(title, str) else title
+        self.url = url
+        self.crumb = crumb
+        # Allocated only when needed: most articles have no aliases and no extra keys
+        self.aliases = None
+        self.extra = None
+
+    def add_alias(self, breadcrumb: List[str]):
+        """Records another TOC location of the same document."""
+        if self.aliases is None:
+            self.aliases = []
+        self.aliases.append(breadcrumb)
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "breadcrumb":
+            return self.crumb.path() if self.crumb is not None else []
+        if key == "aliases":
+            return self.aliases if self.aliases is not None else []
+        if key in ("index", "filename_base", "title", "url"):
+            return getattr(self, key)
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key == "breadcrumb":
+            self.crumb = BreadcrumbNode.from_list(value)
+        elif key == "aliases":
+            self.aliases = list(value) if value else None
+        elif key in ("index", "filename_base", "title", "url"):
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key: str):
+        if self.extra is None or key not in self.extra:
+            raise KeyError(key)
+        del self.extra[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._FIELDS
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return len(self._FIELDS) + (len(self.extra) if self.extra else 0)
+
+    def to_dict(self) -> dict:
+        """Returns the article as a plain dict (the _meta.json record layout)."""
+        return dict(self)
+
+    def __repr__(self) -> str:
+        return f"ArticleRecord(index={self.index!r}, title={self.title!r}, url={self.url!r})"
@@ -0,0 +1,511 @@
+"""
+Embedded SQLite store for the TOC index, article metadata and run history.
+
+The JSON files (_toc_tree.json, _meta.json) remain the exchange format;
+this store gives indexed lookups by URL and by subtree without re-parsing
+and re-flattening the whole tree on every access.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    from .utils import canonicalize_url
+except ImportError:
+    from utils import canonicalize_url
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS toc_nodes (
+    id INTEGER PRIMARY KEY,
+    parent_id INTEGER REFERENCES toc_nodes(id),
+    seq INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    url TEXT,
+    article_index INTEGER,
+    discovered INTEGER NOT NULL DEFAULT 0,
+    alias_of INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_toc_nodes_url ON toc_nodes(url);
+CREATE INDEX IF NOT EXISTS idx_toc_nodes_parent ON toc_nodes(parent_id, seq);
+CREATE INDEX IF NOT EXISTS idx_toc_nodes_article ON toc_nodes(article_index);
+
+CREATE TABLE IF NOT EXISTS articles (
+    url TEXT PRIMARY KEY,
+    article_index INTEGER,
+    filename_base TEXT,
+    title TEXT,
+    breadcrumb TEXT,
+    content_hash TEXT,
+    scrape_time REAL,
+    updated_at REAL,
+    extra TEXT
+);
+
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT,
+    formats TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT,
+    articles_count INTEGER,
+    stats TEXT
+);
+
+CREATE TABLE IF NOT EXISTS captures (
+    url TEXT PRIMARY KEY,
+    parser_type TEXT NOT NULL,
+    html TEXT NOT NULL,
+    content_hash TEXT,
+    captured_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS pdf_renders (
+    url TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    rendered_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS print_pages (
+    url TEXT PRIMARY KEY,
+    print_url TEXT NOT NULL,
+    path TEXT NOT NULL,
+    captured_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS print_assets (
+    url TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    content_type TEXT,
+    size INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Article keys stored in dedicated columns; everything else goes to the 'extra' JSON column
+_ARTICLE_COLUMNS = ("url", "index", "filename_base", "title", "breadcrumb", "content_hash", "scrape_time")
+
+
+class IndexStore:
+    """SQLite-backed storage for TOC nodes, articles, hashes, timings and run history."""
+
+    def __init__(self, db_path: str):
+        """
+        Open (and create if needed) the store.
+
+        Args:
+            db_path (str): Path to the SQLite database file
+        """
+        self.db_path = db_path
+        # Cached number of numbered TOC articles; reset whenever the TOC changes
+        self._toc_article_count = None
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        # Batches of article rows and discovery captures are written from the
+        # writer's thread pool; writes are serialized by _write_lock
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._write_lock = threading.RLock()
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+        self.conn.commit()
+
+    def _migrate(self):
+        """Adds columns introduced after the store was first created."""
+        toc_columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(toc_nodes)")}
+        if "discovered" not in toc_columns:
+            self.conn.execute("ALTER TABLE toc_nodes ADD COLUMN discovered INTEGER NOT NULL DEFAULT 0")
+        if "alias_of" not in toc_columns:
+            self.conn.execute("ALTER TABLE toc_nodes ADD COLUMN alias_of INTEGER")
+
+    def close(self):
+        """Closes the database connection."""
+        with self._write_lock:
+            self.conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Runs the block in one transaction, serialized with writes from other threads."""
+        with self._write_lock, self.conn:
+            yield
+
+    # --- Key/value metadata ---
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Returns a value from the store_meta table."""
+        row = self.conn.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def set_meta(self, key: str, value: str):
+        """Sets a value in the store_meta table."""
+        with self._transaction():
+            self.conn.execute(
+                "INSERT INTO store_meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value),
+            )
+
+    # --- TOC ---
+
+    def replace_toc(self, toc_tree: List[Dict[str, Any]]):
+        """
+        Replaces the stored TOC with the given hierarchical tree.
+
+        Nodes are stored in pre-order ('seq'), so flattening is a single ordered scan.
+        Article numbering follows load_index_data: only nodes with a URL are numbered, from 1.
+        A URL that canonicalizes to one already seen is not numbered again; its node is stored
+        with 'alias_of' pointing at the first node with that document.
+        The 'discovered' flag marks nodes found by nested discovery rather than in the site TOC.
+        """
+        rows = []
+        counters = {"id": 0, "article": 0}
+        first_node_by_url = {}
+
+        def walk(nodes, parent_id, depth):
+            for node in nodes:
+                counters["id"] += 1
+                node_id = counters["id"]
+                url = node.get("url") or None
+                article_index = None
+                alias_of = None
+                if url:
+                    canonical_url = canonicalize_url(url)
+                    alias_of = first_node_by_url.get(canonical_url)
+                    if alias_of is None:
+                        first_node_by_url[canonical_url] = node_id
+                        counters["article"] += 1
+                        article_index = counters["article"]
+                rows.append((node_id, parent_id, node_id, depth, node.get("title", ""), url, article_index,
+                             1 if node.get("discovered") else 0, alias_of))
+                if node.get("children"):
+                    walk(node["children"], node_id, depth + 1)
+
+        walk(toc_tree, None, 0)
+        self._toc_article_count = counters["article"]
+        with self._transaction():
+            self.conn.execute("DELETE FROM toc_nodes")
+            self.conn.executemany(
+                "INSERT INTO toc_nodes (id, parent_id, seq, depth, title, url, article_index, discovered, alias_of) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.execute(
+                "INSERT INTO store_meta (key, value) VALUES ('toc_indexed_at', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (str(time.time()),),
+            )
+
+    def clear_toc(self):
+        """Removes all TOC nodes."""
+        self._toc_article_count = 0
+        with self._transaction():
+            self.conn.execute("DELETE FROM toc_nodes")
+            self.conn.execute("DELETE FROM store_meta WHERE key = 'toc_indexed_at'")
+
+    def has_toc(self) -> bool:
+        """Returns True if a TOC is stored."""
+        return self.conn.execute("SELECT 1 FROM toc_nodes LIMIT 1").fetchone() is not None
+
+    def count_toc_articles(self) -> int:
+        """Returns the number of numbered (unique) articles in the stored TOC; cached after the first call."""
+        if self._toc_article_count is None:
+            row = self.conn.execute("SELECT COUNT(*) FROM toc_nodes WHERE article_index IS NOT NULL").fetchone()
+            self._toc_article_count = row[0]
+        return self._toc_article_count
+
+    def iter_toc_nodes(self, root_id: Optional[int] = None) -> Iterator[sqlite3.Row]:
+        """
+        Yields TOC nodes in pre-order, optionally limited to the subtree under root_id.
+
+        Parents are always yielded before their children.
+        """
+        if root_id is None:
+            yield from self.conn.execute(
+                "SELECT id, parent_id, depth, title, url, article_index, discovered, alias_of FROM toc_nodes ORDER BY seq"
+            )
+            return
+        yield from self.conn.execute(
+            """
+            WITH RECURSIVE subtree(id) AS (
+                SELECT id FROM toc_nodes WHERE id = ?
+                UNION ALL
+                SELECT t.id FROM toc_nodes t JOIN subtree s ON t.parent_id = s.id
+            )
+            SELECT id, parent_id, depth, title, url, article_index, discovered, alias_of FROM toc_nodes
+            WHERE id IN (SELECT id FROM subtree) ORDER BY seq
+            """,
+            (root_id,),
+        )
+
+    def alias_breadcrumbs(self) -> Dict[int, List[List[str]]]:
+        """
+        Maps node id -> breadcrumbs of the other TOC locations of its document.
+
+        Only alias nodes and their ancestors are read, so the cost is proportional
+        to the number of duplicates rather than to the size of the TOC.
+        """
+        aliases: Dict[int, List[List[str]]] = {}
+        titles: Dict[int, Any] = {}
+
+        def breadcrumb(node_id):
+            path = []
+            while node_id is not None:
+                if node_id not in titles:
+                    row = self.conn.execute("SELECT parent_id, title FROM toc_nodes WHERE id = ?", (node_id,)).fetchone()
+                    titles[node_id] = (row["parent_id"], row["title"])
+                parent_id, title = titles[node_id]
+                path.append(title)
+                node_id = parent_id
+            path.reverse()
+            return path
+
+        rows = self.conn.execute("SELECT id, alias_of FROM toc_nodes WHERE alias_of IS NOT NULL ORDER BY seq").fetchall()
+        for row in rows:
+            aliases.setdefault(row["alias_of"], []).append(breadcrumb(row["id"]))
+        return aliases
+
+    def find_toc_nodes(self, url: str) -> List[sqlite3.Row]:
+        """Returns all TOC nodes with the given URL (indexed lookup)."""
+        return self.conn.execute(
+            "SELECT id, parent_id, depth, title, url, article_index, discovered, alias_of FROM toc_nodes WHERE url = ? ORDER BY seq",
+            (url,),
+        ).fetchall()
+
+    def toc_urls(self) -> set:
+        """Returns the set of all URLs in the stored TOC."""
+        return {row[0] for row in self.conn.execute("SELECT DISTINCT url FROM toc_nodes WHERE url IS NOT NULL")}
+
+    def load_toc_tree(self, root_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Rebuilds the hierarchical TOC (the _toc_tree.json structure), optionally for one subtree."""
+        roots = []
+        by_id = {}
+        for row in self.iter_toc_nodes(root_id):
+            node = {"title": row["title"], "url": row["url"] or "", "children": []}
+            if row["discovered"]:
+                node["discovered"] = True
+            by_id[row["id"]] = node
+            parent = by_id.get(row["parent_id"])
+            if parent is None:
+                roots.append(node)
+            else:
+                parent["children"].append(node)
+        return roots
+
+    def subtree(self, url: str) -> List[Dict[str, Any]]:
+        """Returns the TOC subtree rooted at the first node with the given URL."""
+        nodes = self.find_toc_nodes(url)
+        if not nodes:
+            return []
+        return self.load_toc_tree(nodes[0]["id"])
+
+    def export_toc_json(self, path: str):
+        """Writes the stored TOC to a JSON file in the _toc_tree.json format."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.load_toc_tree(), f, ensure_ascii=False, indent=2)
+
+    # --- Articles ---
+
+    def upsert_articles(self, articles):
+        """Inserts or updates article metadata records (dicts as stored in _meta.json)."""
+        now = time.time()
+        rows = []
+        for article in articles:
+            url = article.get("url")
+            if not url:
+                continue
+            extra = {k: v for k, v in article.items() if k not in _ARTICLE_COLUMNS}
+            content_hash = article.get("content_hash")
+            rows.append((
+                url,
+                article.get("index"),
+                article.get("filename_base"),
+                article.get("title"),
+                json.dumps(article.get("breadcrumb"), ensure_ascii=False),
+                None if content_hash is None else json.dumps(content_hash),
+                article.get("scrape_time"),
+                now,
+                json.dumps(extra, ensure_ascii=False) if extra else None,
+            ))
+        with self._transaction():
+            self.conn.executemany(
+                """
+                INSERT INTO articles (url, article_index, filename_base, title, breadcrumb,
+                                      content_hash, scrape_time, updated_at, extra)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    article_index = excluded.article_index,
+                    filename_base = excluded.filename_base,
+                    title = excluded.title,
+                    breadcrumb = excluded.breadcrumb,
+                    content_hash = excluded.content_hash,
+                    scrape_time = COALESCE(excluded.scrape_time, articles.scrape_time),
+                    updated_at = excluded.updated_at,
+                    extra = excluded.extra
+                """,
+                rows,
+            )
+
+    def get_article(self, url: str) -> Optional[Dict[str, Any]]:
+        """Returns the stored metadata for a URL, or None."""
+        row = self.conn.execute("SELECT * FROM articles WHERE url = ?", (url,)).fetchone()
+        return self._article_from_row(row) if row else None
+
+    def has_articles(self) -> bool:
+        """Returns True if any article metadata is stored."""
+        return self.conn.execute("SELECT 1 FROM articles LIMIT 1").fetchone() is not None
+
+    def article_urls(self) -> set:
+        """Returns the set of URLs with stored metadata."""
+        return {row[0] for row in self.conn.execute("SELECT url FROM articles")}
+
+    def iter_articles(self) -> Iterator[Dict[str, Any]]:
+        """Yields stored article metadata ordered by article index."""
+        for row in self.conn.execute("SELECT * FROM articles ORDER BY article_index, url"):
+            yield self._article_from_row(row)
+
+    @staticmethod
+    def _article_from_row(row) -> Dict[str, Any]:
+        article = {
+            "index": row["article_index"],
+            "filename_base": row["filename_base"],
+            "title": row["title"],
+            "url": row["url"],
+            "breadcrumb": json.loads(row["breadcrumb"]) if row["breadcrumb"] else None,
+            "content_hash": json.loads(row["content_hash"]) if row["content_hash"] is not None else None,
+        }
+        if row["scrape_time"] is not None:
+            article["scrape_time"] = row["scrape_time"]
+        if row["extra"]:
+            article.update(json.loads(row["extra"]))
+        return article
+
+    # --- Discovery captures ---
+
+    def save_capture(self, url: str, parser_type: str, html: str, content_hash=None):
+        """Stores the article HTML parsed during discovery, so scraping can skip a second visit."""
+        with self._transaction():
+            self.conn.execute(
+                "INSERT INTO captures (url, parser_type, html, content_hash, captured_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET parser_type = excluded.parser_type, html = excluded.html, "
+                "content_hash = excluded.content_hash, captured_at = excluded.captured_at",
+                (url, parser_type, html, json.dumps(content_hash), time.time()),
+            )
+
+    def get_capture(self, url: str) -> Optional[Dict[str, Any]]:
+        """Returns the discovery capture of a URL, or None."""
+        row = self.conn.execute("SELECT * FROM captures WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "url": row["url"],
+            "parser_type": row["parser_type"],
+            "html": row["html"],
+            "content_hash": json.loads(row["content_hash"]) if row["content_hash"] is not None else None,
+            "captured_at": row["captured_at"],
+        }
+
+    def count_captures(self) -> int:
+        """Returns the number of stored discovery captures."""
+        return self.conn.execute("SELECT COUNT(*) FROM captures").fetchone()[0]
+
+    def clear_captures(self):
+        """Removes all discovery captures; they are only valid within one run."""
+        with self._transaction():
+            self.conn.execute("DELETE FROM captures")
+
+    # --- PDF renders ---
+
+    def get_pdf_render(self, url: str) -> Optional[Dict[str, Any]]:
+        """Returns the last PDF render of a URL (path and source fingerprint), or None."""
+        row = self.conn.execute("SELECT * FROM pdf_renders WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def record_pdf_render(self, url: str, path: str, fingerprint: str):
+        """Records that the PDF at path was rendered from a source with the given fingerprint."""
+        with self._transaction():
+            self.conn.execute(
+                "INSERT INTO pdf_renders (url, path, fingerprint, rendered_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET path = excluded.path, fingerprint = excluded.fingerprint, "
+                "rendered_at = excluded.rendered_at",
+                (url, path, fingerprint, time.time()),
+            )
+
+    def move_pdf_render(self, url: str, old_path: str, new_path: str):
+        """Points the PDF render of a URL recorded at old_path to new_path (the file was renamed)."""
+        with self._transaction():
+            self.conn.execute("UPDATE pdf_renders SET path = ? WHERE url = ? AND path = ?",
+                              (new_path, url, old_path))
+
+    # --- Print cache ---
+
+    def save_print_page(self, url: str, print_url: str, path: str):
+        """Records the cached print-view HTML file of an article."""
+        with self._transaction():
+            self.conn.execute(
+                "INSERT INTO print_pages (url, print_url, path, captured_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET print_url = excluded.print_url, path = excluded.path, "
+                "captured_at = excluded.captured_at",
+                (url, print_url, path, time.time()),
+            )
+
+    def get_print_page(self, url: str) -> Optional[Dict[str, Any]]:
+        """Returns the cached print page of an article (print_url, path), or None."""
+        row = self.conn.execute("SELECT * FROM print_pages WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def count_print_pages(self) -> int:
+        """Returns the number of cached print pages."""
+        return self.conn.execute("SELECT COUNT(*) FROM print_pages").fetchone()[0]
+
+    def save_print_asset(self, url: str, path: str, content_type: Optional[str], size: int):
+        """Records a cached asset (stylesheet, image, font, script) of the print pages."""
+        with self._transaction():
+            self.conn.execute(
+                "INSERT INTO print_assets (url, path, content_type, size) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET path = excluded.path, content_type = excluded.content_type, "
+                "size = excluded.size",
+                (url, path, content_type, size),
+            )
+
+    def get_print_asset(self, url: str) -> Optional[Dict[str, Any]]:
+        """Returns a cached asset (path, content_type, size), or None."""
+        row = self.conn.execute("SELECT * FROM print_assets WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    # --- Run history ---
+
+    def start_run(self, url: str, formats: List[str]) -> int:
+        """Records the start of a run and returns its id."""
+        with self._transaction():
+            cursor = self.conn.execute(
+                "INSERT INTO runs (url, formats, started_at, status) VALUES (?, ?, ?, 'running')",
+                (url, ",".join(formats), time.time()),
+            )
+        return cursor.lastrowid
+
+    def finish_run(self, run_id: int, status: str, articles_count: Optional[int] = None,
+                   stats: Optional[Dict[str, Any]] = None):
+        """Records the end of a run."""
+        with self._transaction():
+            self.conn.execute(
+                "UPDATE runs SET finished_at = ?, status = ?, articles_count = ?, stats = ? WHERE id = ?",
+                (time.time(), status, articles_count,
+                 json.dumps(stats, ensure_ascii=False) if stats else None, run_id),
+            )
+
+    def get_runs(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Returns the most recent runs, newest first."""
+        rows = self.conn.execute("SELECT * FROM runs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
@@ -0,0 +1,122 @@
+"""
+Incremental re-indexing helpers.
+
+A stored index is the site TOC plus nodes found by nested discovery
+(marked with "discovered": True). To refresh it, the top-level TOC is
+fetched again and compared with the TOC part of the stored tree subtree
+by subtree: unchanged subtrees keep their discovered nodes, and only
+changed ones need nested discovery again.
+"""
+
+import copy
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Set, Tuple
+
+
+@dataclass
+class TocDiff:
+    """Difference between two TOC trees, by URL."""
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    moved: List[str] = field(default_factory=list)
+    rediscovered: List[str] = field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.moved)
+
+    def summary(self) -> str:
+        return (f"{len(self.added)} added, {len(self.removed)} removed, {len(self.moved)} moved, "
+                f"{len(self.rediscovered)} subtree(s) rediscovered")
+
+
+def toc_signature(node: Dict[str, Any]):
+    """Hashable signature of a node's TOC structure, ignoring discovered descendants."""
+    return (
+        node.get("url") or "",
+        node.get("title") or "",
+        tuple(toc_signature(child) for child in node.get("children", []) if not child.get("discovered")),
+    )
+
+
+def _index_toc_nodes(nodes, index):
+    """Maps URL -> first TOC (non-discovered) node with that URL."""
+    for node in nodes:
+        if node.get("discovered"):
+            continue
+        url = node.get("url")
+        if url and url not in index:
+            index[url] = node
+        _index_toc_nodes(node.get("children", []), index)
+    return index
+
+
+def collect_urls(nodes, urls=None) -> Set[str]:
+    """Returns all URLs in the given subtrees."""
+    if urls is None:
+        urls = set()
+    for node in nodes:
+        if node.get("url"):
+            urls.add(node["url"])
+        collect_urls(node.get("children", []), urls)
+    return urls
+
+
+def merge_toc_trees(old_tree: List[Dict[str, Any]], new_toc: List[Dict[str, Any]]):
+    """
+    Merges a freshly fetched TOC into the stored tree.
+
+    Args:
+        old_tree: Stored tree, including discovered nodes
+        new_toc: Freshly fetched TOC, without discovered nodes
+
+    Returns:
+        tuple: (merged_tree, changed, reused_urls) where changed is a list of
+        (node, depth) for the topmost subtrees that need nested discovery and
+        reused_urls are the URLs of subtrees copied unchanged from old_tree.
+    """
+    old_by_url = _index_toc_nodes(old_tree, {})
+    changed: List[Tuple[Dict[str, Any], int]] = []
+    reused_urls: Set[str] = set()
+
+    def merge(nodes, depth, parent_changed):
+        merged = []
+        for node in nodes:
+            old_node = old_by_url.get(node.get("url")) if node.get("url") else None
+            if old_node is not None and toc_signature(old_node) == toc_signature(node):
+                reused = copy.deepcopy(old_node)
+                collect_urls([reused], reused_urls)
+                merged.append(reused)
+                continue
+            new_node = {key: value for key, value in node.items() if key != "children"}
+            if not parent_changed:
+                # Topmost changed node: discovery of this subtree covers its new descendants
+                changed.append((new_node, depth))
+            new_node["children"] = merge(node.get("children", []), depth + 1, True)
+            merged.append(new_node)
+        return merged
+
+    return merge(new_toc, 0, False), changed, reused_urls
+
+
+def _locations(nodes, parents=(), locations=None) -> Dict[str, Tuple[str, ...]]:
+    """Maps URL -> tuple of ancestor URLs of its first occurrence."""
+    if locations is None:
+        locations = {}
+    for node in nodes:
+        url = node.get("url")
+        if url and url not in locations:
+            locations[url] = parents
+        _locations(node.get("children", []), parents + (url or node.get("title", ""),), locations)
+    return locations
+
+
+def diff_toc_trees(old_tree: List[Dict[str, Any]], new_tree: List[Dict[str, Any]]) -> TocDiff:
+    """Reports URLs added, removed and moved (different ancestors) between two trees."""
+    old_locations = _locations(old_tree)
+    new_locations = _locations(new_tree)
+    return TocDiff(
+        added=[url for url in new_locations if url not in old_locations],
+        removed=[url for url in old_locations if url not in new_locations],
+        moved=[url for url, parents in new_locations.items()
+               if url in old_locations and old_locations[url] != parents],
+    )
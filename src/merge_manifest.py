@@ -0,0 +1,79 @@
+"""
+Манифест объединения для инкрементальной пересборки групп.
+
+Манифест хранится рядом с объединенными файлами (_merge_manifest.json) и
+описывает каждую группу: номер, выходной файл и исходные файлы с размером,
+временем изменения и SHA-256 содержимого. При повторном объединении с
+--incremental-merge пересобираются только группы, у которых изменился состав
+или содержимое файлов, а границы остальных групп сохраняются.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+MANIFEST_NAME = "_merge_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_digest(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """Возвращает SHA-256 содержимого файла, читая его частями."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MergeManifest:
+    """Состав групп последнего объединения."""
+
+    def __init__(self, settings: Dict[str, Any], groups: Optional[List[Dict[str, Any]]] = None):
+        """
+        Args:
+            settings: Параметры объединения, от которых зависит результат
+            groups: Группы вида {"number", "output", "files": [{"path", "size", "mtime", "digest"}]}
+        """
+        self.settings = settings
+        self.groups = groups or []
+
+    @classmethod
+    def load(cls, output_path: Path) -> Optional["MergeManifest"]:
+        """Загружает манифест из выходной директории; None, если его нет или он не читается."""
+        manifest_file = Path(output_path) / MANIFEST_NAME
+        if not manifest_file.exists():
+            return None
+        try:
+            with open(manifest_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        return cls(data.get("settings", {}), data.get("groups", []))
+
+    def save(self, output_path: Path):
+        """Сохраняет манифест в выходную директорию (через временный файл)."""
+        manifest_file = Path(output_path) / MANIFEST_NAME
+        tmp_file = manifest_file.with_name(manifest_file.name + ".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "settings": self.settings, "groups": self.groups},
+                      f, ensure_ascii=False, indent=1)
+        os.replace(tmp_file, manifest_file)
+
+    @staticmethod
+    def remove(output_path: Path):
+        """Удаляет манифест из выходной директории, если он есть."""
+        manifest_file = Path(output_path) / MANIFEST_NAME
+        if manifest_file.exists():
+            manifest_file.unlink()
+
+    def file_entries(self) -> Dict[str, Dict[str, Any]]:
+        """Возвращает записи исходных файлов по относительному пути."""
+        return {entry["path"]: entry for group in self.groups for entry in group["files"]}
+
+    def next_number(self) -> int:
+        """Возвращает номер для новой группы (после всех известных)."""
+        return max((group["number"] for group in self.groups), default=0) + 1
@@ -0,0 +1,281 @@
+"""
+Non-blocking output writer stage for the scraping project.
+
+File writes are handed off to a thread pool so that slow disks (e.g. network
+filesystems) never stall the event loop that drives the browser workers.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Tuple, Union
+
+# Supported fsync policies:
+#   none  - never fsync, rely on the OS page cache
+#   file  - fsync every file right after it is written
+#   flush - fsync all files written since the last flush() at the flush barrier
+FSYNC_POLICIES = ("none", "file", "flush")
+
+WriteData = Union[str, bytes]
+
+# Chunk size for comparing new content with an existing file
+_COMPARE_CHUNK = 256 * 1024
+
+
+def encode_output(data: WriteData) -> bytes:
+    """Returns the bytes that writing data in text or binary mode puts on disk."""
+    if isinstance(data, (bytes, bytearray)):
+        return bytes(data)
+    if os.linesep != "\n":
+        data = data.replace("\n", os.linesep)
+    return data.encode("utf-8")
+
+
+def file_has_content(path: str, data: WriteData) -> bool:
+    """
+    Returns True if the file at path already holds exactly data.
+
+    Sizes are compared first, so a changed file is usually detected with a
+    single stat(); the bytes are only read when the sizes match.
+    """
+    expected = encode_output(data)
+    try:
+        if os.stat(path).st_size != len(expected):
+            return False
+        with open(path, "rb") as f:
+            offset = 0
+            while offset < len(expected):
+                chunk = f.read(_COMPARE_CHUNK)
+                if not chunk or chunk != expected[offset:offset + len(chunk)]:
+                    return False
+                offset += len(chunk)
+            return True
+    except OSError:
+        return False
+
+
+class OutputWriter:
+    """
+    Writes output files from a dedicated thread pool.
+
+    Features:
+    - Bounded number of in-flight write jobs (producers wait when it is full)
+    - Small files are batched into a single pool job
+    - Configurable fsync policy
+    - flush() barrier that waits until everything submitted is on disk
+    - Writes whose content matches the existing file are skipped (mtime is kept)
+    - Writes to the same path land in submission order
+    """
+
+    def __init__(self, log_func=None, max_workers: int = 4, max_in_flight: int = 32,
+                 batch_size: int = 16, small_file_bytes: int = 64 * 1024,
+                 fsync_policy: str = "none", skip_unchanged: bool = True):
+        """
+        Initialize the writer.
+
+        Args:
+            log_func: The logging object (ScraperLogger instance), optional
+            max_workers (int): Number of writer threads
+            max_in_flight (int): Maximum number of pool jobs queued or running
+            batch_size (int): Maximum number of small files per batch job
+            small_file_bytes (int): Files smaller than this are batched
+            fsync_policy (str): One of FSYNC_POLICIES
+            skip_unchanged (bool): Do not rewrite files whose content is already identical
+        """
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+        if max_workers < 1 or max_in_flight < 1 or batch_size < 1:
+            raise ValueError("Writer pool sizes must be positive")
+
+        self.log = log_func
+        self.fsync_policy = fsync_policy
+        self.batch_size = batch_size
+        self.small_file_bytes = small_file_bytes
+        self.skip_unchanged = skip_unchanged
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="writer")
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._pending = set()
+        # Latest dispatched job per path; a new job for the path waits for it
+        self._path_jobs = {}
+        self._batch: List[Tuple[str, WriteData, bool]] = []
+        self._batch_bytes = 0
+
+        # Guards counters and the unsynced path set
+        self._lock = threading.Lock()
+        # Serializes appends with each other and with run_exclusive() calls
+        self._append_lock = threading.Lock()
+        self._unsynced = set()
+        self.files_written = 0
+        self.bytes_written = 0
+        self.files_skipped = 0
+        self.bytes_skipped = 0
+        self.errors_count = 0
+
+    async def write(self, path: str, data: WriteData):
+        """Schedules a file to be (over)written with the given str or bytes."""
+        await self._submit(path, data, append=False)
+
+    async def write_many(self, items: Iterable[Tuple[str, WriteData]]):
+        """Schedules several (path, data) writes."""
+        for path, data in items:
+            await self._submit(path, data, append=False)
+
+    async def append(self, path: str, data: WriteData):
+        """Schedules an append. Appends are never batched so they hit disk promptly."""
+        await self._dispatch(self._with_batched(path, (path, data, True)))
+
+    async def run_in_pool(self, func, *args):
+        """Runs func(*args) in the writer pool (e.g. a batch of index updates) and returns its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def run_exclusive(self, func, *args):
+        """
+        Runs func(*args) in the pool while no append is in progress.
+
+        Used for maintenance of append-only files (e.g. compaction), so that
+        no line is appended between reading the file and truncating it.
+        """
+        loop = asyncio.get_running_loop()
+
+        def call():
+            with self._append_lock:
+                return func(*args)
+
+        return await loop.run_in_executor(self._executor, call)
+
+    async def flush(self):
+        """Barrier: waits until every write submitted so far has completed."""
+        if self._batch:
+            await self._dispatch(self._take_batch())
+        while self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+        if self.fsync_policy == "flush" and self._unsynced:
+            with self._lock:
+                paths = list(self._unsynced)
+                self._unsynced.clear()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._fsync_paths, paths)
+
+    async def close(self):
+        """Flushes pending writes and stops the thread pool."""
+        await self.flush()
+        self.shutdown()
+
+    def shutdown(self, wait: bool = True):
+        """Stops the thread pool without flushing the pending batch."""
+        self._executor.shutdown(wait=wait)
+
+    def get_statistics(self):
+        """Returns statistics about the writes performed so far."""
+        with self._lock:
+            return {
+                "files_written": self.files_written,
+                "bytes_written": self.bytes_written,
+                "files_skipped": self.files_skipped,
+                "bytes_skipped": self.bytes_skipped,
+                "write_errors": self.errors_count,
+            }
+
+    async def _submit(self, path: str, data: WriteData, append: bool):
+        if len(data) >= self.small_file_bytes:
+            await self._dispatch(self._with_batched(path, (path, data, append)))
+            return
+        self._batch.append((path, data, append))
+        self._batch_bytes += len(data)
+        if len(self._batch) >= self.batch_size or self._batch_bytes >= self.small_file_bytes:
+            await self._dispatch(self._take_batch())
+
+    def _with_batched(self, path: str, job):
+        """
+        Returns the jobs to dispatch for an unbatched job.
+
+        If smaller writes for the same path are still waiting in the batch, the
+        batch goes first in the same pool job, so they cannot land after it.
+        """
+        if any(batched_path == path for batched_path, _, _ in self._batch):
+            return self._take_batch() + [job]
+        return [job]
+
+    def _take_batch(self):
+        batch = self._batch
+        self._batch = []
+        self._batch_bytes = 0
+        return batch
+
+    async def _dispatch(self, jobs):
+        # Jobs run concurrently in the pool, so a job waits for earlier jobs on its paths
+        paths = {path for path, _, _ in jobs}
+        earlier = {self._path_jobs[path] for path in paths if path in self._path_jobs}
+        if earlier:
+            await asyncio.gather(*earlier, return_exceptions=True)
+        await self._slots.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self._executor, self._run_jobs, jobs)
+        except Exception:
+            self._slots.release()
+            raise
+        self._pending.add(future)
+        for path in paths:
+            self._path_jobs[path] = future
+        future.add_done_callback(lambda done: self._on_job_done(done, paths))
+
+    def _on_job_done(self, future, paths):
+        self._pending.discard(future)
+        for path in paths:
+            if self._path_jobs.get(path) is future:
+                del self._path_jobs[path]
+        self._slots.release()
+
+    def _run_jobs(self, jobs):
+        for path, data, append in jobs:
+            try:
+                self._write_file(path, data, append)
+            except Exception as e:
+                with self._lock:
+                    self.errors_count += 1
+                if self.log:
+                    self.log.error("Could not write output file", path=path, error=str(e))
+
+    def _write_file(self, path: str, data: WriteData, append: bool):
+        is_bytes = isinstance(data, (bytes, bytearray))
+        mode = ("a" if append else "w") + ("b" if is_bytes else "")
+        encoding = None if is_bytes else "utf-8"
+        if append:
+            # Appends to a shared log must not interleave between threads
+            with self._append_lock:
+                self._write_handle(path, data, mode, encoding)
+        elif self.skip_unchanged and file_has_content(path, data):
+            with self._lock:
+                self.files_skipped += 1
+                self.bytes_skipped += len(data)
+            return
+        else:
+            self._write_handle(path, data, mode, encoding)
+        with self._lock:
+            self.files_written += 1
+            self.bytes_written += len(data)
+            if self.fsync_policy == "flush":
+                self._unsynced.add(path)
+
+    def _write_handle(self, path, data, mode, encoding):
+        with open(path, mode, encoding=encoding) as f:
+            f.write(data)
+            if self.fsync_policy == "file":
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _fsync_paths(self, paths):
+        for path in paths:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except OSError as e:
+                if self.log:
+                    self.log.debug("Could not fsync output file", path=path, error=str(e))
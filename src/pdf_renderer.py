@@ -0,0 +1,95 @@
+"""
+Dedicated PDF rendering stage.
+
+PDF rendering (opening the print page, waiting for it to settle and printing)
+is much slower than extracting text. PdfRenderPool serves PDF jobs from its own
+queue with its own browser contexts, so scraping workers hand PDFs off and move
+on to the next article, and PDF concurrency can be tuned separately.
+"""
+
+import asyncio
+from typing import List, Optional
+
+from . import file_manager
+from .scraper import Scraper
+
+
+class PdfRenderPool:
+    """Renders queued article PDFs with a separate pool of logged-in browser contexts."""
+
+    def __init__(self, log_func, workers: int = 2, writer=None):
+        """
+        Initialize the pool.
+
+        Args:
+            log_func: The logging object (ScraperLogger instance)
+            workers (int): Number of concurrent PDF renderers, each with its own browser context
+            writer: Optional OutputWriter for the PDF files
+        """
+        if workers < 1:
+            raise ValueError("PDF render pool needs at least one worker")
+        self.log = log_func
+        self.workers = workers
+        self.writer = writer
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self.submitted = 0
+        self.rendered = 0
+        self.failed = 0
+
+    async def start(self):
+        """Starts the render workers; each connects and logs in on its own."""
+        self._tasks = [asyncio.create_task(self._worker(f"pdf-{i}")) for i in range(self.workers)]
+
+    async def submit(self, url: str, path: str, fingerprint: str, print_url: Optional[str] = None):
+        """Queues the PDF of an article. Never blocks the caller on rendering."""
+        self.submitted += 1
+        await self._queue.put((url, path, fingerprint, print_url))
+
+    async def join(self):
+        """Waits until every queued PDF is rendered and stops the workers."""
+        for _ in self._tasks:
+            await self._queue.put(None)
+        results = await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for result in results:
+            if isinstance(result, Exception):
+                self.log.error(f"PDF render worker failed: {result}")
+        # Jobs left over when every worker failed to start
+        while not self._queue.empty():
+            if self._queue.get_nowait() is not None:
+                self.failed += 1
+
+    async def close(self):
+        """Cancels the workers without waiting for queued jobs (used on abort)."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def get_statistics(self):
+        """Returns statistics about the PDFs rendered by the pool."""
+        return {
+            "pdf_submitted": self.submitted,
+            "pdf_rendered": self.rendered,
+            "pdf_failed": self.failed,
+        }
+
+    async def _worker(self, name: str):
+        renderer = Scraper(self.log, writer=self.writer)
+        try:
+            await renderer.connect()
+            await renderer.login()
+            while True:
+                job = await self._queue.get()
+                if job is None:
+                    break
+                url, path, fingerprint, print_url = job
+                if await renderer.render_pdf(url, path, print_url=print_url):
+                    file_manager.record_pdf_render(url, path, fingerprint)
+                    self.rendered += 1
+                    self.log.debug("Saved PDF", path=path, worker=name)
+                else:
+                    self.failed += 1
+        finally:
+            await renderer.close()
@@ -0,0 +1,127 @@
+"""
+Local cache of print-view pages and their assets.
+
+With --cache-print, every print page opened to render a PDF is stored under
+_print_cache/ together with the stylesheets, images and fonts it loaded. PDFs
+can then be rendered again from the cache (--render-pdf-offline), for example
+with other page settings or after a crash, without any traffic to the site.
+Pages are indexed by canonical article URL and assets by their exact URL in the
+IndexStore; asset files are content-addressed, so assets shared by many pages
+are stored once.
+"""
+
+import hashlib
+import mimetypes
+import os
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+
+try:
+    from .utils import canonicalize_url
+except ImportError:
+    from utils import canonicalize_url
+
+# Resource types kept with a print page. Scripts are left out: the cached HTML is the
+# already rendered DOM, and running its scripts again could duplicate content.
+ASSET_TYPES = ("stylesheet", "image", "font")
+
+
+def prepare_offline_html(html: str, base_url: str) -> str:
+    """
+    Prepares cached print HTML for page.set_content().
+
+    Adds a <base> element so relative asset URLs resolve to the URLs they were
+    cached under, and removes scripts.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for script in soup.find_all("script"):
+        script.decompose()
+    if soup.find("base") is None:
+        head = soup.find("head")
+        if head is None:
+            head = soup.new_tag("head")
+            if soup.html:
+                soup.html.insert(0, head)
+            else:
+                soup.insert(0, head)
+        head.insert(0, soup.new_tag("base", href=base_url))
+    return str(soup)
+
+
+class PrintCache:
+    """Stores print pages and assets as files and indexes them in the IndexStore."""
+
+    def __init__(self, store, cache_dir: str):
+        """
+        Args:
+            store: IndexStore of the output directory
+            cache_dir (str): Directory of the cache files
+        """
+        self.store = store
+        self.cache_dir = cache_dir
+
+    def save_page(self, url: str, print_url: str, html: str):
+        """Stores the print-view HTML of an article."""
+        key = canonicalize_url(url)
+        relative_path = os.path.join("pages", f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.html")
+        self._write(relative_path, html.encode("utf-8"))
+        self.store.save_print_page(key, print_url, relative_path)
+
+    def has_page(self, url: str) -> bool:
+        """Returns True if the print page of an article is cached."""
+        return self._page_path(url) is not None
+
+    def load_page(self, url: str) -> Optional[Tuple[str, str]]:
+        """Returns (print_url, html) of a cached print page, or None."""
+        page = self.store.get_print_page(canonicalize_url(url))
+        if page is None:
+            return None
+        path = os.path.join(self.cache_dir, page["path"])
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return page["print_url"], f.read()
+
+    def has_asset(self, asset_url: str) -> bool:
+        """Returns True if an asset is already cached."""
+        return self.store.get_print_asset(asset_url) is not None
+
+    def save_asset(self, asset_url: str, body: bytes, content_type: Optional[str] = None):
+        """Stores an asset under its content hash."""
+        digest = hashlib.sha256(body).hexdigest()
+        extension = os.path.splitext(urlparse(asset_url).path)[1][:10]
+        if not extension and content_type:
+            extension = mimetypes.guess_extension(content_type.split(";")[0].strip()) or ""
+        relative_path = os.path.join("assets", digest[:2], f"{digest}{extension}")
+        if not os.path.exists(os.path.join(self.cache_dir, relative_path)):
+            self._write(relative_path, body)
+        self.store.save_print_asset(asset_url, relative_path, content_type, len(body))
+
+    def load_asset(self, asset_url: str) -> Optional[Tuple[bytes, Optional[str]]]:
+        """Returns (body, content_type) of a cached asset, or None."""
+        asset = self.store.get_print_asset(asset_url)
+        if asset is None:
+            return None
+        path = os.path.join(self.cache_dir, asset["path"])
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read(), asset["content_type"]
+
+    def _page_path(self, url: str) -> Optional[str]:
+        page = self.store.get_print_page(canonicalize_url(url))
+        if page is None:
+            return None
+        path = os.path.join(self.cache_dir, page["path"])
+        return path if os.path.exists(path) else None
+
+    def _write(self, relative_path: str, data: bytes):
+        path = os.path.join(self.cache_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written to a temporary file first, so an interrupted run never leaves a truncated entry
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
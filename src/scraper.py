@@ -1,5 +1,6 @@
 import asyncio
 import os
+import time
 from playwright.async_api import async_playwright, Error as PlaywrightError, Page, Browser, BrowserContext
 from bs4 import BeautifulSoup
 from tqdm import tqdm
@@ -8,13 +9,23 @@ from tqdm import tqdm
 from . import config
 from . import parser
 from . import file_manager
-from .utils import retry_on_error, retry_on_timeout
+from . import indexer
+from . import print_cache
+from .utils import retry_on_error, retry_on_timeout, canonicalize_url
 
 class Scraper:
     """Manages all web scraping operations using Playwright."""
 
-    def __init__(self, log_func, shared_hashes=None):
+    def __init__(self, log_func, shared_hashes=None, writer=None, capture=False, pdf_pool=None):
         self.log = log_func
+        # Optional OutputWriter; when set, file writes are offloaded to its thread pool
+        self.writer = writer
+        # Optional PdfRenderPool; when set, PDFs are queued to it instead of rendered inline
+        self.pdf_pool = pdf_pool
+        # When set, discovery stores the pages it parses and scraping reuses them instead of a second visit
+        self.capture = capture
+        self.captures_reused = 0
+        self.pdf_skipped = 0
         self.playwright = None
         self.browser: Browser = None
         self.context: BrowserContext = None
@@ -27,10 +38,24 @@ class Scraper:
         self.errors_count = 0
         self.warnings_count = 0
 
-    async def connect(self):
-        """Connects to the browser."""
+    async def connect(self, local=False):
+        """
+        Connects to the browser.
+
+        Args:
+            local (bool): Launch a local Chromium instead of connecting to browserless;
+                falls back to browserless if no local browser is installed
+        """
         self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.connect_over_cdp(config.BROWSERLESS_URL)
+        self.browser = None
+        if local:
+            try:
+                self.browser = await self.playwright.chromium.launch()
+                self.log.debug("Launched local Chromium")
+            except Exception as e:
+                self.log.debug(f"Local Chromium not available, using browserless: {e}")
+        if self.browser is None:
+            self.browser = await self.playwright.chromium.connect_over_cdp(config.BROWSERLESS_URL)
         self.context = await self.browser.new_context()
 
     async def close(self):
@@ -150,29 +175,54 @@ class Scraper:
         finally:
             await self._safely_close_page(page)
 
-    async def discover_nested_articles(self, toc_tree, max_depth=3):
+    async def discover_nested_articles(self, toc_tree, max_depth=3, start_depth=0, visited_urls=None, on_article=None):
         """
         Recursively discovers nested articles within pages (for parser_v2).
         
         Args:
             toc_tree: Initial TOC tree structure
             max_depth: Maximum recursion depth
+            start_depth: Depth of the given nodes in the full tree
+            visited_urls: Shared set of canonical URLs already visited (or to skip); updated in place
+            on_article: Optional coroutine function called once per article URL as soon as
+                discovery reaches it, with (node, breadcrumb); used to stream articles to scraping
             
         Returns:
             Updated TOC tree with discovered nested articles
         """
-        visited_urls = set()
+        if visited_urls is None:
+            visited_urls = set()
+        emitted_urls = set()
         
-        async def process_node(node, current_depth):
-            """Recursively process a node and discover nested links."""
-            if current_depth >= max_depth:
+        async def emit(node, breadcrumb):
+            """Passes an article node to on_article once per URL."""
+            url = canonicalize_url(node.get("url"))
+            if on_article is None or not url or url in emitted_urls:
                 return
-                
+            emitted_urls.add(url)
+            await on_article(node, breadcrumb)
+        
+        async def emit_subtree(nodes, parents):
+            """Emits nodes that discovery does not visit (beyond max_depth, under groups or duplicates)."""
+            if on_article is None:
+                return
+            for child in nodes:
+                breadcrumb = parents + [child.get("title")]
+                await emit(child, breadcrumb)
+                await emit_subtree(child.get("children", []), breadcrumb)
+        
+        async def process_node(node, current_depth, parents=()):
+            """Recursively process a node and discover nested links."""
+            breadcrumb = list(parents) + [node.get("title")]
             url = node.get("url")
-            if not url or url in visited_urls:
+            # The same document linked with another fragment, query order or trailing slash is visited once
+            canonical_url = canonicalize_url(url)
+            if current_depth >= max_depth or not url or canonical_url in visited_urls:
+                await emit(node, breadcrumb)
+                await emit_subtree(node.get("children", []), breadcrumb)
                 return
                 
-            visited_urls.add(url)
+            visited_urls.add(canonical_url)
             
             # Visit the page and extract nested links
             page = None
@@ -197,27 +247,36 @@ class Scraper:
                         article_frame = page.frame(name="w_metadata_doc_frame")
                         if article_frame:
                             # Content is in iframe (like /content/ pages)
-                            iframe_html = await article_frame.content()
-                            _, nested_links, _ = parser_module.parse_article_page(iframe_html)
+                            article_html = await article_frame.content()
                         else:
                             # Content is in main page (like /browse/ pages)
-                            _, nested_links, _ = parser_module.parse_article_page(page_content)
+                            article_html = page_content
+                        _, nested_links, content_hash = parser_module.parse_article_page(article_html)
+                        
+                        if self.capture:
+                            parser_type = parser_module.__name__.rsplit('_', 1)[-1]
+                            await self._save_capture(canonical_url, parser_type, article_html, content_hash)
+                        await emit(node, breadcrumb)
                         
                         # Add nested links as children if not already present
-                        existing_urls = {child.get("url") for child in node.get("children", [])}
+                        existing_urls = {canonicalize_url(child.get("url")) for child in node.get("children", [])}
                         
                         for nested_link in nested_links:
                             nested_url = nested_link.get("url")
-                            if nested_url and nested_url not in existing_urls and nested_url not in visited_urls:
+                            nested_canonical_url = canonicalize_url(nested_url)
+                            if (nested_url and nested_canonical_url not in existing_urls
+                                    and nested_canonical_url not in visited_urls):
+                                existing_urls.add(nested_canonical_url)
                                 new_node = {
                                     "title": nested_link.get("title"),
                                     "url": nested_url,
-                                    "children": []
+                                    "children": [],
+                                    "discovered": True
                                 }
                                 node.setdefault("children", []).append(new_node)
                                 
                                 # Recursively process the new node
-                                await process_node(new_node, current_depth + 1)
+                                await process_node(new_node, current_depth + 1, breadcrumb)
                                 
                     except Exception as e:
                         self.log.debug(f"Could not parse nested links", url=url, error=str(e))
@@ -226,14 +285,16 @@ class Scraper:
                 self.log.debug(f"Could not visit URL for nested discovery", url=url, error=str(e))
             finally:
                 await self._safely_close_page(page)
+            # No-op if already emitted after parsing; covers pages that failed to load
+            await emit(node, breadcrumb)
             
             # Process existing children
             for child in node.get("children", []):
-                await process_node(child, current_depth + 1)
+                await process_node(child, current_depth + 1, breadcrumb)
         
         # Process all top-level nodes
         for node in toc_tree:
-            await process_node(node, 0)
+            await process_node(node, start_depth)
             
         total_discovered = len(visited_urls)
         self.log.info(f"Discovered {total_discovered} total articles through recursive search", 
@@ -241,48 +302,87 @@ class Scraper:
         
         return toc_tree
 
+    async def refresh_index(self, url, old_tree, max_depth=3):
+        """
+        Incrementally refreshes a stored index.
+
+        Fetches the top-level TOC, keeps stored subtrees whose TOC links are unchanged
+        (with their discovered articles) and runs nested discovery only for changed subtrees.
+
+        Args:
+            url: The starting URL of the section
+            old_tree: Stored TOC tree, including discovered nodes
+            max_depth: Maximum recursion depth for nested discovery
+
+        Returns:
+            tuple: (refreshed TOC tree, indexer.TocDiff)
+        """
+        new_toc = await self.get_initial_toc(url)
+        merged_tree, changed, reused_urls = indexer.merge_toc_trees(old_tree, new_toc)
+        self.log.info(f"Incremental reindex: {len(changed)} changed subtree(s), "
+                      f"{len(reused_urls)} URL(s) reused", changed=len(changed))
+
+        # Reused subtrees are already discovered; a shared visited set keeps discovery out of them
+        visited_urls = {canonicalize_url(reused_url) for reused_url in reused_urls}
+        for node, depth in changed:
+            await self.discover_nested_articles([node], max_depth=max_depth, start_depth=depth,
+                                                visited_urls=visited_urls)
+
+        diff = indexer.diff_toc_trees(old_tree, merged_tree)
+        diff.rediscovered = [node.get("url") or node.get("title", "") for node, _ in changed]
+        return merged_tree, diff
+
 
 
     async def scrape_single_article(self, article_info, formats, i, pbar, update_mode=False, rag_mode=False):
         """Scrapes the final content for a single article."""
         page = None
+        started_at = time.monotonic()
         try:
             self.log.debug(f"Attempting to scrape article", 
                           title=article_info['title'], 
                           url=article_info['url'])
-            page = await self.context.new_page()
+            capture = self._get_capture(article_info['url'])
+            if capture:
+                # Discovery already parsed this page; a live page is opened below only if a PDF must be rendered
+                self.log.debug("Using discovery capture", url=article_info['url'])
+                parser_module = parser.get_parser_by_type(capture["parser_type"])
+                soup, _, content_hash = parser_module.parse_article_page(capture["html"])
+                self.captures_reused += 1
+            else:
+                page = await self.context.new_page()
 
-            try:
-                await page.goto(article_info['url'], timeout=config.get_page_timeout())
-                await page.wait_for_load_state('networkidle', timeout=config.get_network_timeout())
+                try:
+                    await page.goto(article_info['url'], timeout=config.get_page_timeout())
+                    await page.wait_for_load_state('networkidle', timeout=config.get_network_timeout())
 
-                # Auto-detect parser type based on content
-                page_content = await page.content()
-                parser_module = parser.get_parser_for_url(article_info['url'])
-                if parser_module is None:
-                    # Unknown URL pattern - detect from content
-                    parser_type = parser.detect_parser_type(page_content)
-                    parser_module = parser.get_parser_by_type(parser_type)
-                    self.log.debug("Auto-detected parser type for article scraping", parser_type=parser_type, url=article_info['url'])
-
-                # Check if page uses iframe (both v1 and v2 support this)
-                article_frame = page.frame(name="w_metadata_doc_frame")
-                if article_frame:
-                    # Content is in iframe (like /content/ pages)
-                    self.log.debug("Extracting from iframe", url=article_info['url'])
-                    iframe_html = await article_frame.content()
-                    soup, _, content_hash = parser_module.parse_article_page(iframe_html)
-                else:
-                    # Content is in main page (like /browse/ pages)
-                    self.log.debug("Extracting from main page", url=article_info['url'])
-                    soup, _, content_hash = parser_module.parse_article_page(page_content)
+                    # Auto-detect parser type based on content
+                    page_content = await page.content()
+                    parser_module = parser.get_parser_for_url(article_info['url'])
+                    if parser_module is None:
+                        # Unknown URL pattern - detect from content
+                        parser_type = parser.detect_parser_type(page_content)
+                        parser_module = parser.get_parser_by_type(parser_type)
+                        self.log.debug("Auto-detected parser type for article scraping", parser_type=parser_type, url=article_info['url'])
 
-            except PlaywrightError as pe:
-                self.log.debug(f"Playwright error, will attempt reconnect", 
-                              title=article_info['title'], 
-                              error=str(pe))
-                # This error is often fatal to the browser connection, so we trigger the reconnect logic.
-                raise pe
+                    # Check if page uses iframe (both v1 and v2 support this)
+                    article_frame = page.frame(name="w_metadata_doc_frame")
+                    if article_frame:
+                        # Content is in iframe (like /content/ pages)
+                        self.log.debug("Extracting from iframe", url=article_info['url'])
+                        iframe_html = await article_frame.content()
+                        soup, _, content_hash = parser_module.parse_article_page(iframe_html)
+                    else:
+                        # Content is in main page (like /browse/ pages)
+                        self.log.debug("Extracting from main page", url=article_info['url'])
+                        soup, _, content_hash = parser_module.parse_article_page(page_content)
+
+                except PlaywrightError as pe:
+                    self.log.debug(f"Playwright error, will attempt reconnect", 
+                                  title=article_info['title'], 
+                                  error=str(pe))
+                    # This error is often fatal to the browser connection, so we trigger the reconnect logic.
+                    raise pe
 
             # Check for duplicate content
             if content_hash in self.scraped_content_hashes:
@@ -312,7 +412,12 @@ class Scraper:
             article_info["filename_base"] = filename_base
             article_info["content_hash"] = content_hash
 
-            file_manager.save_article_content(filename_base, formats, soup, article_info, rag_mode=rag_mode)
+            if self.writer:
+                await self.writer.write_many(
+                    file_manager.render_article_content(filename_base, formats, soup, article_info, rag_mode=rag_mode)
+                )
+            else:
+                file_manager.save_article_content(filename_base, formats, soup, article_info, rag_mode=rag_mode)
             self.log.info(f"Saved article", 
                          title=article_info['title'], 
                          filename=filename_base,
@@ -320,8 +425,30 @@ class Scraper:
             
             if 'pdf' in formats:
                 pdf_path = os.path.join(config.get_pdf_dir(), f"{filename_base}.pdf")
-                await self._save_as_pdf(page, pdf_path)
-                self.log.debug(f"Saved PDF", path=pdf_path)
+                fingerprint = file_manager.pdf_fingerprint(soup)
+                if file_manager.is_pdf_current(article_info['url'], pdf_path, fingerprint):
+                    # Same text and render options as the existing PDF: no print page needed
+                    self.pdf_skipped += 1
+                    self.log.debug(f"PDF is up to date, skipping render", path=pdf_path)
+                elif self.pdf_pool:
+                    # Rendering is left to the PDF pool; passing the print URL spares it the article page
+                    print_url = None
+                    if page is not None:
+                        try:
+                            print_url = await self._get_print_url(page)
+                        except Exception as e:
+                            self.log.debug("Could not read print URL", url=article_info['url'], error=str(e))
+                    await self.pdf_pool.submit(article_info['url'], pdf_path, fingerprint, print_url=print_url)
+                else:
+                    if page is None:
+                        page = await self._open_page(article_info['url'])
+                    if await self._save_as_pdf(page, pdf_path, source_url=article_info['url']):
+                        file_manager.record_pdf_render(article_info['url'], pdf_path, fingerprint)
+                        self.log.debug(f"Saved PDF", path=pdf_path)
+
+            # Record metadata as soon as the article is done, so a crash loses nothing
+            article_info["scrape_time"] = round(time.monotonic() - started_at, 3)
+            await file_manager.record_article_meta(article_info, writer=self.writer)
             
             # Use configured delay between requests
             await asyncio.sleep(config.get_request_delay())
@@ -354,42 +481,219 @@ class Scraper:
         except Exception as e:
             self.log.debug(f"Error closing page: {e}")
 
-    async def _save_as_pdf(self, page: Page, path: str):
-        """Helper function to save a page as a PDF, trying the print-friendly link first."""
+    async def _open_page(self, url):
+        """Opens a new page and waits until the URL is loaded."""
+        page = await self.context.new_page()
+        try:
+            await page.goto(url, timeout=config.get_page_timeout())
+            await page.wait_for_load_state('networkidle', timeout=config.get_network_timeout())
+        except Exception:
+            await self._safely_close_page(page)
+            raise
+        return page
+
+    async def _get_print_url(self, page: Page):
+        """Returns the absolute print-friendly URL of an article page, or None."""
+        print_link_element = await page.query_selector('#w_metadata_print_href')
+        if print_link_element:
+            print_url = await print_link_element.get_attribute('href')
+            if print_url:
+                if not print_url.startswith('http'):
+                    print_url = f"{config.BASE_URL}{print_url}"
+                return print_url
+        return None
+
+    async def _render_print_url(self, print_url, path, source_url=None):
+        """
+        Opens a print-friendly URL in a new page and saves it as a PDF.
+
+        With the print cache enabled, the page and its assets are also stored under
+        the article URL (source_url) for offline rendering.
+        """
         print_page = None
         try:
-            print_link_element = await page.query_selector('#w_metadata_print_href')
-            if print_link_element:
-                print_url = await print_link_element.get_attribute('href')
-                if print_url:
-                    if not print_url.startswith('http'):
-                        print_url = f"{config.BASE_URL}{print_url}"
-                    
-                    self.log.debug("Using print-friendly URL for PDF", url=print_url)
-                    print_page = await self.context.new_page()
-                    await print_page.goto(print_url, timeout=config.get_page_timeout())
-                    await print_page.wait_for_load_state('networkidle', timeout=config.get_network_timeout())
-                    pdf_bytes = await print_page.pdf(format='A4', print_background=True)
-                    with open(path, "wb") as f:
-                        f.write(pdf_bytes)
-                    return
-
-            pdf_bytes = await page.pdf(format='A4', print_background=True)
-            with open(path, "wb") as f:
-                f.write(pdf_bytes)
+            print_page = await self.context.new_page()
+            responses = []
+            cache_page = config.is_print_cache_enabled() and source_url is not None
+            if cache_page:
+                print_page.on("response", responses.append)
+            await print_page.goto(print_url, timeout=config.get_pdf_timeout())
+            await print_page.wait_for_load_state('networkidle', timeout=config.get_network_timeout())
+            if cache_page:
+                await self._cache_print_page(print_page, source_url, print_url, responses)
+            pdf_bytes = await print_page.pdf(**config.get_pdf_options())
+            await self._write_output(path, pdf_bytes)
+        finally:
+            if print_page: await print_page.close()
+
+    async def _cache_print_page(self, print_page: Page, url, print_url, responses):
+        """Stores a loaded print page and the assets it received in the print cache."""
+        try:
+            cache = file_manager.get_print_cache()
+            for response in responses:
+                if response.request.resource_type not in print_cache.ASSET_TYPES or not response.ok:
+                    continue
+                if cache.has_asset(response.url):
+                    continue
+                try:
+                    body = await response.body()
+                except Exception:
+                    # Redirects and evicted responses have no body
+                    continue
+                cache.save_asset(response.url, body, response.headers.get("content-type"))
+            cache.save_page(url, print_url, await print_page.content())
+        except Exception as e:
+            # The cache is an optimization for later runs; the PDF is still rendered
+            self.log.debug("Could not cache print page", url=print_url, error=str(e))
+
+    async def render_cached_pdf(self, url, path):
+        """
+        Renders the PDF of an article from the print cache, without requests to the site.
 
+        The cached HTML is loaded with set_content() and every request it makes is
+        served from the cached assets; requests for anything not cached are aborted.
+
+        Returns:
+            bool: True if the PDF was rendered, False if the page is not cached or rendering failed.
+        """
+        cached = file_manager.get_print_cache().load_page(url)
+        if cached is None:
+            return False
+        print_url, html = cached
+        try:
+            await self.render_html_pdf(print_cache.prepare_offline_html(html, print_url), path)
+            return True
         except Exception as e:
-            self.errors_count += 1
-            self.log.error(f"Could not save PDF", url=page.url, error=str(e))
-            with open(f"{path}.error.txt", "w") as f:
-                f.write(f"Failed to generate PDF due to: {e}")
+            await self._pdf_failed(url, path, e)
+            return False
+
+    async def render_html_pdf(self, html, path, outline=False):
+        """
+        Renders an HTML document to a PDF with assets served only from the print cache.
+
+        Args:
+            html (str): Document to render
+            path (str): Output PDF path
+            outline (bool): Add PDF bookmarks generated from the document headings
+        """
+        cache = file_manager.get_print_cache()
+
+        async def serve_cached_asset(route):
+            asset = cache.load_asset(route.request.url)
+            if asset is None:
+                await route.abort()
+                return
+            body, content_type = asset
+            await route.fulfill(status=200, body=body, content_type=content_type)
+
+        page = None
+        try:
+            page = await self.context.new_page()
+            await page.route("**/*", serve_cached_asset)
+            await page.set_content(html, wait_until="load", timeout=config.get_pdf_timeout())
+            options = config.get_pdf_options()
+            if outline:
+                # Chromium builds the outline from the structure tree of a tagged PDF
+                options.update(outline=True, tagged=True)
+            pdf_bytes = await page.pdf(**options)
+            await self._write_output(path, pdf_bytes)
         finally:
-            if print_page: await print_page.close()
+            await self._safely_close_page(page)
+
+    async def _pdf_failed(self, url, path, error):
+        """Counts and logs a failed PDF render and leaves an error file next to the PDF path."""
+        self.errors_count += 1
+        self.log.error(f"Could not save PDF", url=url, error=str(error))
+        await self._write_output(f"{path}.error.txt", f"Failed to generate PDF due to: {error}")
+
+    async def _save_as_pdf(self, page: Page, path: str, source_url=None):
+        """
+        Helper function to save a page as a PDF, trying the print-friendly link first.
+
+        source_url is the article URL the print page is cached under (see _render_print_url).
+
+        Returns:
+            bool: True if the PDF was rendered, False if an error file was written instead.
+        """
+        try:
+            print_url = await self._get_print_url(page)
+            if print_url:
+                self.log.debug("Using print-friendly URL for PDF", url=print_url)
+                await self._render_print_url(print_url, path, source_url=source_url)
+                return True
+
+            pdf_bytes = await page.pdf(**config.get_pdf_options())
+            await self._write_output(path, pdf_bytes)
+            return True
+
+        except Exception as e:
+            await self._pdf_failed(page.url, path, e)
+            return False
+
+    async def render_pdf(self, url, path, print_url=None):
+        """
+        Renders the PDF of an article without a loaded article page (used by the PDF render pool).
+
+        Opens the print-friendly URL directly when it is known, otherwise loads the
+        article page first and proceeds as _save_as_pdf.
+
+        Returns:
+            bool: True if the PDF was rendered.
+        """
+        if print_url:
+            try:
+                await self._render_print_url(print_url, path, source_url=url)
+                return True
+            except Exception as e:
+                await self._pdf_failed(url, path, e)
+                return False
+
+        page = None
+        try:
+            page = await self._open_page(url)
+            return await self._save_as_pdf(page, path, source_url=url)
+        except Exception as e:
+            await self._pdf_failed(url, path, e)
+            return False
+        finally:
+            await self._safely_close_page(page)
+
+    async def _write_output(self, path, data):
+        """Writes str or bytes through the shared OutputWriter, or synchronously without one."""
+        if self.writer:
+            await self.writer.write(path, data)
+            return
+        if isinstance(data, bytes):
+            with open(path, "wb") as f:
+                f.write(data)
+        else:
+            with open(path, "w") as f:
+                f.write(data)
     
+    def _get_capture(self, url):
+        """Returns the discovery capture of an article, or None if capturing is off or the page was not reached."""
+        if not self.capture:
+            return None
+        return file_manager.get_index_store().get_capture(canonicalize_url(url))
+
+    async def _save_capture(self, url, parser_type, html, content_hash):
+        """
+        Stores a discovery capture from the writer pool (or the default executor), off the event loop.
+
+        The call completes before the article is emitted, so a streaming worker always finds it.
+        """
+        store = file_manager.get_index_store()
+        if self.writer:
+            await self.writer.run_in_pool(store.save_capture, url, parser_type, html, content_hash)
+        else:
+            await asyncio.get_running_loop().run_in_executor(None, store.save_capture, url, parser_type, html, content_hash)
+
     def get_statistics(self):
         """Returns statistics about the scraping session."""
         return {
             "errors_count": self.errors_count,
             "warnings_count": self.warnings_count,
-            "scraped_unique_articles": len(self.scraped_content_hashes)
+            "scraped_unique_articles": len(self.scraped_content_hashes),
+            "captures_reused": self.captures_reused,
+            "pdf_skipped": self.pdf_skipped
         }
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+Combined PDF documents for TOC sections.
+
+Instead of one browser print cycle per article, every top-level subtree of the
+TOC is assembled into a single print document from stored article HTML and
+rendered once. Each TOC node becomes a heading whose level follows its
+breadcrumb depth, so the PDF outline (bookmarks) generated from the headings
+mirrors the TOC hierarchy; headings inside an article are shifted below its
+own heading.
+
+Article HTML comes from the print cache (--cache-print); articles without a
+cached print page fall back to the text of their JSON output.
+"""
+
+import html as html_lib
+import json
+import os
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+try:
+    from . import config
+    from .utils import canonicalize_url
+except ImportError:
+    import config
+    from utils import canonicalize_url
+
+# Attributes holding URLs that must stay valid when article bodies are moved into one document
+_URL_ATTRIBUTES = {"img": "src", "link": "href", "a": "href", "source": "src"}
+
+# Every article starts on a new page; group headings stay with the article that follows them
+SECTION_STYLE = """
+.article-start { break-before: page; }
+.section-missing { color: #888; font-style: italic; }
+"""
+
+
+def section_filename(number: int, title: str) -> str:
+    """Returns the PDF file name of a section, e.g. '01_Раздел.pdf'."""
+    sanitized = "".join(c for c in title if c.isalnum() or c in " -_").strip().replace(" ", "_")
+    return f"{number:02d}_{sanitized[:80]}.pdf"
+
+
+def load_stored_article(article, print_cache) -> Optional[Tuple[Optional[str], str]]:
+    """
+    Returns (base_url, html) of a stored article, or None if nothing is stored.
+
+    Prefers the cached print page; falls back to the text of the JSON output.
+    """
+    cached = print_cache.load_page(article["url"])
+    if cached is not None:
+        return cached
+    json_path = os.path.join(config.get_json_dir(), f"{article['filename_base']}.json")
+    if not os.path.exists(json_path):
+        return None
+    with open(json_path, "r", encoding="utf-8") as f:
+        content = json.load(f).get("content", "")
+    paragraphs = "".join(f"<p>{html_lib.escape(line)}</p>" for line in content.splitlines() if line.strip())
+    return None, f"<html><body>{paragraphs}</body></html>"
+
+
+def _absolutize(soup, base_url: str):
+    for tag_name, attribute in _URL_ATTRIBUTES.items():
+        for tag in soup.find_all(tag_name):
+            value = tag.get(attribute)
+            if value and not value.startswith(("#", "data:", "javascript:")):
+                tag[attribute] = urljoin(base_url, value)
+
+
+def _shift_headings(body, level: int):
+    """Moves the article's own headings below its TOC heading (level), as far as h6 allows."""
+    for heading in body.find_all(["h1", "h2", "h3", "h4", "h5", "h6"]):
+        new_level = int(heading.name[1]) + level
+        if new_level > 6:
+            # Deeper than h6: kept as bold text, out of the outline
+            heading.name = "p"
+            heading["style"] = "font-weight: bold"
+        else:
+            heading.name = f"h{new_level}"
+
+
+def build_section_html(section: Dict, articles_by_url: Dict[str, object],
+                       load_article: Callable[[object], Optional[Tuple[Optional[str], str]]]) -> Tuple[str, int]:
+    """
+    Builds the combined print document of a TOC subtree.
+
+    Args:
+        section: TOC node (title, url, children) at the root of the section
+        articles_by_url: Index articles keyed by canonical URL
+        load_article: Returns (base_url, html) of an article, or None
+
+    Returns:
+        tuple: (html, number of articles with content)
+    """
+    head_links = {}
+    head_styles = []
+    parts = []
+    included = 0
+    seen = set()
+
+    def add_node(node, depth):
+        nonlocal included
+        level = min(depth + 1, 6)
+        url = node.get("url")
+        key = canonicalize_url(url) if url else None
+        article = articles_by_url.get(key) if key and key not in seen else None
+        heading_class = ' class="article-start"' if article is not None and parts else ""
+        parts.append(f'<h{level}{heading_class}>{html_lib.escape(node.get("title", ""))}</h{level}>')
+        if article is not None:
+            # A document listed in several TOC places is included once, at its first place
+            seen.add(key)
+            stored = load_article(article)
+            if stored is None:
+                parts.append('<p class="section-missing">Содержимое статьи не сохранено.</p>')
+            else:
+                base_url, article_html = stored
+                soup = BeautifulSoup(article_html, "html.parser")
+                if base_url:
+                    _absolutize(soup, base_url)
+                for link in soup.find_all("link", rel="stylesheet"):
+                    if link.get("href"):
+                        head_links.setdefault(link["href"], str(link))
+                for style in soup.find_all("style"):
+                    head_styles.append(str(style))
+                    style.decompose()
+                for tag in soup.find_all(["script", "link", "meta", "title", "base"]):
+                    tag.decompose()
+                body = soup.body or soup
+                _shift_headings(body, level)
+                parts.append(f'<div class="section-article">{body.decode_contents()}</div>')
+                included += 1
+        for child in node.get("children", []):
+            add_node(child, depth + 1)
+
+    add_node(section, 0)
+    head = "".join(head_links.values()) + "".join(dict.fromkeys(head_styles))
+    document = (
+        '<!DOCTYPE html><html><head><meta charset="utf-8">'
+        f"<title>{html_lib.escape(section.get('title', ''))}</title>"
+        f"{head}<style>{SECTION_STYLE}</style></head>"
+        f"<body>{''.join(parts)}</body></html>"
+    )
+    return document, included
@@ -0,0 +1,119 @@
+"""
+Подсчет токенов для группировки файлов по бюджету токенов (--max-tokens).
+
+По умолчанию используется быстрая оценка без внешних зависимостей: текст
+разбивается на слова, числа и знаки, и для каждого фрагмента число токенов
+оценивается по длине (латиница кодируется BPE-токенизаторами плотнее
+кириллицы). Для точного подсчета подключается токенизатор tiktoken
+("tiktoken:cl100k_base"), если он установлен. Результаты кэшируются по файлу
+(путь, размер, время изменения) и сохраняются между запусками.
+"""
+
+import json
+import math
+import os
+import re
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+HEURISTIC = "heuristic"
+
+# Слова (буквы), числа и отдельные прочие символы
+_TOKEN_PATTERN = re.compile(r"[^\W\d_]+|\d+|[^\w\s]|_", re.UNICODE)
+
+# Средняя длина токена в символах для типичных BPE-словарей
+_ASCII_CHARS_PER_TOKEN = 4.0
+_OTHER_CHARS_PER_TOKEN = 2.5
+_DIGITS_PER_TOKEN = 3.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Оценивает число токенов текста без токенизатора."""
+    tokens = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        fragment = match.group()
+        if fragment.isdigit():
+            tokens += math.ceil(len(fragment) / _DIGITS_PER_TOKEN)
+        elif fragment.isalpha():
+            per_token = _ASCII_CHARS_PER_TOKEN if fragment.isascii() else _OTHER_CHARS_PER_TOKEN
+            tokens += math.ceil(len(fragment) / per_token)
+        else:
+            tokens += 1
+    return tokens
+
+
+def load_tokenizer(spec: Optional[str]) -> Tuple[str, Callable[[str], int]]:
+    """
+    Возвращает имя и функцию подсчета токенов.
+
+    Args:
+        spec: "heuristic" (по умолчанию) или "tiktoken:<кодировка>", например "tiktoken:cl100k_base"
+
+    Raises:
+        ValueError: Неизвестный токенизатор
+        ImportError: Для "tiktoken:..." не установлен пакет tiktoken
+    """
+    if not spec or spec == HEURISTIC:
+        return HEURISTIC, estimate_tokens
+    kind, _, name = spec.partition(":")
+    if kind == "tiktoken" and name:
+        try:
+            import tiktoken
+        except ImportError as e:
+            raise ImportError("Для токенизатора tiktoken установите пакет: pip install tiktoken") from e
+        encoding = tiktoken.get_encoding(name)
+        return spec, lambda text: len(encoding.encode(text, disallowed_special=()))
+    raise ValueError(f"Неизвестный токенизатор: {spec} (ожидается '{HEURISTIC}' или 'tiktoken:<кодировка>')")
+
+
+class TokenCounter:
+    """Считает токены файлов с кэшем по пути, размеру и времени изменения."""
+
+    CACHE_NAME = "_token_cache.json"
+
+    def __init__(self, tokenizer: Optional[str] = None):
+        self.name, self._count = load_tokenizer(tokenizer)
+        self._cache: Dict[str, list] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def count_text(self, text: str) -> int:
+        """Считает токены строки (без кэша)."""
+        return self._count(text)
+
+    def count_file(self, path: Path, size: int, mtime: float) -> int:
+        """Возвращает число токенов файла; файл читается, только если его нет в кэше."""
+        key = str(path)
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == size and cached[1] == mtime:
+            self.hits += 1
+            return cached[2]
+        self.misses += 1
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                tokens = self._count(f.read())
+        except OSError:
+            tokens = 0
+        self._cache[key] = [size, mtime, tokens]
+        return tokens
+
+    def load(self, cache_dir: Path):
+        """Загружает кэш, сохраненный тем же токенизатором."""
+        cache_file = Path(cache_dir) / self.CACHE_NAME
+        if not cache_file.exists():
+            return
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("tokenizer") == self.name:
+            self._cache.update(data.get("files", {}))
+
+    def save(self, cache_dir: Path):
+        """Сохраняет кэш (через временный файл)."""
+        cache_file = Path(cache_dir) / self.CACHE_NAME
+        tmp_file = cache_file.with_name(cache_file.name + ".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"tokenizer": self.name, "files": self._cache}, f, ensure_ascii=False)
+        os.replace(tmp_file, cache_file)
@@ -4,7 +4,9 @@ Utility functions and decorators for the scraping project.
 
 import functools
 import asyncio
+import re
 from typing import Callable, Any, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 from . import config
 
 
@@ -153,3 +155,55 @@ async def sleep_with_jitter(duration: float, jitter: float = 0.1):
     actual_duration = duration + random.uniform(-jitter_amount, jitter_amount)
     await asyncio.sleep(max(0, actual_duration))
 
+
+
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_duration(value: str) -> float:
+    """
+    Parse a duration such as '90', '30m', '12h', '7d' or '2w' into seconds.
+    
+    Args:
+        value: Number of seconds, optionally followed by a unit (s, m, h, d, w)
+    
+    Returns:
+        Duration in seconds
+    
+    Raises:
+        ValueError: If the value cannot be parsed
+    
+    Example:
+        parse_duration("12h")  # 43200.0
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*", str(value).lower())
+    if not match:
+        raise ValueError(f"Invalid duration: {value!r} (expected e.g. 3600, 30m, 12h, 7d)")
+    number, unit = match.groups()
+    return float(number) * _DURATION_UNITS.get(unit or "s")
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize a URL so that links to the same document compare equal.
+    
+    Lower-cases the scheme and host, drops the fragment, sorts query parameters
+    and strips trailing slashes from the path.
+    
+    Args:
+        url: URL to normalize
+    
+    Returns:
+        Canonical URL (empty values are returned unchanged)
+    
+    Example:
+        canonicalize_url("https://ITS.1c.ru/db/v8std/?b=2&a=1#top")  # "https://its.1c.ru/db/v8std?a=1&b=2"
+    """
+    if not url:
+        return url
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/")
+    if not path and parts.netloc:
+        path = "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ""))
@@ -14,6 +14,16 @@ def temp_dir(tmp_path):
     """Create a temporary directory for testing file operations."""
     return tmp_path
 
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    """Перенаправляет выходную директорию во временную и закрывает хранилища индекса после теста."""
+    from src import config, file_manager
+    monkeypatch.setattr(config, "dynamic_output_dir", str(tmp_path))
+    monkeypatch.setattr(file_manager, "_meta_records_since_compaction", 0)
+    monkeypatch.setattr(file_manager, "_pending_index_rows", {})
+    yield tmp_path
+    file_manager.close_index_stores()
+
 @pytest.fixture
 def mock_env(monkeypatch):
     """Setup mock environment variables for testing."""
@@ -0,0 +1,121 @@
+import json
+import pytest
+from aiohttp import web
+from unittest.mock import MagicMock
+
+from src.asset_store import AssetStore, find_asset_links, rewrite_asset_links, cookie_jar_from_browser
+
+
+ARTICLE_URL = "https://its.1c.ru/db/v8std/content/1/hdoc"
+
+
+def test_find_and_rewrite_asset_links():
+    """Находятся изображения и вложения, обычные ссылки не затрагиваются."""
+    markdown = (
+        "![Схема](/db/files/scheme.png \"Схема\")\n"
+        "[Обработка](files/tool.epf) и [статья](/db/v8std/content/2/hdoc)\n"
+        "![data](data:image/png;base64,AAA)"
+    )
+    assert find_asset_links(markdown, ARTICLE_URL) == [
+        "https://its.1c.ru/db/files/scheme.png",
+        "https://its.1c.ru/db/v8std/content/1/files/tool.epf",
+    ]
+    rewritten = rewrite_asset_links(markdown, ARTICLE_URL, {"https://its.1c.ru/db/files/scheme.png": "../../_assets/ab/ab.png"})
+    assert rewritten.splitlines()[0] == '![Схема](../../_assets/ab/ab.png "Схема")'
+    assert rewritten.splitlines()[1:] == markdown.splitlines()[1:]
+
+
+@pytest.mark.asyncio
+async def test_cookie_jar_keeps_cookie_domains():
+    """Cookies браузерной сессии переносятся в aiohttp с доменом."""
+    jar = cookie_jar_from_browser([{"name": "SESSION", "value": "abc", "domain": ".1c.ru", "path": "/"}])
+    assert [cookie.key for cookie in jar] == ["SESSION"]
+
+
+@pytest.mark.asyncio
+async def test_assets_are_stored_once_and_links_rewritten(tmp_path):
+    """Ресурсы скачиваются один раз, одинаковое содержимое хранится в одном файле, ссылки становятся локальными."""
+    requests = []
+
+    async def handler(request):
+        requests.append(request.path)
+        if request.path == "/missing.png":
+            raise web.HTTPNotFound()
+        return web.Response(body=b"PNG-DATA", content_type="image/png")
+
+    app = web.Application()
+    app.router.add_get("/{name}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    try:
+        markdown_dir = tmp_path / "cabinetdoc" / "markdown"
+        markdown_dir.mkdir(parents=True)
+        first = markdown_dir / "0001_Первая.md"
+        second = markdown_dir / "0002_Вторая.md"
+        first.write_text(f"![a]({base}/a.png)\n![b]({base}/b.png)\n![m]({base}/missing.png)", encoding="utf-8")
+        second.write_text(f"![a]({base}/a.png)", encoding="utf-8")
+        asset_dir = tmp_path / "_assets"
+
+        store = AssetStore(str(asset_dir), MagicMock(), connections=2)
+        documents = [(str(first), f"{base}/article/1"), (str(second), f"{base}/article/2")]
+        assert await store.localize_markdown(documents) == 2
+
+        assert sorted(requests) == ["/a.png", "/b.png", "/missing.png"]
+        assert len(list(asset_dir.rglob("*.png"))) == 1
+        assert store.get_statistics() == {"assets_downloaded": 2, "assets_reused": 0, "assets_failed": 1, "bytes_downloaded": 16}
+        lines = first.read_text(encoding="utf-8").splitlines()
+        assert lines[0].startswith("![a](../../_assets/") and lines[0].endswith(".png)")
+        assert lines[2] == f"![m]({base}/missing.png)"
+        assert (markdown_dir / lines[0][5:-1]).read_bytes() == b"PNG-DATA"
+
+        # Next run: rewritten links are local, known URLs come from the manifest
+        requests.clear()
+        second.write_text(f"![a]({base}/a.png)", encoding="utf-8")
+        store = AssetStore(str(asset_dir), MagicMock())
+        assert await store.localize_markdown(documents) == 1
+        assert requests == ["/missing.png"]
+        assert store.get_statistics()["assets_reused"] == 1
+        assert f"{base}/a.png" in json.loads((asset_dir / "_manifest.json").read_text(encoding="utf-8"))
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_update_run_skips_unchanged_markdown_with_assets(output_dir, monkeypatch):
+    """При --update неизмененная статья с локализованными ресурсами не перезаписывается."""
+    from bs4 import BeautifulSoup
+    from src import config, file_manager
+    from src.output_writer import OutputWriter
+
+    monkeypatch.setattr(config, "dynamic_output_dir", str(output_dir / "v8std"))
+    monkeypatch.setattr(config, "_DOWNLOAD_ASSETS", True)
+    file_manager.setup_output_directories(["markdown"])
+    soup = BeautifulSoup('<div><p>Текст</p><img src="/db/files/a.png" alt="a"></div>', "html.parser")
+    article = {"url": ARTICLE_URL, "title": "Статья"}
+
+    async def run():
+        writer = OutputWriter()
+        await writer.write_many(file_manager.render_article_content("0001_Статья", ["markdown"], soup, article))
+        await writer.close()
+        return writer.get_statistics()
+
+    # Первый запуск: ресурса еще нет, этап ресурсов берет его из хранилища и переписывает ссылку
+    assert (await run())["files_written"] == 1
+    asset_dir = output_dir / "_assets"
+    (asset_dir / "ab").mkdir(parents=True)
+    (asset_dir / "ab" / "ab.png").write_bytes(b"PNG-DATA")
+    (asset_dir / "_manifest.json").write_text(json.dumps(
+        {"https://its.1c.ru/db/files/a.png": {"path": "ab/ab.png", "content_type": "image/png", "size": 8}}),
+        encoding="utf-8")
+    md_path = output_dir / "v8std" / "markdown" / "0001_Статья.md"
+    store = AssetStore(str(asset_dir), MagicMock())
+    assert await store.localize_markdown([(str(md_path), ARTICLE_URL)]) == 1
+    assert "](../../_assets/ab/ab.png)" in md_path.read_text(encoding="utf-8")
+
+    # Повторный запуск с тем же содержимым: файл совпадает с локализованным и пропускается
+    stats = await run()
+    assert stats["files_skipped"] == 1 and stats["files_written"] == 0
+    assert await AssetStore(str(asset_dir), MagicMock()).localize_markdown([(str(md_path), ARTICLE_URL)]) == 0
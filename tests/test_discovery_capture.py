@@ -0,0 +1,94 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from src import config
+from src import file_manager
+from src.scraper import Scraper
+
+
+ARTICLE_HTML = "<html><body><div id='w_content'><h1>Статья</h1><p>Текст статьи</p></div></body></html>"
+
+
+def _article():
+    return {"index": 1, "filename_base": "0001_Статья", "title": "Статья",
+            "url": "https://its.1c.ru/db/v8std/content/1/hdoc", "breadcrumb": ["Статья"]}
+
+
+def test_capture_roundtrip_and_cleanup(output_dir):
+    """Снимок страницы сохраняется и удаляется при очистке временных файлов."""
+    store = file_manager.get_index_store()
+    store.save_capture("u1", "v2", ARTICLE_HTML, 42)
+
+    capture = store.get_capture("u1")
+    assert capture["parser_type"] == "v2"
+    assert capture["html"] == ARTICLE_HTML
+    assert capture["content_hash"] == 42
+
+    file_manager.cleanup_temp_files()
+    assert store.get_capture("u1") is None
+    assert store.count_captures() == 0
+
+
+@pytest.mark.asyncio
+async def test_scrape_uses_capture_without_navigation(output_dir, monkeypatch):
+    """Статья из снимка обхода сохраняется без повторного открытия страницы."""
+    article = _article()
+    file_manager.get_index_store().save_capture(article["url"], "v2", ARTICLE_HTML)
+    save = MagicMock()
+    monkeypatch.setattr(file_manager, "save_article_content", save)
+    monkeypatch.setattr(config, "get_request_delay", lambda: 0)
+
+    scraper = Scraper(MagicMock(), capture=True)
+    scraper.context = MagicMock()
+    scraper.context.new_page = AsyncMock()
+    await scraper.scrape_single_article(article, ["json"], 0, MagicMock())
+
+    scraper.context.new_page.assert_not_called()
+    save.assert_called_once()
+    assert scraper.get_statistics()["captures_reused"] == 1
+    assert scraper.errors_count == 0
+
+
+@pytest.mark.asyncio
+async def test_pdf_articles_are_still_visited(output_dir, monkeypatch):
+    """Для отрисовки PDF страница открывается, даже если текст взят из снимка."""
+    article = _article()
+    file_manager.get_index_store().save_capture(article["url"], "v2", ARTICLE_HTML)
+    monkeypatch.setattr(file_manager, "save_article_content", MagicMock())
+
+    scraper = Scraper(MagicMock(), capture=True)
+    scraper.context = MagicMock()
+    scraper.context.new_page = AsyncMock(side_effect=RuntimeError("no browser"))
+    await scraper.scrape_single_article(article, ["json", "pdf"], 0, MagicMock())
+
+    scraper.context.new_page.assert_awaited_once()
+    assert scraper.captures_reused == 1
+
+
+@pytest.mark.asyncio
+async def test_unchanged_pdf_is_not_rendered_again(output_dir, monkeypatch):
+    """PDF с тем же отпечатком текста и параметров печати не отрисовывается повторно."""
+    article = _article()
+    file_manager.get_index_store().save_capture(article["url"], "v2", ARTICLE_HTML)
+    monkeypatch.setattr(file_manager, "save_article_content", MagicMock())
+    monkeypatch.setattr(config, "get_request_delay", lambda: 0)
+    (output_dir / "pdf").mkdir()
+
+    scraper = Scraper(MagicMock(), capture=True)
+    scraper.context = MagicMock()
+    scraper.context.new_page = AsyncMock()
+    scraper._save_as_pdf = AsyncMock(return_value=True)
+    await scraper.scrape_single_article(dict(article), ["json", "pdf"], 0, MagicMock())
+    scraper._save_as_pdf.assert_awaited_once()
+    (output_dir / "pdf" / "0001_Статья.pdf").write_bytes(b"%PDF-1.4")
+
+    scraper.scraped_content_hashes.clear()
+    await scraper.scrape_single_article(dict(article), ["json", "pdf"], 0, MagicMock())
+    scraper._save_as_pdf.assert_awaited_once()
+    assert scraper.get_statistics()["pdf_skipped"] == 1
+
+    # Другие параметры печати меняют отпечаток
+    monkeypatch.setattr(config, "_PDF_OPTIONS", {"format": "A5", "print_background": True})
+    scraper.scraped_content_hashes.clear()
+    await scraper.scrape_single_article(dict(article), ["json", "pdf"], 0, MagicMock())
+    assert scraper._save_as_pdf.await_count == 2
@@ -9,6 +9,7 @@ import os
 import shutil
 from pathlib import Path
 from src.file_merger import FileMerger, MergeConfig
+from src.token_counter import estimate_tokens
 
 
 @pytest.fixture
@@ -223,6 +224,395 @@ class TestFileMerger:
         assert merged_file.name.endswith('.json.gz')
         assert merged_file.exists()
     
+    def test_merge_json_group_streaming_layout(self, temp_dir, sample_files):
+        """Тест потоковой записи JSON: результат совпадает с json.dump, нечитаемые файлы пропускаются."""
+        merger = FileMerger()
+        output_path = temp_dir / "output"
+        output_path.mkdir()
+        broken = temp_dir / "broken.json"
+        broken.write_text("{", encoding="utf-8")
+        files = sorted(sample_files, key=lambda f: f.name) + [broken]
+
+        merged_file = merger._merge_json_group(files, output_path, 1)
+        text = merged_file.read_text(encoding="utf-8")
+        data = json.loads(text)
+
+        assert data["metadata"]["total_files"] == len(files)
+        assert [record["original_name"] for record in data["files"]] == [f.name for f in files[:-1]]
+        assert text == json.dumps(data, ensure_ascii=False, indent=2)
+
+    def test_merge_json_group_streaming_gzip(self, temp_dir, sample_files):
+        """Тест потоковой записи сжатого JSON."""
+        import gzip
+        config = MergeConfig(compress_output=True)
+        merger = FileMerger(config)
+        output_path = temp_dir / "output"
+        output_path.mkdir()
+
+        merged_file = merger._merge_json_group(sample_files, output_path, 2)
+        with gzip.open(merged_file, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+
+        assert data["metadata"]["group_number"] == 2
+        assert len(data["files"]) == len(sample_files)
+
+    def test_compression_for_all_formats(self, temp_dir, sample_files, tmp_path):
+        """Тест сжатия gzip для markdown и txt с заданным уровнем."""
+        import gzip
+        config = MergeConfig(compression="gzip", compression_level=1)
+        merger = FileMerger(config)
+        md_files = [f for f in sample_files if f.suffix == '.md']
+        txt_files = [f for f in sample_files if f.suffix == '.txt']
+
+        md_file = merger._merge_markdown_group(md_files, tmp_path, 1)
+        txt_file = merger._merge_txt_group(txt_files, tmp_path, 2)
+        assert md_file.name == "merged_group_001.md.gz"
+        assert txt_file.name == "merged_group_002.txt.gz"
+        with gzip.open(md_file, "rt", encoding="utf-8") as f:
+            assert "# Руководство 1" in f.read()
+        with gzip.open(txt_file, "rt", encoding="utf-8") as f:
+            assert "Текстовый документ 2" in f.read()
+
+    def test_compression_settings_validation(self, temp_dir, sample_files, monkeypatch):
+        """Тест ошибок параметров сжатия: метод, уровень, отсутствующий zstandard."""
+        import sys
+        with pytest.raises(ValueError):
+            FileMerger(MergeConfig(compression="bz2")).merge_files(str(temp_dir))
+        with pytest.raises(ValueError):
+            FileMerger(MergeConfig(compression="gzip", compression_level=12)).merge_files(str(temp_dir))
+        monkeypatch.setitem(sys.modules, "zstandard", None)
+        with pytest.raises(ImportError, match="zstandard"):
+            FileMerger(MergeConfig(compression="zstd")).merge_files(str(temp_dir))
+
+    def test_zstd_compression(self, temp_dir, sample_files, tmp_path):
+        """Тест потокового сжатия zstd."""
+        zstandard = pytest.importorskip("zstandard")
+        merger = FileMerger(MergeConfig(compression="zstd", compression_level=5))
+        merged_file = merger._merge_json_group(sample_files, tmp_path, 1)
+        assert merged_file.name == "merged_group_001.json.zst"
+        with open(merged_file, "rb") as f:
+            data = json.loads(zstandard.ZstdDecompressor().stream_reader(f).read())
+        assert len(data["files"]) == len(sample_files)
+
+    def test_zstd_threads_follow_effective_workers(self, temp_dir, sample_files, tmp_path, monkeypatch):
+        """Тест потоков zstd: многопоточное сжатие, если группы фактически объединяются последовательно."""
+        from types import SimpleNamespace
+        from src import file_merger
+        threads = []
+
+        class FakeCompressor:
+            def __init__(self, level, threads):
+                self.threads = threads
+
+            def stream_writer(self, raw):
+                threads.append(self.threads)
+                return raw
+
+        monkeypatch.setattr(file_merger, "_load_zstandard", lambda: SimpleNamespace(ZstdCompressor=FakeCompressor))
+        # Одна группа при --merge-workers 0 объединяется в текущем процессе
+        FileMerger(MergeConfig(compression="zstd", workers=0)).merge_files(str(temp_dir), str(tmp_path / "out"))
+        file_merger._merge_group_in_worker(MergeConfig(compression="zstd"), sample_files, tmp_path, 2, {}, {})
+        assert threads == [-1, 0]
+
+    def test_merge_jsonl_group(self, tmp_path):
+        """Тест формата JSONL: одна запись статьи на строку с метаданными из _meta.json."""
+        section_dir = tmp_path / "section"
+        input_dir = section_dir / "json"
+        input_dir.mkdir(parents=True)
+        for i in range(3):
+            (input_dir / f"{i:04d}_doc.json").write_text(json.dumps({"content": f"Текст {i}"}, ensure_ascii=False),
+                                                         encoding="utf-8")
+        records = [{"filename_base": "0000_doc", "url": "https://example.com/0", "title": "Статья 0",
+                    "breadcrumb": ["Раздел", "Статья 0"], "content_hash": "abc", "index": 0}]
+        (section_dir / "_meta.json").write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+
+        for workers in (1, 2):
+            output_dir = tmp_path / f"merged_{workers}"
+            merger = FileMerger(MergeConfig(output_format="jsonl", max_files=2, workers=workers))
+            merged = merger.merge_files(str(input_dir), str(output_dir))
+            assert [Path(p).name for p in merged[:2]] == ["merged_group_001.jsonl", "merged_group_002.jsonl"]
+
+            lines = (output_dir / "merged_group_001.jsonl").read_text(encoding="utf-8").splitlines()
+            first, second = (json.loads(line) for line in lines)
+            assert first == {"group": 1, "original_name": "0000_doc.json", "url": "https://example.com/0",
+                             "title": "Статья 0", "breadcrumb": ["Раздел", "Статья 0"], "content_hash": "abc",
+                             "data": {"content": "Текст 0"}}
+            assert second == {"group": 1, "original_name": "0001_doc.json", "data": {"content": "Текст 1"}}
+
+    def test_byte_copy_markdown_and_txt(self, tmp_path, monkeypatch):
+        """Тест побайтового объединения: копирование ядром, запасной путь и нормализация CRLF."""
+        input_dir = tmp_path / "md"
+        input_dir.mkdir()
+        (input_dir / "a.md").write_bytes("# Статья А\n\nТекст".encode("utf-8"))
+        (input_dir / "b.md").write_bytes("Строка 1\r\nСтрока 2\r\n".encode("utf-8"))
+        (input_dir / "c.md").write_bytes(b"")
+        merger = FileMerger(MergeConfig(output_format="markdown"))
+        files = merger._get_files_to_process(input_dir)
+
+        calls = []
+        copy_file_range = os.copy_file_range
+
+        def failing_copy_file_range(*args):
+            calls.append(args)
+            raise OSError("not supported")
+
+        monkeypatch.setattr(os, "copy_file_range", failing_copy_file_range)
+        merged = merger._merge_markdown_group(files, tmp_path, 1).read_text(encoding="utf-8")
+        assert calls  # ядро пробовалось, запасной путь (sendfile) дописал файл
+        assert "# a\n\n# Статья А\n\nТекст\n---\n\n# b\n\nСтрока 1\nСтрока 2\n\n---\n\n# c\n\n" in merged
+
+        monkeypatch.setattr(os, "copy_file_range", copy_file_range)
+        txt = merger._merge_txt_group(files, tmp_path, 2).read_text(encoding="utf-8")
+        assert "Файл: a.md\n" + "-" * 30 + "\n# Статья А\n\nТекст" in txt
+        assert "\r" not in txt
+
+        # В сжатый поток файлы копируются блоками, содержимое то же (без строки с датой)
+        import gzip
+        compressed = FileMerger(MergeConfig(compression="gzip"))._merge_markdown_group(files, tmp_path, 3)
+        with gzip.open(compressed, "rt", encoding="utf-8") as f:
+            assert f.read().split("- Создано: ")[1].split("\n", 1)[1] == merged.split("- Создано: ")[1].split("\n", 1)[1]
+
+    def test_byte_copy_keeps_non_utf8_bytes(self, tmp_path):
+        """Тест побайтового объединения: кодировка не проверяется, файл не в UTF-8 копируется как есть."""
+        input_dir = tmp_path / "md"
+        input_dir.mkdir()
+        (input_dir / "a.md").write_bytes("Статья".encode("utf-8"))
+        (input_dir / "b.md").write_bytes("Статья в cp1251".encode("cp1251"))
+        merger = FileMerger(MergeConfig(output_format="markdown"))
+
+        merged = merger._merge_markdown_group(merger._get_files_to_process(input_dir), tmp_path, 1).read_bytes()
+        assert "# a\n\nСтатья\n".encode("utf-8") in merged
+        assert b"# b\n\n" + "Статья в cp1251".encode("cp1251") in merged
+        assert "Ошибка чтения".encode("utf-8") not in merged
+
+    def test_parallel_merge_is_deterministic(self, temp_dir, sample_files, tmp_path):
+        """Тест параллельного объединения: имена и порядок файлов как при последовательном."""
+        def merge(workers, output_name):
+            config = MergeConfig(max_files=2, filter_pattern="*.json", workers=workers)
+            merged = FileMerger(config).merge_files(str(temp_dir), str(tmp_path / output_name))
+            result = []
+            for path in merged:
+                with open(path, "r", encoding="utf-8") as f:
+                    result.append((Path(path).name, json.load(f)["files"]))
+            return result
+
+        sequential = merge(1, "sequential")
+        parallel = merge(3, "parallel")
+
+        assert [name for name, _ in parallel] == ["merged_group_001.json", "merged_group_002.json", "merged_group_003.json"]
+        assert parallel == sequential
+
+    def test_negative_merge_workers(self, temp_dir, sample_files):
+        """Тест отрицательного числа процессов."""
+        merger = FileMerger(MergeConfig(workers=-1))
+        with pytest.raises(ValueError):
+            merger.merge_files(str(temp_dir), str(temp_dir / "output"))
+
+    def test_single_scan_reuses_file_stats(self, temp_dir, sample_files, monkeypatch, tmp_path):
+        """Тест обхода за один проход: вложенные файлы найдены, повторных stat() при планировании нет."""
+        nested = temp_dir / "section" / "deep"
+        nested.mkdir(parents=True)
+        (nested / "article_999.json").write_text('{"id": 999}', encoding="utf-8")
+        (nested / "image.png").write_bytes(b"PNG")
+
+        merger = FileMerger(MergeConfig(max_files=4, sort_by="size"))
+        files = merger._get_files_to_process(temp_dir)
+        assert len(files) == 11
+        assert nested / "article_999.json" in files
+
+        def fail_stat(self, *args, **kwargs):
+            raise AssertionError(f"повторный stat() для {self}")
+        monkeypatch.setattr(Path, "stat", fail_stat)
+
+        groups = merger._group_files(files)
+        assert sum(len(group) for group in groups) == 11
+        merger._merge_markdown_group(groups[0], tmp_path, 1)
+        monkeypatch.undo()
+        stats = merger.get_merge_statistics(str(temp_dir))
+        assert stats["total_files"] == 11
+
+    def test_incremental_merge_rebuilds_only_changed_groups(self, tmp_path):
+        """Тест инкрементального объединения: пересобираются только измененные группы, границы сохраняются."""
+        input_dir = tmp_path / "json"
+        input_dir.mkdir()
+        for i in range(6):
+            (input_dir / f"article_{i}.json").write_text(json.dumps({"id": i}), encoding="utf-8")
+        output_dir = tmp_path / "merged"
+        config = MergeConfig(max_files=2, incremental=True)
+
+        merger = FileMerger(config)
+        merger.merge_files(str(input_dir), str(output_dir))
+        assert merger.last_merge_summary == {"groups_rebuilt": 3, "groups_reused": 0, "groups_removed": 0}
+        first_group_mtime = (output_dir / "merged_group_001.json").stat().st_mtime_ns
+
+        # Файл группы 1 только "тронут", файл группы 2 изменен, из группы 3 удален файл, добавлен новый
+        os.utime(input_dir / "article_0.json", (1, 1))
+        (input_dir / "article_2.json").write_text(json.dumps({"id": 2, "changed": True}), encoding="utf-8")
+        (input_dir / "article_5.json").unlink()
+        (input_dir / "article_0a.json").write_text(json.dumps({"id": "0a"}), encoding="utf-8")
+
+        merger = FileMerger(config)
+        merged = merger.merge_files(str(input_dir), str(output_dir))
+        assert merger.last_merge_summary == {"groups_rebuilt": 3, "groups_reused": 1, "groups_removed": 0}
+        assert [Path(p).name for p in merged] == [f"merged_group_00{i}.json" for i in range(1, 5)]
+        assert (output_dir / "merged_group_001.json").stat().st_mtime_ns == first_group_mtime
+
+        def names(number):
+            with open(output_dir / f"merged_group_{number:03d}.json", encoding="utf-8") as f:
+                return [record["original_name"] for record in json.load(f)["files"]]
+        assert names(1) == ["article_0.json", "article_1.json"]
+        assert names(3) == ["article_4.json"]
+        assert names(4) == ["article_0a.json"]
+
+        # Без изменений ничего не пересобирается
+        merger = FileMerger(config)
+        merger.merge_files(str(input_dir), str(output_dir))
+        assert merger.last_merge_summary == {"groups_rebuilt": 0, "groups_reused": 4, "groups_removed": 0}
+
+        # Смена параметров приводит к полной пересборке и удалению лишних групп
+        merger = FileMerger(MergeConfig(max_files=10, incremental=True))
+        merger.merge_files(str(input_dir), str(output_dir))
+        assert merger.last_merge_summary == {"groups_rebuilt": 1, "groups_reused": 0, "groups_removed": 3}
+        assert sorted(p.name for p in output_dir.glob("merged_group_*")) == ["merged_group_001.json"]
+
+    def test_incremental_merge_with_reused_merger(self, tmp_path):
+        """Тест повторного объединения тем же FileMerger: измененный файл не берется из кэша хэшей."""
+        input_dir = tmp_path / "json"
+        input_dir.mkdir()
+        for i in range(4):
+            (input_dir / f"article_{i}.json").write_text(json.dumps({"id": i}), encoding="utf-8")
+        output_dir = tmp_path / "merged"
+        merger = FileMerger(MergeConfig(max_files=2, incremental=True))
+        merger.merge_files(str(input_dir), str(output_dir))
+
+        (input_dir / "article_3.json").write_text(json.dumps({"id": 3, "changed": True}), encoding="utf-8")
+        (input_dir / "article_1.json").unlink()
+        merger.merge_files(str(input_dir), str(output_dir))
+        assert merger.last_merge_summary == {"groups_rebuilt": 2, "groups_reused": 0, "groups_removed": 0}
+        assert sorted(merger._stats) == sorted(input_dir.iterdir())
+        with open(output_dir / "merged_group_002.json", encoding="utf-8") as f:
+            assert json.load(f)["files"][1]["data"] == {"id": 3, "changed": True}
+
+    def test_estimate_tokens(self):
+        """Тест оценки токенов: латиница плотнее кириллицы, числа и знаки считаются отдельно."""
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("word") == 1
+        assert estimate_tokens("слово") == 2
+        assert estimate_tokens("2025, year!") == 2 + 1 + 1 + 1
+
+    def test_group_files_by_tokens(self, tmp_path):
+        """Тест упаковки групп по бюджету токенов с кэшем счетчиков по файлам."""
+        input_dir = tmp_path / "md"
+        input_dir.mkdir()
+        for i, words in enumerate([300, 300, 300, 1000, 100]):
+            (input_dir / f"doc_{i}.md").write_text("word " * words, encoding="utf-8")
+        output_dir = tmp_path / "merged"
+        config = MergeConfig(output_format="markdown", max_tokens=700)
+
+        merger = FileMerger(config)
+        files = merger._get_files_to_process(input_dir)
+        groups = merger._group_files(files)
+        assert [[f.name for f in group] for group in groups] == [
+            ["doc_0.md", "doc_1.md"], ["doc_2.md"], ["doc_3.md"], ["doc_4.md"]]
+        assert all(sum(merger._file_tokens(f) for f in group) <= 700 for group in groups if len(group) > 1)
+
+        merger.merge_files(str(input_dir), str(output_dir))
+        assert (output_dir / "_token_cache.json").exists()
+
+        # Повторный запуск берет счетчики из кэша и не читает файлы
+        merger = FileMerger(config)
+        merger.merge_files(str(input_dir), str(output_dir))
+        assert merger._token_counter.misses == 0
+        assert merger._token_counter.hits == 5
+
+        stats = FileMerger(config).get_merge_statistics(str(input_dir))
+        assert stats["estimated_groups"] == 4
+        assert stats["total_tokens"] >= 2000
+
+    def test_invalid_token_settings(self, temp_dir, sample_files):
+        """Тест ошибок бюджета токенов и неизвестного токенизатора."""
+        with pytest.raises(ValueError):
+            FileMerger(MergeConfig(max_tokens=0))._group_files(sample_files)
+        with pytest.raises(ValueError):
+            FileMerger(MergeConfig(max_tokens=100, tokenizer="words"))._group_files(sample_files)
+
+    def test_bin_packing_strategies(self, tmp_path):
+        """Тест упаковки ffd/bfd: меньше групп, чем при последовательном заполнении, порядок внутри групп сохранен."""
+        input_dir = tmp_path / "txt"
+        input_dir.mkdir()
+        for i, size in enumerate([600, 500, 600, 500, 400, 400]):
+            (input_dir / f"doc_{i}.txt").write_text("x" * size, encoding="utf-8")
+        limit_mb = 1000 / (1024 * 1024)
+
+        def plan(strategy):
+            merger = FileMerger(MergeConfig(max_size_mb=limit_mb, group_strategy=strategy))
+            return [[f.name for f in group] for group in merger._group_files(merger._get_files_to_process(input_dir))]
+
+        assert len(plan("sequential")) == 5
+        assert plan("ffd") == [["doc_0.txt", "doc_4.txt"], ["doc_1.txt", "doc_3.txt"], ["doc_2.txt", "doc_5.txt"]]
+        assert len(plan("bfd")) == 3
+
+        stats = FileMerger(MergeConfig(max_size_mb=limit_mb, group_strategy="ffd")).get_merge_statistics(str(input_dir))
+        assert stats["estimated_groups"] == 3
+        assert [entry["files"] for entry in stats["group_plan"]] == [2, 2, 2]
+        assert stats["group_plan"][1]["fill_percent"] == 100.0
+
+        with pytest.raises(ValueError):
+            FileMerger(MergeConfig(group_strategy="random"))._group_files([])
+
+    def test_bin_packing_many_small_files(self, tmp_path):
+        """Тест упаковки нескольких тысяч файлов: число групп равно оптимальному по размеру."""
+        input_dir = tmp_path / "txt"
+        input_dir.mkdir()
+        for i in range(3000):
+            (input_dir / f"doc_{i:04d}.txt").write_bytes(b"x" * (300 if i % 2 else 100))
+        config = dict(max_files=100, max_size_mb=10000 / (1024 * 1024))
+
+        for strategy in ("ffd", "bfd"):
+            merger = FileMerger(MergeConfig(group_strategy=strategy, **config))
+            groups = merger._group_files(merger._get_files_to_process(input_dir))
+            assert len(groups) == 60
+            assert sorted(f for group in groups for f in group) == sorted(input_dir.iterdir())
+            assert all(sum(f.stat().st_size for f in group) <= 10000 for group in groups)
+
+    def test_best_fit_with_count_and_size_limits(self, tmp_path):
+        """Тест bfd при двух ограничениях: группа, почти заполненная по размеру, принимает файл, ограниченный количеством."""
+        input_dir = tmp_path / "txt"
+        input_dir.mkdir()
+        for i, size in enumerate([30, 50, 10] * 4):
+            (input_dir / f"doc_{i:02d}.txt").write_bytes(b"x" * size)
+        config = dict(max_files=4, max_size_mb=100 / (1024 * 1024))
+
+        plans = {}
+        for strategy in ("ffd", "bfd"):
+            merger = FileMerger(MergeConfig(group_strategy=strategy, **config))
+            groups = merger._group_files(merger._get_files_to_process(input_dir))
+            assert all(len(group) <= 4 and sum(f.stat().st_size for f in group) <= 100 for group in groups)
+            plans[strategy] = [[f.name for f in group] for group in groups]
+        assert len(plans["bfd"]) == len(plans["ffd"]) == 4
+
+    def test_subtree_strategy_keeps_sections_together(self, tmp_path):
+        """Тест стратегии subtree: раздел оглавления из _meta.json не делится, если помещается в группу."""
+        section_dir = tmp_path / "section"
+        input_dir = section_dir / "json"
+        input_dir.mkdir(parents=True)
+
+        def plan(sections, max_files):
+            for path in input_dir.iterdir():
+                path.unlink()
+            records = []
+            for i, section in enumerate(sections):
+                (input_dir / f"{i:04d}_doc.json").write_text(json.dumps({"id": i}), encoding="utf-8")
+                records.append({"filename_base": f"{i:04d}_doc", "breadcrumb": [section, f"Статья {i}"]})
+            (section_dir / "_meta.json").write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+            merger = FileMerger(MergeConfig(max_files=max_files, group_strategy="subtree"))
+            groups = merger._group_files(merger._get_files_to_process(input_dir))
+            return [[f.stem[:4] for f in group] for group in groups]
+
+        assert plan(["A", "A", "B", "B", "B", "C"], 4) == [["0000", "0001"], ["0002", "0003", "0004", "0005"]]
+        # Файлы раздела, разнесенные порядком сортировки, все равно попадают в одну группу
+        assert plan(["A", "B", "A", "B", "C"], 3) == [["0000", "0002"], ["0001", "0003", "0004"]]
+
     def test_sort_by_size(self, temp_dir, sample_files):
         """Тест сортировки файлов по размеру."""
         config = MergeConfig(sort_by="size")
@@ -0,0 +1,57 @@
+import json
+
+from src import file_manager
+from src.index_records import ArticleRecord, BreadcrumbNode
+
+
+def _record():
+    root = BreadcrumbNode("Раздел")
+    return ArticleRecord(1, "0001_Статья", "Статья", "https://its.1c.ru/db/test/1", BreadcrumbNode("Статья", root))
+
+
+def test_record_behaves_like_article_dict():
+    """Запись поддерживает операции словаря статьи."""
+    article = _record()
+    assert article["breadcrumb"] == ["Раздел", "Статья"]
+    assert article["aliases"] == []
+    assert "content_hash" not in article
+    assert article.get("content_hash") is None
+
+    article["content_hash"] = 42
+    article["filename_base"] = "0001_Другое"
+    assert article["content_hash"] == 42
+    assert json.loads(json.dumps(article.to_dict())) == {
+        "index": 1, "filename_base": "0001_Другое", "title": "Статья",
+        "url": "https://its.1c.ru/db/test/1", "breadcrumb": ["Раздел", "Статья"],
+        "aliases": [], "content_hash": 42,
+    }
+    assert not hasattr(article, "__dict__")
+
+
+def test_breadcrumb_prefixes_are_shared(output_dir):
+    """Статьи одного раздела ссылаются на общий узел хлебных крошек."""
+    file_manager.save_hierarchical_index([
+        {"title": "Раздел", "url": "", "children": [
+            {"title": "Статья 1", "url": "https://its.1c.ru/db/test/1", "children": []},
+            {"title": "Статья 2", "url": "https://its.1c.ru/db/test/2", "children": []},
+        ]},
+    ])
+    first, second = file_manager.load_index_data()
+
+    assert first.crumb.parent is second.crumb.parent
+    assert second["breadcrumb"] == ["Раздел", "Статья 2"]
+
+
+def test_iter_index_articles_is_lazy_and_count_is_cached(output_dir):
+    """Итератор отдает статьи по одной, а количество статей кэшируется хранилищем."""
+    file_manager.save_hierarchical_index([
+        {"title": f"Статья {i}", "url": f"https://its.1c.ru/db/test/{i}", "children": []} for i in range(5)
+    ])
+    articles = file_manager.iter_index_articles(limit=2)
+    assert next(articles)["index"] == 1
+    assert [a["index"] for a in articles] == [2]
+
+    store = file_manager.get_index_store()
+    assert file_manager.count_index_articles() == 5
+    store.conn.execute("DELETE FROM toc_nodes")
+    assert file_manager.count_index_articles() == 5
@@ -0,0 +1,187 @@
+import json
+import pytest
+
+from src import config
+from src import file_manager
+from src.index_store import IndexStore
+from src.utils import canonicalize_url
+
+
+TOC_TREE = [
+    {"title": "Раздел 1", "url": "https://its.1c.ru/db/test/1", "children": [
+        {"title": "Статья 1.1", "url": "https://its.1c.ru/db/test/1.1", "children": []},
+        {"title": "Группа", "url": "", "children": [
+            {"title": "Статья 1.2", "url": "https://its.1c.ru/db/test/1.2", "children": []},
+        ]},
+    ]},
+    {"title": "Раздел 2", "url": "https://its.1c.ru/db/test/2", "children": []},
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = IndexStore(str(tmp_path / "_index.sqlite"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def output_dir(output_dir):
+    """Общая фикстура output_dir с директорией tmp_index."""
+    (output_dir / "tmp_index").mkdir()
+    return output_dir
+
+
+def test_replace_and_load_toc_roundtrip(store):
+    """Дерево оглавления сохраняется и восстанавливается без изменений."""
+    store.replace_toc(TOC_TREE)
+    assert store.has_toc()
+    assert store.load_toc_tree() == TOC_TREE
+    assert store.count_toc_articles() == 4
+
+
+def test_subtree_lookup_by_url(store):
+    """Поддерево находится по URL корневого узла."""
+    store.replace_toc(TOC_TREE)
+    subtree = store.subtree("https://its.1c.ru/db/test/1")
+    assert len(subtree) == 1
+    assert [child["title"] for child in subtree[0]["children"]] == ["Статья 1.1", "Группа"]
+    assert store.subtree("https://its.1c.ru/db/missing") == []
+
+
+def test_upsert_and_get_article(store):
+    """Метаданные статьи обновляются по URL, дополнительные поля сохраняются."""
+    article = {"index": 1, "filename_base": "0001_A", "title": "A", "url": "u1",
+               "breadcrumb": ["A"], "content_hash": 42, "scrape_time": 1.5, "aliases": []}
+    store.upsert_articles([article])
+    store.upsert_articles([dict(article, content_hash=43)])
+
+    stored = store.get_article("u1")
+    assert stored["content_hash"] == 43
+    assert stored["scrape_time"] == 1.5
+    assert stored["aliases"] == []
+    assert store.article_urls() == {"u1"}
+
+
+def test_run_history(store):
+    """Запуски записываются в историю."""
+    run_id = store.start_run("https://its.1c.ru/db/test", ["json", "pdf"])
+    store.finish_run(run_id, "completed", 10, {"errors_count": 0})
+
+    runs = store.get_runs()
+    assert runs[0]["status"] == "completed"
+    assert runs[0]["articles_count"] == 10
+    assert json.loads(runs[0]["stats"]) == {"errors_count": 0}
+
+
+def test_load_index_data_from_store(output_dir):
+    """load_index_data нумерует только статьи с URL и строит хлебные крошки."""
+    file_manager.save_hierarchical_index(TOC_TREE)
+    articles = file_manager.load_index_data()
+
+    assert [a["index"] for a in articles] == [1, 2, 3, 4]
+    assert articles[2]["filename_base"] == "0003_Статья_1.2"
+    assert articles[2]["breadcrumb"] == ["Раздел 1", "Группа", "Статья 1.2"]
+    assert file_manager.count_index_articles() == 4
+    assert len(file_manager.load_index_data(limit=2)) == 2
+
+
+def test_load_index_data_imports_json(output_dir):
+    """Если в хранилище нет оглавления, оно импортируется из _toc_tree.json."""
+    with open(output_dir / "_toc_tree.json", "w", encoding="utf-8") as f:
+        json.dump(TOC_TREE, f, ensure_ascii=False)
+
+    assert len(file_manager.load_index_data()) == 4
+
+
+def test_store_is_seeded_from_meta_json(output_dir):
+    """Хранилище заполняется из существующего _meta.json при первом открытии."""
+    with open(output_dir / "_meta.json", "w", encoding="utf-8") as f:
+        json.dump([{"url": "https://its.1c.ru/db/test/1", "title": "A", "content_hash": 1}], f)
+
+    assert not file_manager.should_force_reindex([{"title": "A", "url": "https://its.1c.ru/db/test/1", "children": []}])
+    assert file_manager.should_force_reindex(TOC_TREE)
+    articles = file_manager.get_articles_to_scrape([{"url": "https://its.1c.ru/db/test/1"}], update_mode=True)
+    assert len(articles) == 1
+
+
+def test_index_survives_cleanup_and_expires(output_dir, monkeypatch):
+    """Индекс сохраняется между запусками и устаревает по TTL."""
+    file_manager.save_hierarchical_index(TOC_TREE)
+    file_manager.cleanup_temp_files()
+
+    assert file_manager.load_toc_tree() == TOC_TREE
+    assert file_manager.is_index_fresh(ttl=3600)
+
+    store = file_manager.get_index_store()
+    store.set_meta("toc_indexed_at", str(float(store.get_meta("toc_indexed_at")) - 7200))
+    assert not file_manager.is_index_fresh(ttl=3600)
+    assert file_manager.get_index_age() >= 7200
+
+
+def test_no_index_is_not_fresh(output_dir):
+    """Без индекса возраст не определен."""
+    assert file_manager.get_index_age() is None
+    assert not file_manager.is_index_fresh()
+
+
+def test_canonicalize_url():
+    """Фрагмент, порядок параметров и завершающий слэш не влияют на канонический URL."""
+    assert canonicalize_url("https://ITS.1c.ru/db/test/1/?b=2&a=1#part") == "https://its.1c.ru/db/test/1?a=1&b=2"
+    assert canonicalize_url("https://its.1c.ru/db/test/1#other") == canonicalize_url("https://its.1c.ru/db/test/1/")
+    assert canonicalize_url("") == ""
+
+
+def test_duplicate_urls_are_indexed_once_with_aliases(output_dir):
+    """Один документ в нескольких ветках оглавления нумеруется один раз, остальные места — псевдонимы."""
+    toc_tree = [
+        {"title": "Раздел 1", "url": "https://its.1c.ru/db/test/1", "children": [
+            {"title": "Общая статья", "url": "https://its.1c.ru/db/test/shared#p1", "children": []},
+        ]},
+        {"title": "Раздел 2", "url": "https://its.1c.ru/db/test/2", "children": [
+            {"title": "Общая статья (копия)", "url": "https://its.1c.ru/db/test/shared/", "children": []},
+        ]},
+    ]
+    file_manager.save_hierarchical_index(toc_tree)
+    articles = file_manager.load_index_data()
+
+    assert [a["index"] for a in articles] == [1, 2, 3]
+    assert file_manager.count_index_articles() == 3
+    shared = articles[1]
+    assert shared["url"] == "https://its.1c.ru/db/test/shared#p1"
+    assert shared["aliases"] == [["Раздел 2", "Общая статья (копия)"]]
+    # Полное дерево сохраняется без изменений, включая дубликаты
+    assert file_manager.load_toc_tree() == toc_tree
+
+
+def test_url_naming_is_stable_when_articles_are_inserted(output_dir, monkeypatch):
+    """При именовании по URL вставка статьи в начало не меняет имена остальных файлов."""
+    monkeypatch.setattr(config, "_NAMING_SCHEME", "url")
+    file_manager.save_hierarchical_index(TOC_TREE)
+    before = {a["url"]: a["filename_base"] for a in file_manager.load_index_data()}
+
+    new_article = {"title": "Новая", "url": "https://its.1c.ru/db/test/0", "children": []}
+    file_manager.save_hierarchical_index([new_article] + TOC_TREE)
+    after = {a["url"]: a["filename_base"] for a in file_manager.load_index_data()}
+
+    assert all(after[url] == name for url, name in before.items())
+    assert before["https://its.1c.ru/db/test/1.1"].startswith("db_test_1_1_")
+    assert before["https://its.1c.ru/db/test/2"].startswith("db_test_2_")
+
+
+def test_url_naming_toc_shows_ordered_alias(output_dir, monkeypatch):
+    """В _toc.md при именовании по URL рядом с заголовком выводится порядковый номер."""
+    monkeypatch.setattr(config, "_NAMING_SCHEME", "url")
+    file_manager.save_hierarchical_index(TOC_TREE)
+    articles = file_manager.load_index_data()
+    file_manager.create_markdown_toc(TOC_TREE, articles, ["json"])
+
+    toc = (output_dir / "_toc.md").read_text(encoding="utf-8")
+    assert "**0002 Статья 1.1**" in toc
+    assert f"./json/{articles[1]['filename_base']}.json" in toc
+
+
+def test_naming_scheme_validation():
+    """Неизвестная схема именования отклоняется."""
+    with pytest.raises(ValueError):
+        config.set_naming_scheme("random")
@@ -0,0 +1,90 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from src import indexer
+from src.scraper import Scraper
+
+
+def _node(title, url, children=None, discovered=False):
+    node = {"title": title, "url": url, "children": children or []}
+    if discovered:
+        node["discovered"] = True
+    return node
+
+
+@pytest.fixture
+def old_tree():
+    """Сохраненный индекс: оглавление плюс найденные вложенные статьи."""
+    return [
+        _node("A", "u/a", [
+            _node("A1", "u/a1", [_node("A1 nested", "u/a1n", discovered=True)]),
+        ]),
+        _node("B", "u/b", [
+            _node("B1", "u/b1"),
+            _node("B nested", "u/bn", discovered=True),
+        ]),
+    ]
+
+
+def test_toc_signature_ignores_discovered_nodes(old_tree):
+    """Подпись поддерева не зависит от найденных вложенных статей."""
+    bare = _node("A", "u/a", [_node("A1", "u/a1")])
+    assert indexer.toc_signature(old_tree[0]) == indexer.toc_signature(bare)
+
+
+def test_unchanged_toc_reuses_everything(old_tree):
+    """Без изменений оглавления повторный обход не нужен."""
+    new_toc = [_node("A", "u/a", [_node("A1", "u/a1")]), _node("B", "u/b", [_node("B1", "u/b1")])]
+    merged, changed, reused = indexer.merge_toc_trees(old_tree, new_toc)
+
+    assert merged == old_tree
+    assert changed == []
+    assert "u/a1n" in reused and "u/bn" in reused
+
+
+def test_changed_subtree_is_rediscovered_only(old_tree):
+    """Повторно обходится только поддерево, в котором изменились ссылки."""
+    new_toc = [
+        _node("A", "u/a", [_node("A1", "u/a1")]),
+        _node("B", "u/b", [_node("B1", "u/b1"), _node("B2", "u/b2")]),
+    ]
+    merged, changed, reused = indexer.merge_toc_trees(old_tree, new_toc)
+
+    assert [(node["url"], depth) for node, depth in changed] == [("u/b", 0)]
+    # Неизмененное поддерево сохраняет найденные статьи
+    assert merged[0] == old_tree[0]
+    # Неизмененный потомок измененного узла переиспользуется и не обходится повторно
+    assert "u/b1" in reused
+    assert "u/bn" not in indexer.collect_urls(merged)
+
+
+def test_diff_reports_added_removed_and_moved():
+    """Отчет содержит добавленные, удаленные и перемещенные узлы."""
+    old = [_node("A", "u/a", [_node("X", "u/x")]), _node("B", "u/b"), _node("C", "u/c")]
+    new = [_node("A", "u/a"), _node("B", "u/b", [_node("X", "u/x")]), _node("D", "u/d")]
+    diff = indexer.diff_toc_trees(old, new)
+
+    assert diff.added == ["u/d"]
+    assert diff.removed == ["u/c"]
+    assert diff.moved == ["u/x"]
+    assert not diff.is_empty()
+
+
+@pytest.mark.asyncio
+async def test_refresh_index_discovers_changed_subtrees(old_tree):
+    """refresh_index запускает обход только для измененных поддеревьев."""
+    scraper = Scraper(MagicMock())
+    new_toc = [_node("A", "u/a", [_node("A1", "u/a1")]), _node("C", "u/c")]
+    scraper.get_initial_toc = AsyncMock(return_value=new_toc)
+    scraper.discover_nested_articles = AsyncMock()
+
+    merged, diff = await scraper.refresh_index("u", old_tree)
+
+    scraper.discover_nested_articles.assert_awaited_once()
+    args, kwargs = scraper.discover_nested_articles.await_args
+    assert args[0][0]["url"] == "u/c"
+    assert kwargs["start_depth"] == 0
+    assert "u/a1n" in kwargs["visited_urls"]
+    assert diff.added == ["u/c"]
+    assert set(diff.removed) == {"u/b", "u/b1", "u/bn"}
+    assert diff.rediscovered == ["u/c"]
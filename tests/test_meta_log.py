@@ -0,0 +1,108 @@
+import json
+import pytest
+
+from src import config
+from src import file_manager
+from src.output_writer import OutputWriter
+
+
+def _article(i, content_hash=None):
+    return {
+        "index": i,
+        "filename_base": f"{i:04d}_Статья",
+        "title": f"Статья {i}",
+        "url": f"https://its.1c.ru/db/test/{i}",
+        "breadcrumb": ["Раздел", f"Статья {i}"],
+        "content_hash": content_hash,
+    }
+
+
+def test_meta_json_is_valid_json_and_streamable(output_dir):
+    """_meta.json остается обычным JSON-массивом и читается построчно."""
+    articles = [_article(i) for i in range(3)]
+    file_manager.create_meta_json(articles, ["json"])
+
+    with open(output_dir / "_meta.json", encoding="utf-8") as f:
+        assert json.load(f) == articles
+    assert list(file_manager.iter_meta_records()) == articles
+
+
+def test_legacy_indented_meta_json_is_still_read(output_dir):
+    """Старый формат _meta.json с indent=4 читается без ошибок."""
+    articles = [_article(i) for i in range(2)]
+    with open(output_dir / "_meta.json", "w", encoding="utf-8") as f:
+        json.dump(articles, f, ensure_ascii=False, indent=4)
+
+    assert file_manager.load_existing_meta_data() == articles
+
+
+def test_log_records_override_meta_json(output_dir):
+    """Записи из _meta.jsonl заменяют записи с тем же URL и добавляют новые."""
+    file_manager.create_meta_json([_article(1, 10), _article(2, 20)], ["json"])
+    file_manager.append_meta_record(_article(2, 21))
+    file_manager.append_meta_record(_article(3, 30))
+
+    records = file_manager.load_existing_meta_data()
+    assert [r["content_hash"] for r in records] == [10, 21, 30]
+
+
+def test_torn_last_line_is_ignored(output_dir):
+    """Оборванная последняя строка лога после сбоя пропускается."""
+    file_manager.append_meta_record(_article(1))
+    with open(output_dir / "_meta.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"url": "https://its.1c.ru/db/test/2", "ti')
+
+    assert [r["index"] for r in file_manager.load_existing_meta_data()] == [1]
+
+
+def test_compact_meta_log(output_dir):
+    """Компактация переносит лог в _meta.json и удаляет лог."""
+    file_manager.append_meta_record(_article(1))
+    file_manager.append_meta_record(_article(2))
+
+    assert file_manager.compact_meta_log() == 2
+    assert not (output_dir / "_meta.jsonl").exists()
+    assert [r["index"] for r in file_manager.load_existing_meta_data()] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_record_article_meta_compacts_periodically(output_dir, monkeypatch):
+    """Каждые N записей лог компактируется в _meta.json."""
+    monkeypatch.setattr(config, "_META_COMPACT_INTERVAL", 2)
+    writer = OutputWriter()
+    for i in range(3):
+        await file_manager.record_article_meta(_article(i), writer=writer)
+    await writer.close()
+
+    with open(output_dir / "_meta.json", encoding="utf-8") as f:
+        assert [r["index"] for r in json.load(f)] == [0, 1]
+    assert [r["index"] for r in file_manager.load_existing_meta_data()] == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_record_article_meta_batches_index_upserts(output_dir, monkeypatch):
+    """Строки индекса накапливаются и записываются пачкой в пуле записи, а не по одной статье."""
+    monkeypatch.setattr(config, "_META_COMPACT_INTERVAL", 0)
+    monkeypatch.setattr(file_manager, "INDEX_UPSERT_BATCH", 3)
+    store = file_manager.get_index_store()
+    upserts = []
+    upsert_articles = store.upsert_articles
+    monkeypatch.setattr(store, "upsert_articles", lambda rows: upserts.append(len(rows)) or upsert_articles(rows))
+
+    writer = OutputWriter()
+    for i in range(4):
+        await file_manager.record_article_meta(_article(i), writer=writer)
+    await writer.close()
+    assert upserts == [3]
+    assert store.get_article(_article(3)["url"]) is None
+
+    file_manager.close_index_stores()
+    assert upserts == [3, 1]
+    assert file_manager.get_index_store().get_article(_article(3)["url"])["title"] == "Статья 3"
+
+
+def test_create_meta_json_removes_log(output_dir):
+    """Финальный _meta.json заменяет лог."""
+    file_manager.append_meta_record(_article(1))
+    file_manager.create_meta_json([_article(1)], ["json"])
+    assert not (output_dir / "_meta.jsonl").exists()
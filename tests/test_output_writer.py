@@ -0,0 +1,130 @@
+import os
+import pytest
+from unittest.mock import MagicMock
+
+from src.output_writer import OutputWriter
+
+
+class TestOutputWriter:
+    """Test the thread-pool backed output writer."""
+
+    @pytest.mark.asyncio
+    async def test_writes_str_and_bytes(self, tmp_path):
+        """Text and binary payloads end up on disk after flush."""
+        writer = OutputWriter(max_workers=2)
+        await writer.write(str(tmp_path / "a.txt"), "Привет")
+        await writer.write(str(tmp_path / "b.pdf"), b"%PDF-1.4")
+        await writer.close()
+
+        assert (tmp_path / "a.txt").read_text(encoding="utf-8") == "Привет"
+        assert (tmp_path / "b.pdf").read_bytes() == b"%PDF-1.4"
+        assert writer.get_statistics()["files_written"] == 2
+
+    @pytest.mark.asyncio
+    async def test_small_files_are_batched_until_flush(self, tmp_path):
+        """Small files wait in the batch until it fills up or flush() is called."""
+        writer = OutputWriter(batch_size=10)
+        await writer.write_many((str(tmp_path / f"{i}.json"), "{}") for i in range(3))
+        assert len(writer._batch) == 3
+
+        await writer.flush()
+        assert writer._batch == []
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["0.json", "1.json", "2.json"]
+        writer.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_large_file_is_dispatched_immediately(self, tmp_path):
+        """Files above the small-file threshold bypass the batch."""
+        writer = OutputWriter(small_file_bytes=4)
+        await writer.write(str(tmp_path / "big.txt"), "x" * 100)
+        assert writer._batch == []
+        await writer.close()
+        assert (tmp_path / "big.txt").stat().st_size == 100
+
+    @pytest.mark.asyncio
+    async def test_large_write_lands_after_batched_write_of_same_path(self, tmp_path):
+        """A large write does not overtake a smaller batched write of the same path."""
+        path = str(tmp_path / "article.json")
+        writer = OutputWriter(small_file_bytes=64, batch_size=10)
+        await writer.write(path, "old")
+        await writer.write(path, "n" * 100)
+        assert writer._batch == []
+        await writer.close()
+        assert (tmp_path / "article.json").read_text() == "n" * 100
+
+    @pytest.mark.asyncio
+    async def test_appends_keep_submission_order(self, tmp_path):
+        """Appends to one file land in the order they were submitted."""
+        log_file = str(tmp_path / "log.jsonl")
+        writer = OutputWriter(max_workers=4)
+        for i in range(100):
+            await writer.append(log_file, f"{i}\n")
+        await writer.close()
+        assert [int(line) for line in (tmp_path / "log.jsonl").read_text().splitlines()] == list(range(100))
+
+    @pytest.mark.asyncio
+    async def test_appends_preserve_all_lines(self, tmp_path):
+        """Appends from many jobs never lose or interleave lines."""
+        log_file = str(tmp_path / "log.jsonl")
+        writer = OutputWriter(max_workers=4)
+        for i in range(50):
+            await writer.append(log_file, f"{i}\n")
+        await writer.close()
+
+        lines = (tmp_path / "log.jsonl").read_text().splitlines()
+        assert sorted(int(line) for line in lines) == list(range(50))
+
+    @pytest.mark.asyncio
+    async def test_write_errors_are_counted_and_logged(self, tmp_path):
+        """A failing write is logged and does not break the flush barrier."""
+        log = MagicMock()
+        writer = OutputWriter(log)
+        await writer.write(str(tmp_path / "missing" / "a.txt"), "data")
+        await writer.close()
+
+        assert writer.get_statistics()["write_errors"] == 1
+        log.error.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_flush_fsync_policy(self, tmp_path):
+        """With the 'flush' policy written paths are synced at the barrier."""
+        writer = OutputWriter(fsync_policy="flush")
+        await writer.write(str(tmp_path / "a.txt"), "data")
+        await writer.flush()
+        assert writer._unsynced == set()
+        writer.shutdown()
+
+    def test_invalid_fsync_policy(self):
+        """Unknown fsync policies are rejected."""
+        with pytest.raises(ValueError):
+            OutputWriter(fsync_policy="sometimes")
+
+    @pytest.mark.asyncio
+    async def test_identical_content_is_not_rewritten(self, tmp_path):
+        """Unchanged files keep their mtime and are counted as skipped."""
+        path = tmp_path / "a.md"
+        path.write_text("# Заголовок\n", encoding="utf-8")
+        os.utime(path, (1000, 1000))
+
+        writer = OutputWriter()
+        await writer.write(str(path), "# Заголовок\n")
+        await writer.write(str(tmp_path / "b.md"), "new")
+        await writer.close()
+
+        assert path.stat().st_mtime == 1000
+        stats = writer.get_statistics()
+        assert stats["files_written"] == 1
+        assert stats["files_skipped"] == 1
+
+    @pytest.mark.asyncio
+    async def test_same_size_different_content_is_rewritten(self, tmp_path):
+        """A file of the same size but different bytes is rewritten."""
+        path = tmp_path / "a.json"
+        path.write_text("aaaa", encoding="utf-8")
+
+        writer = OutputWriter()
+        await writer.write(str(path), "bbbb")
+        await writer.close()
+
+        assert path.read_text(encoding="utf-8") == "bbbb"
+        assert writer.get_statistics()["files_skipped"] == 0
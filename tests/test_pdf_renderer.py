@@ -0,0 +1,104 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from src import config
+from src import file_manager
+from src import pdf_renderer
+from src.pdf_renderer import PdfRenderPool
+from src.scraper import Scraper
+
+
+class FakeRenderer:
+    """Заменяет Scraper в пуле: записывает вызовы вместо работы с браузером."""
+    instances = []
+
+    def __init__(self, log_func, writer=None):
+        self.rendered = []
+        self.connect = AsyncMock()
+        self.login = AsyncMock()
+        self.close = AsyncMock()
+        FakeRenderer.instances.append(self)
+
+    async def render_pdf(self, url, path, print_url=None):
+        self.rendered.append((url, path, print_url))
+        return "fail" not in url
+
+
+@pytest.mark.asyncio
+async def test_pool_renders_all_jobs_and_records_fingerprints(output_dir, monkeypatch):
+    """Пул обрабатывает все задания и запоминает отпечатки успешно созданных PDF."""
+    FakeRenderer.instances = []
+    monkeypatch.setattr(pdf_renderer, "Scraper", FakeRenderer)
+    pool = PdfRenderPool(MagicMock(), workers=2)
+    await pool.start()
+    for i in range(5):
+        await pool.submit(f"https://its.1c.ru/db/test/{i}", str(output_dir / f"{i}.pdf"), f"fp{i}",
+                          print_url=f"https://its.1c.ru/db/test/{i}/print")
+    await pool.submit("https://its.1c.ru/db/test/fail", str(output_dir / "fail.pdf"), "fp")
+    await pool.join()
+
+    assert len(FakeRenderer.instances) == 2
+    assert sum(len(r.rendered) for r in FakeRenderer.instances) == 6
+    assert all(r.close.await_count == 1 for r in FakeRenderer.instances)
+    assert pool.get_statistics() == {"pdf_submitted": 6, "pdf_rendered": 5, "pdf_failed": 1}
+    render = file_manager.get_index_store().get_pdf_render("https://its.1c.ru/db/test/3")
+    assert render["fingerprint"] == "fp3"
+    assert file_manager.get_index_store().get_pdf_render("https://its.1c.ru/db/test/fail") is None
+
+
+@pytest.mark.asyncio
+async def test_scraper_hands_pdf_to_pool(output_dir, monkeypatch):
+    """С пулом скрапер ставит PDF в очередь вместо отрисовки и передает ссылку на версию для печати."""
+    monkeypatch.setattr(file_manager, "save_article_content", MagicMock())
+    monkeypatch.setattr(config, "get_request_delay", lambda: 0)
+    pool = MagicMock()
+    pool.submit = AsyncMock()
+
+    page = MagicMock()
+    page.goto = AsyncMock()
+    page.wait_for_load_state = AsyncMock()
+    page.content = AsyncMock(return_value="<html><body><div id='w_content'>Текст</div></body></html>")
+    page.frame = MagicMock(return_value=None)
+    page.close = AsyncMock()
+    link = MagicMock()
+    link.get_attribute = AsyncMock(return_value="/db/v8std/print/1")
+    page.query_selector = AsyncMock(return_value=link)
+
+    scraper = Scraper(MagicMock(), pdf_pool=pool)
+    scraper.context = MagicMock()
+    scraper.context.new_page = AsyncMock(return_value=page)
+    scraper._save_as_pdf = AsyncMock()
+    article = {"index": 1, "filename_base": "0001_Статья", "title": "Статья",
+               "url": "https://its.1c.ru/db/v8std/content/1/hdoc"}
+    await scraper.scrape_single_article(article, ["json", "pdf"], 0, MagicMock())
+
+    scraper._save_as_pdf.assert_not_awaited()
+    pool.submit.assert_awaited_once()
+    args, kwargs = pool.submit.await_args
+    assert args[0] == article["url"]
+    assert args[1].endswith("0001_Статья.pdf")
+    assert kwargs["print_url"] == f"{config.BASE_URL}/db/v8std/print/1"
+
+
+def test_pdf_timeout_defaults_to_page_timeout(monkeypatch):
+    """Таймаут PDF по умолчанию равен таймауту загрузки страницы и проверяется на диапазон."""
+    monkeypatch.setattr(config, "_PDF_TIMEOUT", None)
+    assert config.get_pdf_timeout() == config.get_page_timeout()
+    config.set_pdf_timeout(300)
+    assert config.get_pdf_timeout() == 300000
+    with pytest.raises(ValueError):
+        config.set_pdf_timeout(5)
+
+
+def test_run_statistics_add_up_all_workers_and_pool():
+    """Статистика запуска складывается по всем воркерам (включая pdf_skipped) и дополняется статистикой пула."""
+    import main as main_app
+    scrapers = [MagicMock(), MagicMock()]
+    scrapers[0].get_statistics.return_value = {"errors_count": 1, "scraped_unique_articles": 5, "pdf_skipped": 2}
+    scrapers[1].get_statistics.return_value = {"errors_count": 0, "scraped_unique_articles": 5, "pdf_skipped": 3}
+    pool = MagicMock()
+    pool.get_statistics.return_value = {"pdf_submitted": 4, "pdf_rendered": 4, "pdf_failed": 0}
+
+    stats = main_app.collect_run_statistics(scrapers, pool)
+    assert stats == {"errors_count": 1, "scraped_unique_articles": 5, "pdf_skipped": 5,
+                     "pdf_submitted": 4, "pdf_rendered": 4, "pdf_failed": 0}
@@ -0,0 +1,92 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from src import config
+from src import file_manager
+from src.print_cache import prepare_offline_html
+from src.scraper import Scraper
+
+
+ARTICLE_URL = "https://its.1c.ru/db/v8std/content/1/hdoc"
+PRINT_URL = "https://its.1c.ru/db/v8std/print/1"
+
+
+def _response(url, resource_type, body, content_type="text/css"):
+    response = MagicMock()
+    response.url = url
+    response.ok = True
+    response.request.resource_type = resource_type
+    response.headers = {"content-type": content_type}
+    response.body = AsyncMock(return_value=body)
+    return response
+
+
+def test_cache_stores_pages_and_deduplicates_assets(output_dir):
+    """Страницы ищутся по каноническому URL, одинаковые ресурсы хранятся в одном файле."""
+    cache = file_manager.get_print_cache()
+    cache.save_page(ARTICLE_URL + "#top", PRINT_URL, "<html><body>Текст</body></html>")
+    cache.save_asset("https://its.1c.ru/css/a.css", b"body{}", "text/css")
+    cache.save_asset("https://its.1c.ru/css/b.css", b"body{}", "text/css")
+
+    assert cache.load_page(ARTICLE_URL) == (PRINT_URL, "<html><body>Текст</body></html>")
+    assert cache.load_asset("https://its.1c.ru/css/b.css") == (b"body{}", "text/css")
+    assert cache.load_asset("https://its.1c.ru/css/missing.css") is None
+    assert len(list((output_dir / "_print_cache" / "assets").rglob("*.css"))) == 1
+
+
+def test_prepare_offline_html_adds_base_and_drops_scripts():
+    """В HTML для офлайн-отрисовки добавляется <base>, скрипты удаляются."""
+    html = prepare_offline_html("<html><head><script>x()</script></head><body><img src='/i.png'></body></html>", PRINT_URL)
+    assert f'<base href="{PRINT_URL}"/>' in html
+    assert "<script" not in html
+
+
+@pytest.mark.asyncio
+async def test_print_page_is_cached_and_rendered_offline(output_dir, monkeypatch):
+    """Страница печати сохраняется в кэш и затем отрисовывается из него без обращений к сайту."""
+    monkeypatch.setattr(config, "_PRINT_CACHE", True)
+    print_page = MagicMock()
+    handlers = []
+    print_page.on = lambda event, handler: handlers.append(handler)
+
+    async def goto(url, timeout=None):
+        handlers[0](_response("https://its.1c.ru/css/print.css", "stylesheet", b"h1{}"))
+        handlers[0](_response("https://its.1c.ru/js/app.js", "script", b"x()", "text/javascript"))
+
+    print_page.goto = goto
+    print_page.wait_for_load_state = AsyncMock()
+    print_page.content = AsyncMock(return_value="<html><head></head><body><h1>Статья</h1></body></html>")
+    print_page.pdf = AsyncMock(return_value=b"%PDF")
+    print_page.close = AsyncMock()
+
+    scraper = Scraper(MagicMock())
+    scraper.context = MagicMock()
+    scraper.context.new_page = AsyncMock(return_value=print_page)
+    assert await scraper.render_pdf(ARTICLE_URL, str(output_dir / "online.pdf"), print_url=PRINT_URL)
+
+    cache = file_manager.get_print_cache()
+    assert cache.has_page(ARTICLE_URL)
+    assert cache.load_asset("https://its.1c.ru/css/print.css") == (b"h1{}", "text/css")
+    assert not cache.has_asset("https://its.1c.ru/js/app.js")
+
+    offline_page = MagicMock()
+    offline_page.route = AsyncMock()
+    offline_page.set_content = AsyncMock()
+    offline_page.pdf = AsyncMock(return_value=b"%PDF-offline")
+    offline_page.close = AsyncMock()
+    scraper.context.new_page = AsyncMock(return_value=offline_page)
+    assert await scraper.render_cached_pdf(ARTICLE_URL, str(output_dir / "offline.pdf"))
+    assert (output_dir / "offline.pdf").read_bytes() == b"%PDF-offline"
+    assert f'<base href="{PRINT_URL}"/>' in offline_page.set_content.await_args.args[0]
+
+    serve = offline_page.route.await_args.args[1]
+    cached_route = MagicMock(fulfill=AsyncMock(), abort=AsyncMock())
+    cached_route.request.url = "https://its.1c.ru/css/print.css"
+    await serve(cached_route)
+    cached_route.fulfill.assert_awaited_once_with(status=200, body=b"h1{}", content_type="text/css")
+    unknown_route = MagicMock(fulfill=AsyncMock(), abort=AsyncMock())
+    unknown_route.request.url = "https://its.1c.ru/counter"
+    await serve(unknown_route)
+    unknown_route.abort.assert_awaited_once()
+
+    assert not await scraper.render_cached_pdf("https://its.1c.ru/db/v8std/content/2/hdoc", str(output_dir / "2.pdf"))
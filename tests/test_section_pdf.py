@@ -0,0 +1,75 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from src import file_manager
+from src import section_pdf
+from src.scraper import Scraper
+
+
+SECTION = {"title": "Раздел", "url": "https://its.1c.ru/db/test/1", "children": [
+    {"title": "Группа", "url": "", "children": [
+        {"title": "Статья 1.1", "url": "https://its.1c.ru/db/test/1.1", "children": []},
+    ]},
+    {"title": "Дубликат", "url": "https://its.1c.ru/db/test/1.1#part", "children": []},
+]}
+
+
+def _articles():
+    return {
+        "https://its.1c.ru/db/test/1": {"url": "https://its.1c.ru/db/test/1", "filename_base": "0001_Раздел"},
+        "https://its.1c.ru/db/test/1.1": {"url": "https://its.1c.ru/db/test/1.1", "filename_base": "0002_Статья_1.1"},
+    }
+
+
+def test_section_headings_follow_breadcrumb_depth():
+    """Уровни заголовков повторяют глубину в оглавлении, заголовки статей сдвигаются ниже."""
+    stored = {
+        "https://its.1c.ru/db/test/1": ("https://its.1c.ru/db/test/print/1",
+                                        "<html><head><link rel='stylesheet' href='/css/print.css'></head>"
+                                        "<body><h1>Раздел</h1><img src='img/a.png'></body></html>"),
+        "https://its.1c.ru/db/test/1.1": (None, "<html><body><h1>Статья</h1><h5>Глубоко</h5></body></html>"),
+    }
+    document, included = section_pdf.build_section_html(SECTION, _articles(), lambda a: stored[a["url"]])
+
+    assert included == 2
+    assert "<h1>Раздел</h1>" in document
+    assert "<h2>Группа</h2>" in document
+    assert '<h3 class="article-start">Статья 1.1</h3>' in document
+    assert "<h4>Статья</h4>" in document
+    assert '<p style="font-weight: bold">Глубоко</p>' in document
+    # The duplicate keeps its place in the outline but not a second copy of the article
+    assert "<h2>Дубликат</h2>" in document and document.count("<h4>Статья</h4>") == 1
+    assert '<link href="https://its.1c.ru/css/print.css" rel="stylesheet"/>' in document
+    assert 'src="https://its.1c.ru/db/test/print/img/a.png"' in document
+
+
+def test_stored_article_falls_back_to_json_text(output_dir):
+    """Без страницы печати в кэше используется текст JSON-файла статьи."""
+    json_dir = output_dir / "json"
+    json_dir.mkdir()
+    (json_dir / "0002_Статья_1.1.json").write_text(json.dumps({"content": "Строка 1\nСтрока <2>"}), encoding="utf-8")
+    article = _articles()["https://its.1c.ru/db/test/1.1"]
+
+    base_url, html = section_pdf.load_stored_article(article, file_manager.get_print_cache())
+    assert base_url is None
+    assert html == "<html><body><p>Строка 1</p><p>Строка &lt;2&gt;</p></body></html>"
+    assert section_pdf.load_stored_article(_articles()["https://its.1c.ru/db/test/1"], file_manager.get_print_cache()) is None
+
+
+@pytest.mark.asyncio
+async def test_section_is_rendered_with_outline(output_dir):
+    """Сводный документ отрисовывается за один проход с закладками."""
+    page = MagicMock()
+    page.route = AsyncMock()
+    page.set_content = AsyncMock()
+    page.pdf = AsyncMock(return_value=b"%PDF")
+    page.close = AsyncMock()
+    scraper = Scraper(MagicMock())
+    scraper.context = MagicMock()
+    scraper.context.new_page = AsyncMock(return_value=page)
+
+    await scraper.render_html_pdf("<html></html>", str(output_dir / "01_Раздел.pdf"), outline=True)
+
+    page.pdf.assert_awaited_once_with(format="A4", print_background=True, outline=True, tagged=True)
+    assert (output_dir / "01_Раздел.pdf").read_bytes() == b"%PDF"
@@ -0,0 +1,98 @@
+import os
+import pytest
+from unittest.mock import MagicMock
+
+from src import file_manager
+from src.scraper import Scraper
+
+
+TOC_TREE = [
+    {"title": "Раздел 1", "url": "https://its.1c.ru/db/test/1", "children": [
+        {"title": "Группа", "url": "", "children": [
+            {"title": "Статья 1.1", "url": "https://its.1c.ru/db/test/1.1", "children": []},
+        ]},
+        {"title": "Дубликат", "url": "https://its.1c.ru/db/test/2", "children": []},
+    ]},
+    {"title": "Раздел 2", "url": "https://its.1c.ru/db/test/2", "children": []},
+]
+
+
+@pytest.fixture
+def output_dir(output_dir):
+    """Общая фикстура output_dir с созданными директориями json и markdown."""
+    file_manager.setup_output_directories(["json", "markdown"])
+    return output_dir
+
+
+@pytest.mark.asyncio
+async def test_discovery_emits_every_article_once():
+    """Обход передает каждую статью один раз, включая статьи в группах без URL."""
+    emitted = []
+
+    async def on_article(node, breadcrumb):
+        emitted.append((node["url"], breadcrumb))
+
+    scraper = Scraper(MagicMock())
+    await scraper.discover_nested_articles(TOC_TREE, max_depth=0, on_article=on_article)
+
+    assert emitted == [
+        ("https://its.1c.ru/db/test/1", ["Раздел 1"]),
+        ("https://its.1c.ru/db/test/1.1", ["Раздел 1", "Группа", "Статья 1.1"]),
+        ("https://its.1c.ru/db/test/2", ["Раздел 1", "Дубликат"]),
+    ]
+
+
+def test_finalize_renames_to_final_numbering(output_dir):
+    """Файлы с временными именами переименовываются по итоговой нумерации индекса."""
+    streamed = [
+        file_manager.make_streamed_article(TOC_TREE[1], ["Раздел 2"], 1),
+        file_manager.make_streamed_article(TOC_TREE[0], ["Раздел 1"], 2),
+    ]
+    streamed[0]["content_hash"] = 7
+    for article in streamed:
+        (output_dir / "json" / f"{article['filename_base']}.json").write_text("{}", encoding="utf-8")
+
+    file_manager.save_hierarchical_index(TOC_TREE)
+    final = file_manager.finalize_streamed_articles(streamed, ["json", "markdown"])
+
+    assert [a["filename_base"] for a in final] == ["0001_Раздел_1", "0003_Дубликат"]
+    assert final[1]["content_hash"] == 7
+    assert sorted(p.name for p in (output_dir / "json").iterdir()) == ["0001_Раздел_1.json", "0003_Дубликат.json"]
+
+
+def test_finalize_keeps_unchanged_final_file(output_dir):
+    """Итоговый файл с тем же содержимым не перезаписывается: временный файл удаляется, mtime сохраняется."""
+    streamed = [
+        file_manager.make_streamed_article(TOC_TREE[0], ["Раздел 1"], 1),
+        file_manager.make_streamed_article(TOC_TREE[0]["children"][0]["children"][0], ["Раздел 1", "Группа", "Статья 1.1"], 2),
+    ]
+    file_manager.save_hierarchical_index(TOC_TREE)
+    json_dir = output_dir / "json"
+    (json_dir / "0001_Раздел_1.json").write_text('{"v": 1}', encoding="utf-8")
+    (json_dir / "0002_Статья_1.1.json").write_text('{"v": 1}', encoding="utf-8")
+    os.utime(json_dir / "0001_Раздел_1.json", (1, 1))
+    os.utime(json_dir / "0002_Статья_1.1.json", (1, 1))
+    (json_dir / f"{streamed[0]['filename_base']}.json").write_text('{"v": 1}', encoding="utf-8")
+    (json_dir / f"{streamed[1]['filename_base']}.json").write_text('{"v": 2}', encoding="utf-8")
+
+    file_manager.finalize_streamed_articles(streamed, ["json"])
+
+    assert sorted(p.name for p in json_dir.iterdir()) == ["0001_Раздел_1.json", "0002_Статья_1.1.json"]
+    assert (json_dir / "0001_Раздел_1.json").stat().st_mtime == 1
+    assert (json_dir / "0002_Статья_1.1.json").read_text(encoding="utf-8") == '{"v": 2}'
+
+
+def test_finalize_keeps_pdf_render_current(output_dir):
+    """Запись об отрисовке PDF переезжает вместе с файлом, и PDF не считается устаревшим при --update."""
+    (output_dir / "pdf").mkdir()
+    streamed = [file_manager.make_streamed_article(TOC_TREE[0], ["Раздел 1"], 1)]
+    provisional = output_dir / "pdf" / f"{streamed[0]['filename_base']}.pdf"
+    provisional.write_bytes(b"%PDF-1.4")
+    file_manager.record_pdf_render(TOC_TREE[0]["url"], str(provisional), "fp")
+
+    file_manager.save_hierarchical_index(TOC_TREE)
+    file_manager.finalize_streamed_articles(streamed, ["json", "pdf"])
+
+    final = output_dir / "pdf" / "0001_Раздел_1.pdf"
+    assert final.exists() and not provisional.exists()
+    assert file_manager.is_pdf_current(TOC_TREE[0]["url"], str(final), "fp")
@@ -3,7 +3,7 @@ import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 
 from src import config
-from src.utils import retry_on_error, retry_on_timeout, sleep_with_jitter
+from src.utils import retry_on_error, retry_on_timeout, sleep_with_jitter, parse_duration
 
 
 class TestConfigTimeouts:
@@ -530,6 +530,36 @@ class TestRetryBackoff:
                 assert "Retry" in content or "attempt" in content
 
 
+class TestIndexTTL:
+    """Test index TTL configuration and duration parsing."""
+    
+    def test_parse_duration_units(self):
+        """Test parsing of plain seconds and unit suffixes."""
+        assert parse_duration("90") == 90
+        assert parse_duration("30m") == 1800
+        assert parse_duration("12h") == 43200
+        assert parse_duration("7d") == 604800
+        assert parse_duration("1.5h") == 5400
+    
+    def test_parse_duration_invalid(self):
+        """Test that malformed durations are rejected."""
+        with pytest.raises(ValueError):
+            parse_duration("soon")
+        with pytest.raises(ValueError):
+            parse_duration("-5m")
+    
+    def test_set_index_ttl(self):
+        """Test setting and validating the index TTL."""
+        original = config.get_index_ttl()
+        try:
+            config.set_index_ttl(3600)
+            assert config.get_index_ttl() == 3600
+            with pytest.raises(ValueError):
+                config.set_index_ttl(-1)
+        finally:
+            config.set_index_ttl(original)
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 